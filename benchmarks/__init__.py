@@ -0,0 +1,4 @@
+"""Benchmarks for the tasker control api.
+
+Run ``python -m benchmarks.run --help`` from the repository root.
+"""
@@ -0,0 +1,101 @@
+"""Generates synthetic projects at configurable scale from the templates in :mod:`tasker.templates`."""
+import datetime
+import random
+
+from sqlalchemy import bindparam, select
+
+import tasker.control
+import tasker.propagation as propagation
+import tasker.templates as templates
+from tasker import session_scope
+from tasker.model import State, TaskData, CommentData, ShotData, AssetData
+
+__author__ = 'Dominik'
+
+SHOT_TEMPLATE = 'feature_animation_shot'
+ASSET_TEMPLATES = ['feature_animation_character_asset', 'feature_animation_prop_asset',
+                   'feature_animation_anim_prop_asset']
+
+
+def generate_project(name, shots=1000, assets=200, users=50, comments_per_task=2, assigned=0.6, progress=0.5,
+                     seed=0):
+    """Creates a project with assets, shots, users, assignments, progressed states and comment history.
+
+    Args:
+        name (str): name of the new project
+        shots (int): number of shots, created from the feature animation shot template
+        assets (int): number of assets, spread over the asset templates
+        users (int): number of users. Users are shared between projects.
+        comments_per_task (int): average number of comments per task
+        assigned (float): fraction of tasks assigned to a user
+        progress (float): fraction of the template tasks of a shot or asset which is done on average
+        seed (int): seed for the random generator, the same seed creates the same project
+
+    Returns:
+        tasker.control.Project: the new project.
+
+    """
+    rng = random.Random(seed)
+    tasker.control.new_project(name=name)
+    project = tasker.control.get_project_by_name(name)
+
+    project.new_shots_bulk(names=['{seq:03d}_{shot:04d}'.format(seq=i // 100, shot=i % 100 * 10) for i in range(shots)],
+                           template=templates.shot[SHOT_TEMPLATE])
+    per_template = assets // len(ASSET_TEMPLATES)
+    for index, template_name in enumerate(ASSET_TEMPLATES):
+        count = per_template if index else assets - per_template * (len(ASSET_TEMPLATES) - 1)
+        project.new_assets_bulk(names=['{template}_{i:05d}'.format(template=template_name, i=i) for i in range(count)],
+                                template=templates.asset[template_name])
+
+    user_names = ['artist_{i:04d}'.format(i=i) for i in range(users)]
+    for user_name in user_names:
+        tasker.control.new_user(name=user_name)
+    user_ids = [user.id for user in tasker.control.get_all_users() if user.name in set(user_names)]
+
+    with session_scope() as session:
+        tasks = _project_tasks(session, project)
+        done = []
+        assignments = []
+        comments = []
+        now = datetime.datetime.now()
+        for (template_name, _, _), holder_tasks in sorted(tasks.items()):
+            finished = int(round(rng.random() * 2 * progress * len(holder_tasks)))
+            template = templates.compiled(template_name)
+            for task_id, task_name in holder_tasks:
+                if template.order.index(template.index[task_name]) < finished:
+                    done.append({'task_id': task_id})
+                if user_ids and rng.random() < assigned:
+                    assignments.append({'task_id': task_id, 'user_id': rng.choice(user_ids)})
+                for i in range(rng.randint(0, 2 * comments_per_task)):
+                    comments.append({'task_id': task_id, 'text': 'note {i} on {task}'.format(i=i, task=task_name),
+                                     'datetime': now - datetime.timedelta(minutes=rng.randint(0, 60 * 24 * 365))})
+
+        table = TaskData.__table__
+        if done:
+            session.execute(table.update().where(table.c.id == bindparam('task_id')).values(state=State.done), done)
+        if assignments:
+            session.execute(table.update().where(table.c.id == bindparam('task_id'))
+                            .values(user_id=bindparam('user_id')), assignments)
+        if comments:
+            session.execute(CommentData.__table__.insert(), comments)
+        propagation.propagate(session=session, task_ids=[row['task_id'] for row in done])
+    return project
+
+
+def _project_tasks(session, project):
+    """(task id, task name) of all assets and shots of the project, grouped by template name and asset or shot id.
+
+    Asset names start with their template name, see :func:`generate_project`.
+    """
+    tasks = {}
+    for holder_model in (AssetData, ShotData):
+        rows = session.execute(select([holder_model.id, holder_model.name, TaskData.id, TaskData.name])
+                               .select_from(TaskData.__table__.join(
+                                   holder_model.__table__,
+                                   holder_model.task_association_id == TaskData.association_id))
+                               .where(holder_model.project_id == project.id)
+                               .order_by(TaskData.id))
+        for holder_id, holder_name, task_id, task_name in rows:
+            template_name = holder_name.rsplit('_', 1)[0] if holder_model is AssetData else SHOT_TEMPLATE
+            tasks.setdefault((template_name, holder_model.__name__, holder_id), []).append((task_id, task_name))
+    return tasks
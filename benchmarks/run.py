@@ -0,0 +1,152 @@
+"""Times the tasker control api hot paths on a synthetic project and writes the results as JSON.
+
+Example for a studio sized project::
+
+    python -m benchmarks.run --shots 10000 --assets 2000 --users 200 --output results.json
+
+Every scenario reports its fastest and median wall time and the number of SQL statements it issued.
+Compare the JSON files of two runs to spot regressions.
+"""
+import argparse
+import datetime
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import sqlalchemy
+
+import tasker
+import tasker.control
+import tasker.metrics
+import tasker.templates as templates
+from tasker.model import State
+
+try:
+    import tasker.analytics as analytics_module
+except ImportError:
+    analytics_module = None  # numpy is optional
+
+from benchmarks.generator import generate_project, SHOT_TEMPLATE
+
+__author__ = 'Dominik'
+
+
+def measure(function, repeat):
+    """Runs the function repeat times.
+
+    Returns:
+        dict: 'min' and 'median' seconds and the 'queries' of a single run.
+
+    """
+    timings = []
+    queries = None
+    for _ in range(repeat):
+        with tasker.metrics.record() as recorder:
+            start = time.time()
+            function()
+            timings.append(time.time() - start)
+        queries = recorder.snapshot()['queries']
+    timings.sort()
+    return {'min': timings[0], 'median': timings[len(timings) // 2], 'queries': queries, 'repeat': repeat}
+
+
+def run(shots, assets, users, comments_per_task, repeat, batch):
+    """Generates a project and times all scenarios on it.
+
+    Returns:
+        dict: results per scenario.
+
+    """
+    results = {}
+    start = time.time()
+    with tasker.metrics.record() as recorder:
+        project = generate_project(name='benchmark', shots=shots, assets=assets, users=users,
+                                   comments_per_task=comments_per_task)
+    duration = time.time() - start
+    results['generate_project'] = {'min': duration, 'median': duration, 'queries': recorder.snapshot()['queries'],
+                                   'repeat': 1}
+
+    runs = iter(range(repeat))
+
+    def bulk_creation():
+        run_index = next(runs)
+        names = ['bulk_{run}_{i:04d}'.format(run=run_index, i=i) for i in range(batch * 10)]
+        project.new_shots_bulk(names=names, template=templates.shot[SHOT_TEMPLATE])
+    results['bulk_creation'] = measure(bulk_creation, repeat=repeat)
+
+    results['load_tree'] = measure(project.load_tree, repeat=repeat)
+
+    user = tasker.control.get_all_users()[0]
+    results['worklist'] = measure(lambda: tasker.control.get_worklist(user=user, project=project), repeat=repeat)
+
+    results['search'] = measure(lambda: tasker.control.find_tasks(project=project, name=templates.lighting),
+                                repeat=repeat)
+
+    if analytics_module is not None:
+        def analytics():
+            graph = analytics_module.load_graph(project)
+            graph.depth()
+            graph.remaining_chain()
+            graph.user_blocking_load()
+        results['analytics'] = measure(analytics, repeat=repeat)
+
+    storyboards = tasker.control.find_tasks(project=project, name=templates.storyboard)
+    storyboards = iter(storyboards[:batch * repeat])
+
+    def set_states():
+        for _ in range(batch):
+            task = next(storyboards, None)
+            if task:
+                task.state = State.reject if task.state == State.done else State.done
+    results['state_propagation'] = measure(set_states, repeat=repeat)
+
+    shots_to_delete = iter(project.shots[-batch * repeat:])
+
+    def delete():
+        for _ in range(batch):
+            shot = next(shots_to_delete, None)
+            if shot:
+                shot.delete()
+    results['deletion'] = measure(delete, repeat=repeat)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--shots', type=int, default=1000)
+    parser.add_argument('--assets', type=int, default=200)
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--comments', type=int, default=2, help='average number of comments per task')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per scenario')
+    parser.add_argument('--batch', type=int, default=20,
+                        help='states set and shots deleted per run. Ten times as many shots are created.')
+    parser.add_argument('--db', help='database file to use. Defaults to a new temporary file.')
+    parser.add_argument('--output', help='JSON file to write the results to. Defaults to stdout.')
+    args = parser.parse_args(argv)
+
+    db_path = args.db or os.path.join(tempfile.mkdtemp(prefix='tasker_benchmark_'), 'tasker.db')
+    tasker.init(url='sqlite:///' + db_path)
+    logging.getLogger('tasker').setLevel(logging.WARNING)
+
+    results = {'meta': {'date': datetime.datetime.now().isoformat(),
+                        'python': platform.python_version(),
+                        'sqlalchemy': sqlalchemy.__version__,
+                        'parameters': vars(args),
+                        },
+               'scenarios': run(shots=args.shots, assets=args.assets, users=args.users,
+                                comments_per_task=args.comments, repeat=args.repeat, batch=args.batch),
+               }
+    output = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            output_file.write(output)
+    else:
+        sys.stdout.write(output + '\n')
+
+
+if __name__ == '__main__':
+    main()
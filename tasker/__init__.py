@@ -7,37 +7,109 @@ the :mod:`tasker` module contains a model view control stucture to view and mani
 - :mod:`tasker.ui`  # To display data to the end user and let them manipulate it.
 - :mod:`tasker.db_config`  # Location and type of the database you want to use.
 - :mod:`tasker.templates`  # templates for task and task dependencies.
+- :mod:`tasker.cache`  # Optional caching of task data.
+- :mod:`tasker.metrics`  # Query counts and timings.
+- :mod:`tasker.events`  # Change notifications.
+- :mod:`tasker.search`  # In-memory search of a loaded project.
+- :mod:`tasker.fulltext`  # Full text index of the comments.
 
 
 The main api module is :mod:`tasker.control`. This holds common functions to generate and manipulate tasks.
 
+Importing tasker doesn't touch the database. The engine and the schema are set up on first use or explicitly
+with :func:`init`:
+
+>>> import tasker
+>>> tasker.init(url='sqlite:////mnt/projects/tasker.db')
+
+Logging is left to the application. :func:`setup_logging` prints the messages of the tasker loggers only:
+
+>>> tasker.setup_logging(level=logging.INFO)
+
 """
 
 import logging
+import threading
+from contextlib import contextmanager
 
 FORMAT = "%(filename)s:%(funcName)s - %(message)s"
-logging.basicConfig(format=FORMAT, level=logging.DEBUG)
 log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
 
-from contextlib import contextmanager
+from tasker import metrics
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+__author__ = 'Dominik'
 
-from tasker.model import Base
-from tasker.db_config import database
 
-__author__ = 'Dominik'
+engine = None
+Session = None
+_init_lock = threading.RLock()
+
+
+def init(url=None, **engine_kwargs):
+    """Connects tasker to a database and creates or upgrades the schema.
+
+    Called automatically with the configured database (see :mod:`tasker.db_config`) on first database access.
+    Call it explicitly to use another database. Calling it again switches to the new database and closes the
+    connections of the previous one.
+
+    Args:
+        url (str): database url. Defaults to the database configured in :mod:`tasker.db_config`.
+        **engine_kwargs: passed on to :func:`tasker.db_config.create_engine`
+
+    Returns:
+        sqlalchemy.engine.Engine: the engine used from now on.
+
+    """
+    global engine, Session
+    from sqlalchemy.orm import sessionmaker
+
+    from tasker import fulltext
+    from tasker.db_config import create_engine, database
+    from tasker.model import Base, upgrade_schema
+
+    with _init_lock:
+        new_engine = create_engine(url or database, **engine_kwargs)
+        Base.metadata.create_all(new_engine)
+        upgrade_schema(new_engine)
+        fulltext.setup(new_engine)
+        previous_engine = engine
+        Base.metadata.bind = new_engine
+        Session = sessionmaker(bind=new_engine)
+        engine = new_engine
+        if previous_engine is not None:
+            previous_engine.dispose()
+    return engine
+
+
+def setup_logging(level=logging.DEBUG):
+    """Prints the messages of the tasker loggers to stderr. The root logger is left untouched.
+
+    Args:
+        level (int): lowest level to print, e.g. logging.INFO
+
+    """
+    if not any(isinstance(handler, logging.StreamHandler) for handler in log.handlers):
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter(FORMAT))
+        log.addHandler(handler)
+    log.setLevel(level)
 
 
-engine = create_engine(database)
-Base.metadata.bind = engine
-Session = sessionmaker(bind=engine)
+def get_engine():
+    """The engine tasker works with. Initializes tasker with the configured database if needed."""
+    if engine is None:
+        with _init_lock:
+            if engine is None:
+                init()
+    return engine
 
 
 @contextmanager
 def session_scope():
     """Provides a transactional scope around a series of operations."""
+    get_engine()
+    operation_pushed = metrics.push_operation()
     session = Session()
     try:
         yield session
@@ -46,4 +118,5 @@ def session_scope():
         session.rollback()
         raise
     finally:
-        session.close()
\ No newline at end of file
+        session.close()
+        metrics.pop_operation(operation_pushed)
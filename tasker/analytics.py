@@ -0,0 +1,307 @@
+"""Analytics over the task dependency graph of a whole project. Requires numpy.
+
+:func:`load_graph` reads all tasks and dependencies of a project with one query into a :class:`TaskGraph` of
+integer arrays. All analyses work on those arrays level by level, so their cost grows with the number of
+dependency levels of the templates, not with the number of tasks.
+
+>>> import tasker.analytics
+>>> graph = tasker.analytics.load_graph(project)
+>>> graph.bottlenecks(limit=5)  # [(task id, number of unfinished tasks waiting for it), ...]
+>>> graph.user_blocking_load()  # {'user name': number of unfinished tasks waiting for the user, ...}
+
+"""
+import numpy as np
+from tasker import log, session_scope
+from tasker.control import _project_association_ids
+from tasker.model import State, TaskData, UserData, task_to_task
+import tasker.templates as templates
+
+__author__ = 'Dominik'
+
+# States of tasks which don't block anything anymore.
+FINISHED_STATES = (State.done, State.omit)
+
+_WORD_BITS = 64
+
+
+def load_graph(project):
+    """Loads the tasks and dependencies of all assets and shots of the project.
+
+    Args:
+        project (tasker.control.Project): project to load
+
+    Returns:
+        TaskGraph: the dependency graph of the project.
+
+    """
+    association_ids = _project_association_ids([project.id])
+    with session_scope() as session:
+        rows = session.query(TaskData.id, TaskData.name, TaskData.state, TaskData.user_id, UserData.name,
+                             task_to_task.c.right_task_id) \
+            .outerjoin(UserData, UserData.id == TaskData.user_id) \
+            .outerjoin(task_to_task, task_to_task.c.left_task_id == TaskData.id) \
+            .filter(TaskData.association_id.in_(association_ids)) \
+            .all()
+    return TaskGraph(rows)
+
+
+class TaskGraph(object):
+    """Tasks and their dependencies as arrays. Tasks are addressed by their position in :attr:`task_ids`.
+
+    Args:
+        rows (list(tuple)): (task id, task name, state, user id, user name, id of a task it depends on or None)
+            with one row per dependency and at least one row per task.
+    """
+
+    def __init__(self, rows):
+        super(TaskGraph, self).__init__()
+        row_task_ids = np.array([row[0] for row in rows], dtype=np.int64)
+        self.task_ids, first = np.unique(row_task_ids, return_index=True)
+        size = len(self.task_ids)
+
+        self.names, self.name_codes = _encode([rows[i][1] for i in first])
+        self.states, self.state_codes = _encode([rows[i][2] for i in first])
+        self.user_ids = np.array([rows[i][3] if rows[i][3] is not None else -1 for i in first], dtype=np.int64)
+        self.user_names = dict((row[3], row[4]) for row in rows if row[3] is not None)
+
+        dependency_ids = np.array([row[5] if row[5] is not None else -1 for row in rows], dtype=np.int64)
+        has_dependency = dependency_ids >= 0
+        tasks = np.searchsorted(self.task_ids, row_task_ids[has_dependency])
+        dependencies = np.searchsorted(self.task_ids, dependency_ids[has_dependency])
+        inside = dependencies < size
+        inside[inside] = self.task_ids[dependencies[inside]] == dependency_ids[has_dependency][inside]
+        tasks, dependencies = tasks[inside], dependencies[inside]  # dependencies on other projects are ignored
+
+        self.dependency_indptr, self.dependency_indices = _csr(tasks, dependencies, size)
+        self.depender_indptr, self.depender_indices = _csr(dependencies, tasks, size)
+        self.unfinished = ~np.isin(self.state_codes, [self.states.index(state) for state in FINISHED_STATES
+                                                      if state in self.states])
+        self._levels = None
+        self._reverse_levels = None
+        self._blocked = None
+
+    def __len__(self):
+        return len(self.task_ids)
+
+    def index(self, task_id):
+        """Position of the task in the arrays."""
+        position = int(np.searchsorted(self.task_ids, task_id))
+        if position >= len(self.task_ids) or self.task_ids[position] != task_id:
+            raise KeyError('Task {id} is not part of the graph.'.format(id=task_id))
+        return position
+
+    def depth(self):
+        """Topological depth of every task: 0 for tasks without dependencies, otherwise the number of tasks on the
+        longest dependency chain above it. -1 for tasks on a dependency cycle.
+
+        Returns:
+            numpy.ndarray: depth per task.
+
+        """
+        depth = np.full(len(self), -1, dtype=np.int64)
+        for level, tasks in enumerate(self._topological_levels()):
+            depth[tasks] = level
+        return depth
+
+    def remaining_chain(self, target=templates.compositing):
+        """Number of unfinished tasks on the longest dependency chain from every task down to a target task.
+
+        Args:
+            target (str): name of the tasks the chains end in.
+
+        Returns:
+            numpy.ndarray: chain length per task, counting the task and the target. -1 if no target task depends
+            directly or indirectly on the task.
+
+        """
+        weights = self.unfinished.astype(np.int64)
+        is_target = self.name_codes == (self.names.index(target) if target in self.names else -1)
+        remaining = np.full(len(self), -1, dtype=np.int64)
+        best = np.full(len(self), -1, dtype=np.int64)
+        for tasks in self._reverse_topological_levels():
+            owners, dependers = _gather(self.depender_indptr, self.depender_indices, tasks)
+            np.maximum.at(best, owners, remaining[dependers])
+            reaches_target = (best[tasks] >= 0) | is_target[tasks]
+            remaining[tasks] = np.where(reaches_target, weights[tasks] + np.maximum(best[tasks], 0), -1)
+        return remaining
+
+    def critical_path(self, target=templates.compositing):
+        """The chain with the most unfinished tasks ending in a target task.
+
+        Args:
+            target (str): name of the tasks the chain ends in.
+
+        Returns:
+            list(int): task ids from the first task of the chain down to the target task. Empty if there is none.
+
+        """
+        remaining = self.remaining_chain(target=target)
+        if not len(self) or remaining.max() < 0:
+            return []
+        is_target = self.name_codes == self.names.index(target)
+        starts = np.flatnonzero(remaining == remaining.max())
+        current = int(starts[np.argmin(self.depth()[starts])])
+        path = [current]
+        while True:
+            expected = remaining[current] - int(self.unfinished[current])
+            if is_target[current] and expected == 0:
+                break
+            dependers = self.depender_indices[self.depender_indptr[current]:self.depender_indptr[current + 1]]
+            candidates = dependers[remaining[dependers] == expected]
+            if not len(candidates):
+                break
+            current = int(candidates[0])
+            path.append(current)
+        return [int(self.task_ids[task]) for task in path]
+
+    def blocked_counts(self):
+        """Number of unfinished tasks depending directly or indirectly on every unfinished task.
+
+        Returns:
+            numpy.ndarray: blocked tasks per task, 0 for finished tasks.
+
+        """
+        if self._blocked is None:
+            self._blocked = self._count_blocked()
+        return self._blocked
+
+    def bottlenecks(self, limit=10):
+        """The unfinished tasks blocking the most other tasks.
+
+        Args:
+            limit (int): number of tasks to return.
+
+        Returns:
+            list(tuple(int, int)): (task id, number of blocked tasks), most blocking first.
+
+        """
+        blocked = self.blocked_counts()
+        limit = min(limit, len(self))
+        if not limit:
+            return []
+        top = np.argpartition(-blocked, limit - 1)[:limit]
+        top = top[np.lexsort((self.task_ids[top], -blocked[top]))]
+        return [(int(self.task_ids[task]), int(blocked[task])) for task in top if blocked[task] > 0]
+
+    def user_blocking_load(self):
+        """Number of unfinished tasks waiting on the unfinished tasks of each user.
+        A task waiting on several tasks of the same user is counted for every one of them.
+
+        Returns:
+            dict(str, int): user name to the summed blocked counts of the user's tasks.
+
+        """
+        assigned = self.unfinished & (self.user_ids >= 0)
+        user_ids, users = np.unique(self.user_ids[assigned], return_inverse=True)
+        load = np.bincount(users, weights=self.blocked_counts()[assigned], minlength=len(user_ids))
+        return dict((self.user_names[int(user_id)], int(value)) for user_id, value in zip(user_ids, load))
+
+    def _topological_levels(self):
+        """Tasks grouped by level, dependencies before the tasks depending on them."""
+        if self._levels is None:
+            self._levels = _levels(self.dependency_indptr, self.depender_indptr, self.depender_indices)
+        return self._levels
+
+    def _reverse_topological_levels(self):
+        """Tasks grouped by level, dependers before the tasks they depend on."""
+        if self._reverse_levels is None:
+            self._reverse_levels = _levels(self.depender_indptr, self.dependency_indptr, self.dependency_indices)
+        return self._reverse_levels
+
+    def _count_blocked(self):
+        size = len(self)
+        components = _components(self.dependency_indptr, self.dependency_indices)
+        order = np.argsort(components, kind='mergesort')
+        _, starts, sizes = np.unique(components[order], return_index=True, return_counts=True)
+        local = np.empty(size, dtype=np.int64)
+        local[order] = np.arange(size) - np.repeat(starts, sizes)
+        words = max(1, -(-int(sizes.max()) // _WORD_BITS)) if size else 1
+
+        bits = np.zeros((size, words), dtype=np.uint64)
+        bits[np.arange(size), local // _WORD_BITS] = np.left_shift(np.uint64(1),
+                                                                    (local % _WORD_BITS).astype(np.uint64))
+        unfinished_bits = np.zeros((components.max() + 1 if size else 0, words), dtype=np.uint64)
+        np.bitwise_or.at(unfinished_bits, components[self.unfinished], bits[self.unfinished])
+
+        downstream = np.zeros((size, words), dtype=np.uint64)
+        for tasks in self._reverse_topological_levels():
+            owners, dependers = _gather(self.depender_indptr, self.depender_indices, tasks)
+            np.bitwise_or.at(downstream, owners, downstream[dependers] | bits[dependers])
+        blocked = _popcount(downstream & unfinished_bits[components])
+        blocked[~self.unfinished] = 0
+        return blocked
+
+
+def _encode(values):
+    """Distinct values and the code of every value."""
+    distinct = sorted(set(values), key=lambda value: (value is not None, value))
+    codes = dict((value, code) for code, value in enumerate(distinct))
+    return distinct, np.array([codes[value] for value in values], dtype=np.int64)
+
+
+def _csr(sources, targets, size):
+    """Compressed sparse rows of the edges, targets of each source in one slice."""
+    order = np.argsort(sources, kind='mergesort')
+    indptr = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=size), out=indptr[1:])
+    return indptr, targets[order].astype(np.int64)
+
+
+def _gather(indptr, indices, rows):
+    """All entries of the given rows.
+
+    Returns:
+        tuple(numpy.ndarray, numpy.ndarray): the row of every entry and the entries.
+
+    """
+    starts = indptr[rows]
+    lengths = indptr[rows + 1] - starts
+    total = int(lengths.sum())
+    offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(total)
+    return np.repeat(rows, lengths), indices[offsets]
+
+
+def _levels(incoming_indptr, outgoing_indptr, outgoing_indices):
+    """Kahn's algorithm one level at a time. A task is in the level after all its incoming tasks."""
+    pending = np.diff(incoming_indptr)
+    current = np.flatnonzero(pending == 0)
+    levels = []
+    processed = 0
+    while len(current):
+        levels.append(current)
+        processed += len(current)
+        _, following = _gather(outgoing_indptr, outgoing_indices, current)
+        pending = pending - np.bincount(following, minlength=len(pending))
+        following = np.unique(following)
+        current = following[pending[following] == 0]
+    if processed < len(pending):
+        log.warning('{count} tasks are part of dependency cycles and were skipped.'.format(
+            count=len(pending) - processed))
+    return levels
+
+
+def _components(indptr, indices):
+    """Label of the connected component of every task, ignoring the direction of the dependencies."""
+    size = len(indptr) - 1
+    labels = np.arange(size)
+    sources, targets = _gather(indptr, indices, np.arange(size))
+    while True:
+        smallest = np.minimum(labels[sources], labels[targets])
+        updated = labels.copy()
+        np.minimum.at(updated, sources, smallest)
+        np.minimum.at(updated, targets, smallest)
+        updated = updated[updated]  # pointer jumping
+        if np.array_equal(updated, labels):
+            return labels
+        labels = updated
+
+
+def _popcount(words):
+    """Number of set bits per row."""
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(words).sum(axis=1).astype(np.int64)
+    as_bytes = words.view(np.uint8).reshape(len(words), -1)
+    return _BYTE_BITS[as_bytes].sum(axis=1).astype(np.int64)
+
+
+_BYTE_BITS = np.array([bin(value).count('1') for value in range(256)], dtype=np.uint8)
@@ -0,0 +1,169 @@
+"""Opt-in identity map cache for the :mod:`tasker.control` wrapper objects.
+
+Values read through the wrapper properties are kept per database row, keyed by (model type, id).
+The least recently used rows are evicted once the cache is full.
+The cache is disabled by default, so every property access queries the database like before.
+
+Example:
+
+>>> import tasker.cache
+>>> tasker.cache.enable(maxsize=50000)
+>>> task.state  # queries the database
+>>> task.state  # memory lookup
+
+Writes done through :mod:`tasker.control` invalidate the affected rows.
+Changes done by other processes are only seen after the row was invalidated or the cache was cleared.
+"""
+import functools
+import threading
+from collections import OrderedDict
+
+__author__ = 'Dominik'
+
+
+class IdentityMap(object):
+    """Bounded map of (model type, id) to the cached attribute values of that row.
+
+    Args:
+        maxsize (int): number of rows to hold before the least recently used row is evicted.
+    """
+
+    def __init__(self, maxsize=10000):
+        super(IdentityMap, self).__init__()
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._rows = OrderedDict()
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, key):
+        return key in self._rows
+
+    def get(self, key, attribute, loader):
+        """Returns the cached attribute of a row or loads and caches it.
+
+        Args:
+            key (tuple): (model type, id) of the row
+            attribute (str): name of the cached value
+            loader (callable): called without arguments on a cache miss to load the value
+
+        Returns:
+            the cached or loaded value.
+
+        """
+        with self._lock:
+            row = self._rows.pop(key, None)
+            if row is not None:
+                self._rows[key] = row  # mark as most recently used
+                if attribute in row:
+                    self.hits += 1
+                    return row[attribute]
+        value = loader()
+        with self._lock:
+            self.misses += 1
+            row = self._rows.pop(key, {})
+            row[attribute] = value
+            self._rows[key] = row
+            while len(self._rows) > self.maxsize:
+                self._rows.popitem(last=False)
+        return value
+
+    def keys(self):
+        """Keys of all cached rows, least recently used first."""
+        with self._lock:
+            return list(self._rows)
+
+    def peek(self, key):
+        """The cached values of a row without loading or marking it as used.
+
+        Returns:
+            dict: attribute to cached value or None if the row isn't cached.
+
+        """
+        with self._lock:
+            row = self._rows.get(key)
+            return dict(row) if row is not None else None
+
+    def invalidate(self, key):
+        """Drops all cached values of a row."""
+        with self._lock:
+            self._rows.pop(key, None)
+
+    def clear(self):
+        """Drops all cached rows."""
+        with self._lock:
+            self._rows.clear()
+
+
+_identity_map = None
+
+
+def enable(maxsize=10000):
+    """Enables caching for the :mod:`tasker.control` wrapper properties.
+
+    Args:
+        maxsize (int): number of rows to hold in memory.
+
+    """
+    global _identity_map
+    _identity_map = IdentityMap(maxsize=maxsize)
+
+
+def disable():
+    """Disables caching and drops all cached values."""
+    global _identity_map
+    _identity_map = None
+
+
+def is_enabled():
+    return _identity_map is not None
+
+
+def get_identity_map():
+    """The active identity map or None if caching is disabled."""
+    return _identity_map
+
+
+def invalidate(model_type, *ids):
+    """Drops the cached values of the given rows.
+
+    Args:
+        model_type: model class of the rows, e.g. :class:`tasker.model.TaskData`
+        *ids (int): ids of the rows to drop. None values are ignored.
+
+    """
+    identity_map = _identity_map
+    if identity_map is None:
+        return
+    for id in ids:
+        if id is not None:
+            identity_map.invalidate((model_type, id))
+
+
+def clear():
+    """Drops all cached values."""
+    if _identity_map is not None:
+        _identity_map.clear()
+
+
+def cached(func):
+    """Decorator to cache the return value of a wrapper property getter.
+
+    The wrapper object must provide ``id`` and ``model_type`` attributes which identify the row.
+    Lists are copied on the way out, so callers can't alter the cached value.
+    """
+    attribute = func.__name__
+
+    @functools.wraps(func)
+    def wrapper(self):
+        identity_map = _identity_map
+        if identity_map is None:
+            return func(self)
+        value = identity_map.get(key=(self.model_type, self.id), attribute=attribute, loader=lambda: func(self))
+        if isinstance(value, list):
+            return list(value)
+        return value
+    return wrapper
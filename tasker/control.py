@@ -23,15 +23,64 @@ Example:
 
 """
 import datetime
+import heapq
+import threading
+from collections import Counter, defaultdict, namedtuple
+
+from sqlalchemy import and_, exists, func, literal, literal_column, or_, select, union_all
+from sqlalchemy.orm import aliased
 
 from tasker import log, session_scope
-from tasker.model import State, TaskData,CommentData, AssetData, ShotData, LayoutData, ProjectData, UserData
+from tasker.model import State, TaskData,CommentData, AssetData, ShotData, LayoutData, ProjectData, UserData, task_to_task
 
+import tasker.cache as cache
+import tasker.events as events
+import tasker.fulltext as fulltext
+import tasker.propagation as propagation
 import tasker.templates as templates
 
 __author__ = 'Dominik'
 __version__ = '0.1.0'
 
+# States of tasks which can be worked on, see :func:`ready_tasks`.
+READY_STATES = (State.can_start, State.to_continue)
+
+
+# Plain, read only snapshots of the project tree. See :meth:`Project.load_tree`.
+TaskSnapshot = namedtuple('TaskSnapshot', ['id', 'name', 'state', 'user_id', 'user_name', 'child_tasks'])
+TaskHolderSnapshot = namedtuple('TaskHolderSnapshot', ['id', 'name', 'kind', 'tasks'])
+ProjectSnapshot = namedtuple('ProjectSnapshot', ['id', 'name', 'assets', 'shots'])
+
+# A comment found by :func:`search_comments` with the task and the asset or shot it belongs to.
+# rank is smaller for better matches, None if the database has no full text index.
+CommentHit = namedtuple('CommentHit', ['id', 'text', 'datetime', 'task_id', 'task_name',
+                                       'parent_kind', 'parent_id', 'parent_name', 'rank'])
+
+# A task assigned to a user with the asset or shot it belongs to, see :func:`get_worklist`.
+# last_comment is the datetime of the newest comment or None.
+WorklistEntry = namedtuple('WorklistEntry', ['id', 'name', 'state', 'parent_kind', 'parent_id', 'parent_name',
+                                             'last_comment'])
+
+# A task which can be worked on, see :func:`ready_tasks`.
+# unblocks is the number of tasks depending directly or indirectly on it.
+ReadyTask = namedtuple('ReadyTask', ['id', 'name', 'state', 'user_id', 'unblocks'])
+
+# Task counts per state of one group of :func:`state_summary`, e.g. group ('shot', 'lighting').
+StateCount = namedtuple('StateCount', ['group', 'counts'])
+StateSummary = namedtuple('StateSummary', ['group_by', 'rows'])
+
+# Whether a task may change to a new state, see :func:`check_transitions`. reason is None if allowed.
+Transition = namedtuple('Transition', ['id', 'state', 'allowed', 'reason'])
+
+# Reasons why a state change is not allowed.
+SAME_STATE = 'same state'
+DONE_WITHOUT_REJECT = 'task is done, reject it first'
+DEPENDENCIES_NOT_DONE = 'dependencies not done'
+UNKNOWN_TASK = 'unknown task'
+
+# id and name of a row, enough to build a wrapper object from a column query.
+_Row = namedtuple('_Row', ['id', 'name'])
+
 
 class Task(object):
     """A ask is a single unit of process and may be chained together with other tasks via dependencies.
@@ -39,6 +88,8 @@ class Task(object):
     A task may be linked against a shot or asset where it belongs to.
     """
 
+    model_type = TaskData
+
     def __init__(self, model):
         super(Task, self).__init__()
         self.id = model.id
@@ -52,6 +103,7 @@ class Task(object):
         return 'Task Object: {name}, {state}'.format(name=self.name, state=self.state)
 
     @property
+    @cache.cached
     def user(self):
         """ The user assigned to this task.
 
@@ -60,9 +112,12 @@ class Task(object):
 
         """
         with session_scope() as session:
-            task = session.query(TaskData).filter(TaskData.id == self.id).first()
-            if task.user:
-                return User(task.user)
+            user = session.query(UserData.id, UserData.name) \
+                .join(TaskData, TaskData.user_id == UserData.id) \
+                .filter(TaskData.id == self.id) \
+                .first()
+            if user:
+                return User(user)
             return None
 
     @user.setter
@@ -75,13 +130,19 @@ class Task(object):
         """
         with session_scope() as session:
             task_data = session.query(TaskData).filter(TaskData.id == self.id).first()
+            previous_user_id = task_data.user_id
             user_data = None
             if user:
                 user_data = session.query(UserData).filter(UserData.id == user.id).first()
                 log.debug('{user} assigned to {task}'.format(user=user_data.name, task=task_data.name))
             task_data.user = user_data
+        user_id = user.id if user else None
+        cache.invalidate(TaskData, self.id)
+        cache.invalidate(UserData, previous_user_id, user_id)
+        events.publish(events.USERS_ASSIGNED, ids=[self.id], changes={self.id: (previous_user_id, user_id)})
 
     @property
+    @cache.cached
     def state(self):
         """The current state of the task.
         Returns:
@@ -100,11 +161,13 @@ class Task(object):
 
         """
         with session_scope() as session:
-            task_data = session.query(TaskData).filter(TaskData.id == self.id).first()
             log.info('{task} set to {state}'.format(task=self.name, state=state))
-            task_data.state = state
-            self._update_self(session=session)
-            self.update_depender(session=session)
+            old_state = session.query(TaskData.state).filter(TaskData.id == self.id).scalar()
+            session.query(TaskData).filter(TaskData.id == self.id).update({'state': state}, synchronize_session=False)
+            changes = propagation.propagate(session=session, task_ids=[self.id])
+        changes[self.id] = (old_state, changes.get(self.id, (None, state))[1])
+        cache.invalidate(TaskData, *changes)
+        events.publish(events.STATES_CHANGED, ids=changes, changes=changes)
 
     def is_state_allowed(self, state):
         """Checks if the task may change its state to the given one.
@@ -115,35 +178,11 @@ class Task(object):
         Returns:
             bool: True if state change is allowed. Otherwise False.
         """
-        if self._is_new_state_same_as_current_state(new_state=state):
-            return False
-        if not self._is_state_set_allowed(new_state=state):
-            return False
-        if not self._are_dependencies_fulfilled():
-            return False
-        return True
-
-    def _are_dependencies_fulfilled(self):
-        """Checks if all dependencies (other tasks) for this task are done."""
-        with session_scope() as session:
-            task = session.query(TaskData).filter(TaskData.id == self.id).first()
-            dependencies = task.dependencies
-            if any(dependency.state != State.done for dependency in dependencies):
-                log.warning('State set not allowed for {task}. Dependend tasks are not done.'.format(task=self.name))
-                return False
-            return True
-
-    def _is_state_set_allowed(self, new_state):
-        if self.state == State.done and new_state != State.reject:
-            log.warning('State {new_state} not allowed for {task}. Task is done. Please reject first to work on task.'.format(task=self.name, new_state=new_state))
-            return False
-        return True
-
-    def _is_new_state_same_as_current_state(self, new_state):
-        if new_state == self.state:
-            log.warning('{new_state} identical to current state.'.format(new_state=new_state))
-            return True
-        return False
+        transition = check_transitions(task_ids=[self.id], new_state=state)[self.id]
+        if not transition.allowed:
+            log.warning('State {new_state} not allowed for {task}: {reason}.'.format(
+                new_state=state, task=self.name, reason=transition.reason))
+        return transition.allowed
 
     def update_tasks_states(self):
         """Updates states for this tasks and all dependencies.
@@ -151,54 +190,53 @@ class Task(object):
         This method update tose and also the database entries.
         """
         with session_scope() as session:
-            self._update_self(session=session)
-            self.update_depender(session=session)
-
-    def _update_self(self, session):
-        task_data = session.query(TaskData).filter(TaskData.id == self.id).first()
-        if not task_data.dependencies:  # No previous task so set state to can_start
-            if task_data.state == State.pending:
-                task_data.state = State.can_start
-                log.info("Starting no dependencie task {task}".format(task=self.name))
-
-        if any(dependencie.state == State.reject for dependencie in task_data.dependencies):
-            log.info("Locking %s for parent reject" % self.name)
-            task_data.state = State.hold
-            return
-
-        # all previews task done, start self
-        if all(dependencie.state == State.done for dependencie in task_data.dependencies):
-            # if already worked on shot, set to update
-            if task_data.state == State.hold:
-                task_data.state = State.to_continue
-                log.info("To continue task %s" % self.name)
-                return
-            if task_data.state != State.pending:
-                return
-            log.info("Starting task %s" % self.name)
-            task_data.state = State.can_start
+            changes = propagation.propagate(session=session, task_ids=[self.id])
+        cache.invalidate(TaskData, *changes)
+        events.publish(events.STATES_CHANGED, ids=changes, changes=changes)
 
     def update_depender(self, session):
-        task = session.query(TaskData).filter(TaskData.id == self.id).first()
-        for d in task.depender:
-            t = Task(d)
-            t._update_self(session=session)
-            t.update_depender(session=session)
+        """Updates the states of all tasks depending directly or indirectly on this task.
+        No event is published, the changes are only committed with the given session.
+
+        Args:
+            session: open database session to do the update in.
+
+        Returns:
+            dict(int, tuple(str, str)): task id to (old state, new state) for every changed task.
+
+        """
+        changes = propagation.propagate(session=session, task_ids=[self.id], include_roots=False)
+        cache.invalidate(TaskData, *changes)
+        return changes
 
     @property
+    @cache.cached
     def parent(self):
+        """The asset or shot this task belongs to.
+
+        Returns:
+            Asset or Shot: the parent of this task or None for tasks without one.
+
+        """
         with session_scope() as session:
-            task = session.query(TaskData).filter(TaskData.id == self.id).first()
-            parent = task.parent
-            if not parent:
-                log.debug('No parent for {task}'.format(task=task.name))
-                return None
-            if isinstance(parent, AssetData):
-                return Asset(parent)
-            if isinstance(parent, ShotData):
-                return Shot(parent)
+            asset = aliased(AssetData)
+            shot = aliased(ShotData)
+            row = session.query(asset.id.label('asset_id'), asset.name.label('asset_name'),
+                                shot.id.label('shot_id'), shot.name.label('shot_name')) \
+                .select_from(TaskData) \
+                .outerjoin(asset, asset.task_association_id == TaskData.association_id) \
+                .outerjoin(shot, shot.task_association_id == TaskData.association_id) \
+                .filter(TaskData.id == self.id) \
+                .first()
+            if row and row.asset_id is not None:
+                return Asset(_Row(id=row.asset_id, name=row.asset_name))
+            if row and row.shot_id is not None:
+                return Shot(_Row(id=row.shot_id, name=row.shot_name))
+            log.debug('No parent for {task}'.format(task=self.name))
+            return None
 
     @property
+    @cache.cached
     def child_tasks(self):
         """All child / subtasks which belong to this task.
 
@@ -211,6 +249,7 @@ class Task(object):
             return [Task(child_task) for child_task in children_task_data]
 
     @property
+    @cache.cached
     def comments(self):
         """All comments associated with this tasks. Normaly entered during state changes.
 
@@ -222,6 +261,25 @@ class Task(object):
             comments = session.query(CommentData).filter(CommentData.task_id == self.id).all()
             return [Comment(c) for c in comments]
 
+    def comments_page(self, limit=20, before=None):
+        """One page of the comments of this task, newest first.
+        Pass the last comment of a page as ``before`` to get the next older page.
+
+        Args:
+            limit (int): maximum number of comments to return.
+            before (Comment): return only comments older than this one.
+
+        Returns:
+            list(Comment): up to limit comments, newest first. Fewer than limit if there are no older ones.
+
+        """
+        with session_scope() as session:
+            comments = session.query(CommentData).filter(CommentData.task_id == self.id)
+            if before:
+                comments = comments.filter(CommentData.id < before.id)
+            comments = comments.order_by(CommentData.id.desc()).limit(limit)
+            return [Comment(c) for c in comments]
+
     def add_comment(self, text):
         """Associates a new comment with this task.
 
@@ -231,8 +289,12 @@ class Task(object):
         """
         time = datetime.datetime.now()
         with session_scope() as session:
-            task_data = session.query(TaskData).filter(TaskData.id == self.id).first()
-            task_data.comments.append(CommentData(text=text, datetime=time))
+            comment = CommentData(task_id=self.id, text=text, datetime=time)
+            session.add(comment)
+            session.flush()
+            fulltext.index(session, select([CommentData.id, CommentData.text]).where(CommentData.id == comment.id))
+        cache.invalidate(TaskData, self.id)
+        events.publish(events.COMMENTS_ADDED, ids=[self.id])
 
 
 class Comment(object):
@@ -257,11 +319,13 @@ class TaskHolder(object):
     """Base class which provides methods to work with tasks.
     """
 
+    model_type = None
+    kind = None
+
     def __init__(self, model):
         super(TaskHolder, self).__init__()
         self.id = model.id
         self.name = model.name
-        self.model_type = type(model)
 
     def __str__(self):
         return self.name
@@ -283,17 +347,28 @@ class TaskHolder(object):
             bool: True if deleteoin was successfull, False otherwise.
 
         """
-        tasks = self.tasks
-        for task in tasks:
-            task.user = None
-
-
         with session_scope() as session:
+            association_id = select([self.model_type.task_association_id]) \
+                .where(self.model_type.id == self.id) \
+                .as_scalar()
+            assigned = session.query(TaskData.id, TaskData.user_id) \
+                .filter(TaskData.association_id == association_id) \
+                .all()
+            session.query(TaskData) \
+                .filter(TaskData.association_id == association_id, TaskData.user_id.isnot(None)) \
+                .update({'user_id': None}, synchronize_session=False)
             item = session.query(self.model_type).filter(self.model_type.id == self.id)
             item.delete(synchronize_session = False)
-            return True
+        cache.invalidate(self.model_type, self.id)
+        cache.invalidate(TaskData, *[task.id for task in assigned])
+        cache.invalidate(UserData, *set(task.user_id for task in assigned))
+        unassigned = dict((task.id, (task.user_id, None)) for task in assigned if task.user_id is not None)
+        events.publish(events.USERS_ASSIGNED, ids=unassigned, changes=unassigned)
+        events.publish(events.ITEMS_DELETED, ids=[self.id], kind=self.kind)
+        return True
 
     @property
+    @cache.cached
     def tasks(self):
         """All tasks for this item.
         Queries the database for all tasks associated with this item and returns them.
@@ -303,8 +378,12 @@ class TaskHolder(object):
 
         """
         with session_scope() as session:
-            item = session.query(self.model_type).filter(self.model_type.id == self.id).first()
-            return [Task(task) for task in item.tasks if not task.parent_task]
+            tasks = session.query(TaskData.id, TaskData.name) \
+                .join(self.model_type, self.model_type.task_association_id == TaskData.association_id) \
+                .filter(self.model_type.id == self.id, TaskData.parent_task_id.is_(None)) \
+                .order_by(TaskData.id) \
+                .all()
+            return [Task(task) for task in tasks]
 
 
 class Asset(TaskHolder):
@@ -316,11 +395,17 @@ class Asset(TaskHolder):
     via folder structures or some database to this asset. To complete an asset, different deparments and tasks are
     infolved which can/may be representet as task.
     """
+    model_type = AssetData
+    kind = 'asset'
+
     def __init__(self, model):
         super(Asset, self).__init__(model=model)
 
 
 class Shot(TaskHolder):
+    model_type = ShotData
+    kind = 'shot'
+
     def __init__(self, model):
         super(Shot, self).__init__(model=model)
 
@@ -387,34 +472,93 @@ class Project(object):
             layouts = session.query(LayoutData).filter(LayoutData.project_id==self.id)
             return [Layout(layout_data) for layout_data in layouts]
 
-    def new_asset(self, name, template):
+    def load_tree(self):
+        """Loads assets, shots, their tasks, assigned users and subtasks in one go.
+
+        The number of queries is fixed and doesn't grow with the size of the project.
+        The returned snapshot is plain data and doesn't touch the database afterwards.
+
+        Returns:
+            ProjectSnapshot: all assets and shots of this project with their task trees.
+
+        """
+        with session_scope() as session:
+            assets = _load_holder_snapshots(session=session, holder_model=AssetData, kind='asset', project_id=self.id)
+            shots = _load_holder_snapshots(session=session, holder_model=ShotData, kind='shot', project_id=self.id)
+        return ProjectSnapshot(id=self.id, name=self.name, assets=assets, shots=shots)
+
+    def new_asset(self, name, template, reduce_dependencies=False):
         """ Creates a new asset with the given name in the project.
         The new shot will use the provided template to generate tasks and dependenciesfor itself.
 
         Args:
             name (str): name of the new asset. Aborts if an asset with this name already exists.
             template (dict): A configuration file to generate tasks and dependencies for the new asset from.
+            reduce_dependencies (bool): store only the transitive reduction of the template dependencies.
+                See :meth:`tasker.templates.CompiledTemplate.reduced`.
         """
         log.info('New Asset {name}'.format(name=name))
-        asset = AssetData(name=name, tasks=tasks_from_template(template=template))
+        asset = AssetData(name=name, tasks=tasks_from_template(template=template, reduce_dependencies=reduce_dependencies,
+                                                               project_id=self.id))
         with session_scope() as session:
             project = session.query(ProjectData).filter(ProjectData.id == self.id).first()
             project.assets.append(asset)
+            session.flush()
+            asset_id = asset.id
+        events.publish(events.ITEMS_CREATED, ids=[asset_id], kind=Asset.kind)
 
-    def new_shot(self, name, template):
+    def new_shot(self, name, template, reduce_dependencies=False):
         """ Creates a shot for this project.
         The new shot will use the provided template to generate tasks and dependencies for itself.
 
         Args:
             name (str): name of the new shot. Aborts if a shot with this name already exists.
             template (dict): A configuration file to generate tasks and dependencies for the new shot from.
+            reduce_dependencies (bool): store only the transitive reduction of the template dependencies.
+                See :meth:`tasker.templates.CompiledTemplate.reduced`.
 
         """
         log.info('New ShotData {name}'.format(name=name))
-        shot = ShotData(name=name, tasks=tasks_from_template(template=template))
+        shot = ShotData(name=name, tasks=tasks_from_template(template=template, reduce_dependencies=reduce_dependencies,
+                                                             project_id=self.id))
         with session_scope() as session:
             project = session.query(ProjectData).filter(ProjectData.id == self.id).first()
             project.shots.append(shot)
+            session.flush()
+            shot_id = shot.id
+        events.publish(events.ITEMS_CREATED, ids=[shot_id], kind=Shot.kind)
+
+    def new_assets_bulk(self, names, template, reduce_dependencies=False):
+        """Creates many assets from the same template at once.
+        All rows are built up front and inserted with one statement per table in a single transaction.
+
+        Args:
+            names (list(str)): names of the new assets.
+            template (dict): A configuration file to generate tasks and dependencies for the new assets from.
+            reduce_dependencies (bool): store only the transitive reduction of the template dependencies.
+                See :meth:`tasker.templates.CompiledTemplate.reduced`.
+
+        """
+        log.info('New Assets {count}'.format(count=len(names)))
+        asset_ids = _new_holders_bulk(project_id=self.id, holder_model=AssetData, names=names, template=template,
+                                      reduce_dependencies=reduce_dependencies)
+        events.publish(events.ITEMS_CREATED, ids=asset_ids, kind=Asset.kind)
+
+    def new_shots_bulk(self, names, template, reduce_dependencies=False):
+        """Creates many shots from the same template at once.
+        All rows are built up front and inserted with one statement per table in a single transaction.
+
+        Args:
+            names (list(str)): names of the new shots.
+            template (dict): A configuration file to generate tasks and dependencies for the new shots from.
+            reduce_dependencies (bool): store only the transitive reduction of the template dependencies.
+                See :meth:`tasker.templates.CompiledTemplate.reduced`.
+
+        """
+        log.info('New Shots {count}'.format(count=len(names)))
+        shot_ids = _new_holders_bulk(project_id=self.id, holder_model=ShotData, names=names, template=template,
+                                     reduce_dependencies=reduce_dependencies)
+        events.publish(events.ITEMS_CREATED, ids=shot_ids, kind=Shot.kind)
 
 
 class User(object):
@@ -422,6 +566,8 @@ class User(object):
 
     """
 
+    model_type = UserData
+
     def __init__(self, model):
         self.id = model.id
         self.name = model.name
@@ -430,6 +576,7 @@ class User(object):
         return self.name
 
     @property
+    @cache.cached
     def tasks(self):
         """Get all tasks for the user.
 
@@ -442,6 +589,59 @@ class User(object):
             return [Task(taskData) for taskData in tasksData]
 
 
+def _load_holder_snapshots(session, holder_model, kind, project_id):
+    """Loads all assets or shots of a project with their task trees in two queries.
+
+    Args:
+        session: open database session
+        holder_model: AssetData or ShotData
+        kind (str): 'asset' or 'shot'
+        project_id (int): id of the project to load
+
+    Returns:
+        tuple(TaskHolderSnapshot): assets or shots with their tasks.
+
+    """
+    holders = session.query(holder_model.id, holder_model.name) \
+        .filter(holder_model.project_id == project_id) \
+        .order_by(holder_model.id) \
+        .all()
+
+    # Tasks linked to the holders and recursively all their subtasks.
+    tree = session.query(TaskData.id.label('id'), holder_model.id.label('holder_id')) \
+        .join(holder_model, holder_model.task_association_id == TaskData.association_id) \
+        .filter(holder_model.project_id == project_id) \
+        .cte(name='task_tree', recursive=True)
+    child_task = aliased(TaskData)
+    tree = tree.union(session.query(child_task.id, tree.c.holder_id).filter(child_task.parent_task_id == tree.c.id))
+    rows = session.query(TaskData.id, TaskData.name, TaskData.state, TaskData.parent_task_id,
+                         UserData.id.label('user_id'), UserData.name.label('user_name'), tree.c.holder_id) \
+        .join(tree, tree.c.id == TaskData.id) \
+        .outerjoin(UserData, UserData.id == TaskData.user_id) \
+        .order_by(TaskData.id) \
+        .all()
+
+    task_ids = set(row.id for row in rows)
+    holder_tasks = defaultdict(list)
+    child_tasks = defaultdict(list)
+    for row in rows:
+        if row.parent_task_id in task_ids:
+            child_tasks[row.parent_task_id].append(row)
+        else:
+            holder_tasks[row.holder_id].append(row)
+
+    def snapshot(row):
+        children = tuple(snapshot(child) for child in child_tasks[row.id])
+        return TaskSnapshot(id=row.id, name=row.name, state=row.state, user_id=row.user_id, user_name=row.user_name,
+                            child_tasks=children)
+
+    return tuple(TaskHolderSnapshot(id=holder.id,
+                                    name=holder.name,
+                                    kind=kind,
+                                    tasks=tuple(snapshot(row) for row in holder_tasks[holder.id]))
+                 for holder in holders)
+
+
 def new_project(name):
     """Creates a new project with the given name.
 
@@ -451,8 +651,8 @@ def new_project(name):
     """
     project = ProjectData(name=name)
     with session_scope() as session:
-        exists = session.query(ProjectData).filter_by(name=name).first()
-        if exists:
+        existing = session.query(ProjectData).filter_by(name=name).first()
+        if existing:
             log.warning('Project already exists. Skipping creation.')
             return None
         log.info('Creating new Project {name}'.format(name=name))
@@ -495,15 +695,513 @@ def get_all_tasks(user=None, state=None):
     Returns:
         list(Task): all task matching the criteria.
 
+    """
+    return find_tasks(user=user, states=[state] if state else None)
+
+
+def find_tasks(project=None, parent=None, user=None, states=None, name=None, order_by='id', after=None, limit=None):
+    """Tasks matching all given filters.
+
+    Use ``after`` and ``limit`` to page through large results: pass the last task of the previous page as ``after``.
+
+    Args:
+        project (Project): tasks of the assets and shots of this project.
+        parent (Asset or Shot): tasks of this asset or shot.
+        user (User): tasks assigned to this user.
+        states (list(str)): tasks in any of these states.
+        name (str): tasks with this name, e.g. tasker.templates.lighting
+        order_by (str): 'id' or 'name'. Tasks with the same name are ordered by id.
+        after (Task): return only tasks ordered after this task.
+        limit (int): return at most this many tasks.
+
+    Returns:
+        list(Task): all tasks matching the criteria.
+
     """
     with session_scope() as session:
-        tasks_models = session.query(TaskData)
-        if user:
-            tasks_models = tasks_models.filter(UserData.id == user.id)
-        if state:
-            tasks_models = tasks_models.filter_by(state=state)
-        tasks_models = tasks_models.all()
-        return [Task(model=task_model) for task_model in tasks_models]
+        query = _task_query(session=session, project=project, parent=parent, user=user, states=states, name=name,
+                            order_by=order_by, after=after)
+        if limit is not None:
+            query = query.limit(limit)
+        return [Task(model=row) for row in query]
+
+
+def iter_tasks(project=None, parent=None, user=None, states=None, name=None, order_by='id', after=None,
+               batch_size=1000):
+    """Generator over all tasks matching the given filters.
+    Tasks are fetched page by page with :func:`find_tasks`, so any number of tasks can be walked in constant memory.
+    Every page is read in its own short session, no connection or transaction is held while the caller works on
+    the yielded tasks. The filters are the same as for :func:`find_tasks`.
+
+    Args:
+        batch_size (int): number of tasks to fetch from the database at once.
+
+    Yields:
+        Task: the next task matching the criteria.
+
+    """
+    while True:
+        tasks = find_tasks(project=project, parent=parent, user=user, states=states, name=name, order_by=order_by,
+                           after=after, limit=batch_size)
+        for task in tasks:
+            yield task
+        if len(tasks) < batch_size:
+            return
+        after = tasks[-1]
+
+
+def get_worklist(user, project, states=None):
+    """The tasks assigned to the user in the given project, loaded with one query.
+
+    Args:
+        user (User): user to get the tasks for
+        project (Project): only tasks of the assets and shots of this project. None for all projects.
+        states (list(str)): only tasks in any of these states.
+
+    Returns:
+        list(WorklistEntry): the tasks ordered by asset or shot name.
+
+    """
+    asset = aliased(AssetData)
+    shot = aliased(ShotData)
+    last_comment = select([func.max(CommentData.datetime)]) \
+        .where(CommentData.task_id == TaskData.id) \
+        .as_scalar()
+    with session_scope() as session:
+        rows = session.query(TaskData.id, TaskData.name, TaskData.state,
+                             asset.id.label('asset_id'), asset.name.label('asset_name'),
+                             shot.id.label('shot_id'), shot.name.label('shot_name'),
+                             last_comment.label('last_comment')) \
+            .outerjoin(asset, asset.task_association_id == TaskData.association_id) \
+            .outerjoin(shot, shot.task_association_id == TaskData.association_id) \
+            .filter(TaskData.user_id == user.id)
+        if project:
+            rows = rows.filter(or_(asset.project_id == project.id, shot.project_id == project.id))
+        if states:
+            rows = rows.filter(TaskData.state.in_(states))
+        rows = rows.order_by(func.coalesce(asset.name, shot.name), TaskData.id)
+        return [WorklistEntry(id=row.id, name=row.name, state=row.state, last_comment=row.last_comment,
+                              **_parent_fields(row))
+                for row in rows]
+
+
+def _parent_fields(row):
+    """parent_kind, parent_id and parent_name of a row with the asset_id, asset_name, shot_id and shot_name of
+    the outer joined asset and shot of a task.
+    """
+    if row.asset_id is not None:
+        return {'parent_kind': Asset.kind, 'parent_id': row.asset_id, 'parent_name': row.asset_name}
+    if row.shot_id is not None:
+        return {'parent_kind': Shot.kind, 'parent_id': row.shot_id, 'parent_name': row.shot_name}
+    return {'parent_kind': None, 'parent_id': None, 'parent_name': None}
+
+
+def ready_tasks(project, user=None, limit=20):
+    """The tasks which can be worked on, the ones most other tasks wait for first.
+
+    Every ready state is read in the order of the index on (project_id, state, downstream_count, id), so at most
+    limit rows per state are read and nothing is sorted, however many tasks the project has. Filtering by user
+    skips the other users' tasks while reading.
+
+    Args:
+        project (Project): only tasks of the assets and shots of this project.
+        user (User): only tasks assigned to this user. None for tasks of all users.
+        limit (int): maximum number of tasks to return.
+
+    Returns:
+        list(ReadyTask): tasks in state can_start or to_continue, most unblocked tasks first, then by id.
+
+    """
+    ranked = []
+    with session_scope() as session:
+        for state in READY_STATES:
+            rows = session.query(TaskData.id, TaskData.name, TaskData.state, TaskData.user_id,
+                                 TaskData.downstream_count) \
+                .filter(TaskData.project_id == project.id, TaskData.state == state)
+            if user:
+                rows = rows.filter(TaskData.user_id == user.id)
+            rows = rows.order_by(TaskData.downstream_count.desc(), TaskData.id).limit(limit)
+            ranked.extend(ReadyTask(id=row.id, name=row.name, state=row.state, user_id=row.user_id,
+                                    unblocks=row.downstream_count)
+                          for row in rows)
+    return heapq.nsmallest(limit, ranked, key=lambda task: (-task.unblocks, task.id))
+
+
+def state_summary(project, group_by=('kind', 'task_name', 'parent'), cached=False):
+    """Number of tasks per state, counted by the database.
+
+    Example: how many lighting tasks of each shot are done
+
+    >>> summary = state_summary(project, group_by=('parent', 'task_name'))
+    >>> [row.counts[State.done] for row in summary.rows if row.group[1] == tasker.templates.lighting]
+
+    Args:
+        project (Project): count the tasks of the assets and shots of this project.
+        group_by (tuple(str)): any of 'kind' ('asset' or 'shot'), 'parent' (asset or shot name), 'task_name'
+            and 'user' (name of the assigned user or None). Empty to count all tasks of the project together.
+        cached (bool): keep the summary in memory and update it with every state change published by
+            :mod:`tasker.events` instead of counting again. Creating or deleting assets and shots drops it.
+            The summaries of the :data:`SUMMARY_CACHE_SIZE` most recently used projects are kept,
+            see :func:`clear_state_summaries`.
+
+    Returns:
+        StateSummary: one StateCount per group, ordered by group. counts maps each state to its number of tasks.
+
+    """
+    group_by = tuple(group_by)
+    if not cached:
+        return _summary(group_by=group_by, counts=_count_states(project_id=project.id, group_by=group_by))
+    global _summaries_subscribed
+    with _summaries_lock:
+        if not _summaries_subscribed:
+            events.subscribe(_update_summaries)
+            _summaries_subscribed = True
+        counts = _summaries.get(key=(ProjectData, project.id), attribute=group_by,
+                                loader=lambda: _count_states(project_id=project.id, group_by=group_by))
+        return _summary(group_by=group_by, counts=counts)
+
+
+def clear_state_summaries():
+    """Drops all cached state summaries and stops following the change events until the next cached summary."""
+    global _summaries_subscribed
+    with _summaries_lock:
+        events.unsubscribe(_update_summaries)
+        _summaries_subscribed = False
+        _summaries.clear()
+
+
+# Number of projects whose cached state summaries are kept.
+SUMMARY_CACHE_SIZE = 20
+
+# One row per project holding group_by to {group: Counter(state: count)} of the cached state summaries.
+_summaries = cache.IdentityMap(maxsize=SUMMARY_CACHE_SIZE)
+_summaries_lock = threading.RLock()
+_summaries_subscribed = False
+
+
+def _summary(group_by, counts):
+    return StateSummary(group_by=group_by,
+                        rows=tuple(StateCount(group=group, counts=dict(counts[group]))
+                                   for group in sorted(counts, key=lambda group: [(g is not None, g) for g in group])
+                                   if counts[group]))
+
+
+def _summary_query(session, project_id, group_by, columns):
+    """Query of the group values and the given columns of all tasks of the project."""
+    holders = _project_association_ids([project_id], 'kind', 'parent').alias('holder')
+    group_columns = {'kind': holders.c.kind,
+                     'parent': holders.c.parent,
+                     'task_name': TaskData.name,
+                     'user': UserData.name,
+                     }
+    unknown = set(group_by) - set(group_columns)
+    if unknown:
+        raise ValueError('State summaries can be grouped by {columns}, not by {unknown}.'.format(
+            columns=sorted(group_columns), unknown=sorted(unknown)))
+    group = [group_columns[name] for name in group_by]
+    query = session.query(*(group + list(columns))) \
+        .select_from(TaskData) \
+        .join(holders, holders.c.association_id == TaskData.association_id)
+    if 'user' in group_by:
+        query = query.outerjoin(UserData, UserData.id == TaskData.user_id)
+    return query, group
+
+
+def _count_states(project_id, group_by):
+    """{group: Counter(state: count)} of all tasks of the project with one GROUP BY query."""
+    counts = defaultdict(Counter)
+    with session_scope() as session:
+        query, group = _summary_query(session=session, project_id=project_id, group_by=group_by,
+                                      columns=[TaskData.state, func.count(TaskData.id)])
+        for row in query.group_by(*(group + [TaskData.state])):
+            counts[tuple(row[:len(group)])][row[-2]] += row[-1]
+    return counts
+
+
+def _update_summaries(event):
+    """Keeps the cached state summaries in sync with the published changes. Only cached projects containing
+    changed tasks are touched.
+    """
+    with _summaries_lock:
+        if not len(_summaries):
+            return
+        if event.topic in (events.ITEMS_CREATED, events.ITEMS_DELETED):
+            _summaries.clear()
+            return
+        if event.topic not in (events.STATES_CHANGED, events.USERS_ASSIGNED):
+            return
+        cached_project_ids = [key[1] for key in _summaries.keys()]
+        for project_id in _project_ids_of_tasks(task_ids=event.ids, project_ids=cached_project_ids):
+            key = (ProjectData, project_id)
+            summaries = _summaries.peek(key) or {}
+            if event.topic == events.USERS_ASSIGNED:
+                if any('user' in group_by for group_by in summaries):
+                    _summaries.invalidate(key)
+                continue
+            for group_by, counts in summaries.items():
+                _apply_state_changes(project_id=project_id, group_by=group_by, counts=counts,
+                                     changes=event.changes)
+
+
+def _project_ids_of_tasks(task_ids, project_ids):
+    """The ones of the given projects which contain any of the given tasks."""
+    association_projects = _project_association_ids(project_ids, 'project_id').alias('association_project')
+    found = set()
+    with session_scope() as session:
+        for chunk in propagation.chunks(task_ids):
+            rows = session.query(association_projects.c.project_id) \
+                .join(TaskData, TaskData.association_id == association_projects.c.association_id) \
+                .filter(TaskData.id.in_(chunk)) \
+                .distinct()
+            found.update(row.project_id for row in rows)
+    return sorted(found)
+
+
+def _apply_state_changes(project_id, group_by, counts, changes):
+    """Moves the changed tasks of the project from their old to their new state count."""
+    with session_scope() as session:
+        query, group = _summary_query(session=session, project_id=project_id, group_by=group_by,
+                                      columns=[TaskData.id])
+        for chunk in propagation.chunks(changes):
+            for row in query.filter(TaskData.id.in_(chunk)):
+                old_state, new_state = changes[row[-1]]
+                task_group = tuple(row[:len(group)])
+                counts[task_group][old_state] -= 1
+                counts[task_group][new_state] += 1
+                if counts[task_group][old_state] <= 0:
+                    del counts[task_group][old_state]
+
+
+def get_task_snapshots(task_ids):
+    """Current state and assigned user of the given tasks, e.g. to refresh the tasks named by a change event.
+
+    Args:
+        task_ids (list(int)): tasks to load
+
+    Returns:
+        list(TaskSnapshot): the tasks ordered by id. Subtasks are not loaded, child_tasks is always empty.
+
+    """
+    snapshots = []
+    with session_scope() as session:
+        for chunk in propagation.chunks(sorted(set(task_ids))):
+            rows = session.query(TaskData.id, TaskData.name, TaskData.state,
+                                 UserData.id.label('user_id'), UserData.name.label('user_name')) \
+                .outerjoin(UserData, UserData.id == TaskData.user_id) \
+                .filter(TaskData.id.in_(chunk)) \
+                .order_by(TaskData.id)
+            snapshots.extend(TaskSnapshot(id=row.id, name=row.name, state=row.state, user_id=row.user_id,
+                                          user_name=row.user_name, child_tasks=()) for row in rows)
+    return snapshots
+
+
+def set_states(tasks_or_ids, state, comment=None):
+    """Changes the state of many tasks at once, e.g. to reject all lighting tasks of a sequence.
+
+    All transitions are checked with :func:`check_transitions` first. The states and comments are
+    written in one transaction and the tasks downstream of all of them are updated with a single propagation.
+
+    Args:
+        tasks_or_ids (list(Task or int)): tasks to change
+        state (str): name of the new state
+        comment (str): added to every changed task. None to add no comment.
+
+    Returns:
+        dict(int, tuple(str, str)): task id to (old state, new state) for every changed task, the given tasks and
+        the tasks depending on them.
+
+    Raises:
+        ValueError: if the state of any task may not be changed. Nothing is changed in that case.
+
+    """
+    task_ids = sorted(set(getattr(task, 'id', task) for task in tasks_or_ids))
+    if not task_ids:
+        return {}
+    time = datetime.datetime.now()
+    with session_scope() as session:
+        old_states, errors = _check_transitions(session, task_ids, state)
+        if errors:
+            raise ValueError('State {state} not allowed for tasks {errors}.'.format(
+                state=state, errors=', '.join('{id} ({reason})'.format(id=task_id, reason=reason)
+                                              for task_id, reason in sorted(errors.items()))))
+        log.info('{count} tasks set to {state}'.format(count=len(task_ids), state=state))
+        for chunk in propagation.chunks(task_ids):
+            session.execute(TaskData.__table__.update().where(TaskData.id.in_(chunk)).values(state=state))
+        if comment:
+            session.execute(CommentData.__table__.insert(), [{'task_id': task_id, 'text': comment, 'datetime': time}
+                                                             for task_id in task_ids])
+            for chunk in propagation.chunks(task_ids):
+                fulltext.index(session, select([CommentData.id, CommentData.text])
+                               .where(and_(CommentData.task_id.in_(chunk), CommentData.datetime == time)))
+        changes = propagation.propagate(session=session, task_ids=task_ids)
+    for task_id in task_ids:
+        changes[task_id] = (old_states[task_id], changes.get(task_id, (None, state))[1])
+    cache.invalidate(TaskData, *changes)
+    events.publish(events.STATES_CHANGED, ids=changes, changes=changes)
+    if comment:
+        events.publish(events.COMMENTS_ADDED, ids=task_ids)
+    return changes
+
+
+def check_transitions(task_ids, new_state):
+    """Checks for many tasks at once whether they may change to the new state.
+
+    A transition is not allowed if the task already has the state, if the task is done and the new state isn't
+    reject or if any of the tasks it depends on isn't done. One query checks up to
+    :data:`tasker.propagation.CHUNK_SIZE` tasks.
+
+    Args:
+        task_ids (list(int)): tasks to check
+        new_state (str): name of the new state
+
+    Returns:
+        dict(int, Transition): task id to the result of the check.
+
+    """
+    task_ids = sorted(set(task_ids))
+    with session_scope() as session:
+        states, errors = _check_transitions(session, task_ids, new_state)
+    return dict((task_id, Transition(id=task_id, state=states.get(task_id), allowed=task_id not in errors,
+                                     reason=errors.get(task_id)))
+                for task_id in task_ids)
+
+
+def _check_transitions(session, task_ids, state):
+    """Checks the state change of the given tasks with one query per chunk of ids.
+
+    Returns:
+        tuple(dict(int, str), dict(int, str)): task id to current state and task id to the reason why the state
+        may not be set, for the tasks which may not change.
+
+    """
+    dependency = aliased(TaskData)
+    waiting = exists(select([task_to_task.c.left_task_id])
+                     .select_from(task_to_task.join(dependency, dependency.id == task_to_task.c.right_task_id))
+                     .where(task_to_task.c.left_task_id == TaskData.id)
+                     .where(dependency.state != State.done))
+    states, errors = {}, {}
+    for chunk in propagation.chunks(task_ids):
+        for row in session.query(TaskData.id, TaskData.state, waiting.label('waiting')).filter(TaskData.id.in_(chunk)):
+            states[row.id] = row.state
+            if row.waiting:
+                errors[row.id] = DEPENDENCIES_NOT_DONE
+    for task_id in task_ids:
+        current = states.get(task_id)
+        if current is None:
+            errors[task_id] = UNKNOWN_TASK
+        elif current == state:
+            errors[task_id] = SAME_STATE
+        elif current == State.done and state != State.reject:
+            errors[task_id] = DONE_WITHOUT_REJECT
+    return states, errors
+
+
+def _project_association_ids(project_ids, *columns):
+    """Association ids of all assets and shots of the projects, e.g. to select their tasks.
+
+    Args:
+        project_ids (list(int)): projects of the assets and shots
+        *columns (str): additional columns of each asset and shot: 'kind', 'parent' for its name and 'project_id'.
+
+    Returns:
+        union_all of the association_id and the additional columns of the assets and shots.
+
+    """
+    selects = []
+    for holder_model, kind in ((AssetData, Asset.kind), (ShotData, Shot.kind)):
+        values = {'kind': literal(kind),
+                  'parent': holder_model.name,
+                  'project_id': holder_model.project_id,
+                  }
+        selects.append(select([holder_model.task_association_id.label('association_id')] +
+                              [values[name].label(name) for name in columns])
+                       .where(holder_model.project_id.in_(project_ids)))
+    return union_all(*selects)
+
+
+def _task_query(session, project, parent, user, states, name, order_by, after):
+    """Builds the query for :func:`find_tasks` and :func:`iter_tasks`. Only ids and names are selected."""
+    orderings = {'id': [TaskData.id],
+                 'name': [TaskData.name, TaskData.id],
+                 }
+    if order_by not in orderings:
+        raise ValueError('Tasks can be ordered by {orderings}, not by {order_by}.'.format(
+            orderings=sorted(orderings), order_by=order_by))
+
+    query = session.query(TaskData.id, TaskData.name)
+    if project:
+        query = query.filter(TaskData.association_id.in_(_project_association_ids([project.id])))
+    if parent:
+        association_id = select([parent.model_type.task_association_id]) \
+            .where(parent.model_type.id == parent.id) \
+            .as_scalar()
+        query = query.filter(TaskData.association_id == association_id)
+    if user:
+        query = query.filter(TaskData.user_id == user.id)
+    if states:
+        query = query.filter(TaskData.state.in_(states))
+    if name:
+        query = query.filter(TaskData.name == name)
+    if after:
+        if order_by == 'name':
+            query = query.filter(or_(TaskData.name > after.name,
+                                     and_(TaskData.name == after.name, TaskData.id > after.id)))
+        else:
+            query = query.filter(TaskData.id > after.id)
+    return query.order_by(*orderings[order_by])
+
+
+def search_comments(query, project=None, limit=50):
+    """Finds comments containing all words of the query, best matches first.
+
+    Words match as prefix, 'render' also finds 'rendering'. Uses the full text index of :mod:`tasker.fulltext`
+    if available, otherwise every comment is scanned and the newest comments come first.
+
+    Args:
+        query (str): words to search for
+        project (Project): only comments on tasks of this project.
+        limit (int): return at most this many hits.
+
+    Returns:
+        list(CommentHit): matching comments with their task and asset or shot.
+
+    """
+    if not fulltext.words(query):
+        return []
+    asset = aliased(AssetData)
+    shot = aliased(ShotData)
+    with session_scope() as session:
+        use_index = fulltext.is_available(session.get_bind())
+        rank = func.bm25(fulltext.comment_index_column) if use_index else literal_column('NULL')
+        hits = session.query(CommentData.id, CommentData.text, CommentData.datetime,
+                             TaskData.id.label('task_id'), TaskData.name.label('task_name'),
+                             asset.id.label('asset_id'), asset.name.label('asset_name'),
+                             shot.id.label('shot_id'), shot.name.label('shot_name'), rank.label('rank'))
+        if use_index:
+            hits = hits.select_from(fulltext.comment_index) \
+                .join(CommentData, CommentData.id == fulltext.comment_index.c.rowid) \
+                .filter(fulltext.comment_index_column.match(fulltext.match_expression(query)))
+        else:
+            hits = hits.select_from(CommentData) \
+                .filter(*[CommentData.text.ilike('%{word}%'.format(word=_escape_like(word)), escape='\\')
+                          for word in fulltext.words(query)])
+        hits = hits.join(TaskData, TaskData.id == CommentData.task_id) \
+            .outerjoin(asset, asset.task_association_id == TaskData.association_id) \
+            .outerjoin(shot, shot.task_association_id == TaskData.association_id)
+        if project:
+            hits = hits.filter(or_(asset.project_id == project.id, shot.project_id == project.id))
+        if use_index:
+            hits = hits.order_by(literal_column('rank'), CommentData.id.desc())
+        else:
+            hits = hits.order_by(CommentData.datetime.desc(), CommentData.id.desc())
+        return [CommentHit(id=row.id, text=row.text, datetime=row.datetime, task_id=row.task_id,
+                           task_name=row.task_name, rank=row.rank, **_parent_fields(row))
+                for row in hits.limit(limit)]
+
+
+def _escape_like(text):
+    """Escapes the LIKE wildcards, so the text only matches literally. Use with escape='\\'."""
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
 
 
 def get_task_templates_by_category_name(category):
@@ -532,8 +1230,8 @@ def new_user(name):
     """
     user = UserData(name=name)
     with session_scope() as session:
-        exists = session.query(UserData).filter_by(name=name).first()
-        if exists:
+        existing = session.query(UserData).filter_by(name=name).first()
+        if existing:
             log.warning('User already exists. Skipping creation.')
             return
         log.info('Created new User {name}'.format(name=name))
@@ -569,25 +1267,93 @@ def get_user_by_name(name):
         return User(model=user)
 
 
-def tasks_from_template(template):
+def tasks_from_template(template, reduce_dependencies=False, project_id=None):
     """Converts a template to a list of tasks.
 
     Args:
-        template (dict): A configuration file to generate tasks and dependencies for the new asset from.
+        template (dict or tasker.templates.CompiledTemplate): A configuration file to generate tasks and dependencies
+            for the new asset from.
+        reduce_dependencies (bool): create only the transitive reduction of the template dependencies.
+        project_id (int): project of the asset or shot the tasks are created for.
 
     Returns:
         list(Task): tasks defined by the given template.
     """
-    tasks = []
-    for task_name in template['tasks']:
-        tasks.append(TaskData(name=task_name, state=State.can_start))
-    for task in tasks:
-        log.info('Tasks {task}'.format(task=task.name))
-        dependencies = []
-        for dependency in template['dependencies'][task.name]:
-            dependencies.extend([t for t in tasks if t.name == dependency])
-        log.info('Dependencies: {d}'.format(d=[dep.name for dep in dependencies]))
-        task.dependencies = dependencies
+    template = templates.compile_template(template)
+    if reduce_dependencies:
+        template = template.reduced()
+    tasks = [TaskData(name=task_name, state=State.can_start, downstream_count=downstream_count, project_id=project_id)
+             for task_name, downstream_count in zip(template.tasks, template.downstream_counts)]
+    for task, dependencies in zip(tasks, template.dependencies):
+        task.dependencies = [tasks[d] for d in dependencies]
+        log.debug('Task {task} depends on {d}'.format(task=task.name, d=[dep.name for dep in task.dependencies]))
         if dependencies:
             task.state = State.pending
     return tasks
+
+
+def _new_holders_bulk(project_id, holder_model, names, template, reduce_dependencies=False):
+    """Inserts assets or shots with their tasks and dependencies using one executemany per table.
+
+    On SQLite the transaction starts with BEGIN IMMEDIATE, which takes the write lock before the current maximum ids
+    are read, so the primary keys can be assigned up front. Other writers wait until the new items are committed.
+    Other databases assign the ids from their sequences, the items are inserted through the ORM there.
+
+    Args:
+        project_id (int): project to add the new items to
+        holder_model: AssetData or ShotData
+        names (list(str)): names of the new items
+        template (dict or tasker.templates.CompiledTemplate): A configuration file to generate tasks and dependencies
+            for the new items from.
+        reduce_dependencies (bool): create only the transitive reduction of the template dependencies.
+
+    Returns:
+        list(int): ids of the new items.
+
+    """
+    names = list(names)
+    if not names:
+        return []
+    template = templates.compile_template(template)
+    if reduce_dependencies:
+        template = template.reduced()
+    task_names = template.tasks
+    dependencies = template.dependencies
+    states = [State.pending if task_dependencies else State.can_start for task_dependencies in dependencies]
+    discriminator = holder_model.task_association.property.mapper.polymorphic_identity
+    association_table = holder_model.task_association.property.mapper.local_table
+
+    with session_scope() as session:
+        if session.get_bind().dialect.name != 'sqlite':
+            items = [holder_model(name=name, project_id=project_id,
+                                  tasks=tasks_from_template(template=template, project_id=project_id))
+                     for name in names]
+            session.add_all(items)
+            session.flush()
+            return [item.id for item in items]
+
+        session.execute('BEGIN IMMEDIATE')
+        next_association_id, next_task_id, next_holder_id = [
+            (session.query(func.max(model_id)).scalar() or 0) + 1
+            for model_id in (association_table.c.id, TaskData.id, holder_model.id)]
+
+        associations, tasks, task_links, holders = [], [], [], []
+        for offset, name in enumerate(names):
+            association_id = next_association_id + offset
+            first_task_id = next_task_id + offset * len(task_names)
+            associations.append({'id': association_id, 'discriminator': discriminator})
+            holders.append({'id': next_holder_id + offset, 'name': name, 'project_id': project_id,
+                            'task_association_id': association_id})
+            for index, task_name in enumerate(task_names):
+                tasks.append({'id': first_task_id + index, 'name': task_name, 'state': states[index],
+                              'downstream_count': template.downstream_counts[index], 'project_id': project_id,
+                              'association_id': association_id})
+                task_links.extend({'left_task_id': first_task_id + index, 'right_task_id': first_task_id + dependency}
+                                  for dependency in dependencies[index])
+
+        session.execute(association_table.insert(), associations)
+        session.execute(TaskData.__table__.insert(), tasks)
+        if task_links:
+            session.execute(task_to_task.insert(), task_links)
+        session.execute(holder_model.__table__.insert(), holders)
+    return [holder['id'] for holder in holders]
@@ -2,6 +2,12 @@
 This file is uses to specifie the database type and its location on the file system.
 The first step to determin the database location is to look up the env variable TASKER_DB.
 If this isn't existing the database will be located in the tasker module as tasker.db.
+
+SQLite databases are opened with a tuned performance profile, see :data:`sqlite_pragmas`.
+The journal mode defaults to DELETE, which is safe for a database on a network share.
+If all processes run on the same host set the env variable TASKER_DB_JOURNAL_MODE to WAL,
+so artists can keep reading while a state change is written.
+The connection pool size can be set with TASKER_DB_POOL_SIZE and TASKER_DB_MAX_OVERFLOW.
 """
 import os, inspect
 
@@ -14,3 +20,60 @@ if not db_path:
     db_path = os.path.join(tasker_dir, default_db)
 
 database = db_type + db_path
+
+journal_mode = os.getenv('TASKER_DB_JOURNAL_MODE', 'DELETE').upper()
+
+# Pragmas applied to every new SQLite connection, in this order.
+# NORMAL syncs are only safe against power loss with WAL, the rollback journal needs FULL.
+sqlite_pragmas = [('journal_mode', journal_mode),
+                  ('synchronous', 'NORMAL' if journal_mode == 'WAL' else 'FULL'),
+                  ('busy_timeout', 30000),  # ms to wait for a lock before failing
+                  ('mmap_size', 268435456),  # 256 MB
+                  ('cache_size', -65536),  # 64 MB
+                  ]
+
+pool_size = int(os.getenv('TASKER_DB_POOL_SIZE', 5))
+max_overflow = int(os.getenv('TASKER_DB_MAX_OVERFLOW', 10))
+
+
+def create_engine(url=database, **kwargs):
+    """Creates an engine for the given database url with the tasker performance profile.
+
+    File based SQLite databases get a connection pool which may be shared between threads and the
+    :data:`sqlite_pragmas` are applied to every new connection.
+
+    Args:
+        url (str): database url, by default the configured tasker database.
+        **kwargs: passed on to :func:`sqlalchemy.create_engine`
+
+    Returns:
+        sqlalchemy.engine.Engine: the new engine.
+
+    """
+    from sqlalchemy import create_engine, event
+    from sqlalchemy.engine.url import make_url
+    from sqlalchemy.pool import QueuePool
+
+    url = make_url(url)
+    if url.get_backend_name() != 'sqlite':
+        kwargs.setdefault('pool_size', pool_size)
+        kwargs.setdefault('max_overflow', max_overflow)
+        return create_engine(url, **kwargs)
+
+    if url.database and url.database != ':memory:':
+        kwargs.setdefault('poolclass', QueuePool)
+        kwargs.setdefault('pool_size', pool_size)
+        kwargs.setdefault('max_overflow', max_overflow)
+        kwargs.setdefault('connect_args', {'check_same_thread': False})
+    engine = create_engine(url, **kwargs)
+    event.listen(engine, 'connect', _apply_sqlite_pragmas)
+    return engine
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in sqlite_pragmas:
+            cursor.execute('PRAGMA {name}={value}'.format(name=name, value=value))
+    finally:
+        cursor.close()
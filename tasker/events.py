@@ -0,0 +1,80 @@
+"""Change events of the :mod:`tasker.control` api.
+
+Every write done through :mod:`tasker.control` publishes an :class:`Event` after its transaction was committed.
+The event names the affected rows, so views can patch just those instead of reloading everything.
+Subscribers are called synchronously in the thread which did the change.
+
+>>> import tasker.events
+>>> def on_change(event):
+>>>     print(event.topic, event.ids)
+>>> tasker.events.subscribe(on_change)
+>>> task.state = tasker.model.State.done  # prints 'states_changed' and the ids of every task which changed state
+
+"""
+import threading
+from collections import namedtuple
+
+from tasker import log
+
+__author__ = 'Dominik'
+
+STATES_CHANGED = 'states_changed'
+USERS_ASSIGNED = 'users_assigned'
+COMMENTS_ADDED = 'comments_added'
+ITEMS_CREATED = 'items_created'
+ITEMS_DELETED = 'items_deleted'
+
+# topic: one of the topics above.
+# ids: ids of the changed tasks, for ITEMS_CREATED and ITEMS_DELETED the ids of the assets or shots.
+# changes: task id to (old value, new value) for STATES_CHANGED (states) and USERS_ASSIGNED (user ids).
+# kind: 'asset' or 'shot' for ITEMS_CREATED and ITEMS_DELETED, otherwise None.
+Event = namedtuple('Event', ['topic', 'ids', 'changes', 'kind'])
+
+_subscribers = []
+_lock = threading.Lock()
+
+
+def subscribe(callback):
+    """Calls the callback with every :class:`Event` published from now on.
+
+    Args:
+        callback (callable): called with the event as only argument.
+
+    """
+    with _lock:
+        if callback not in _subscribers:
+            _subscribers.append(callback)
+
+
+def unsubscribe(callback):
+    with _lock:
+        if callback in _subscribers:
+            _subscribers.remove(callback)
+
+
+def has_subscribers():
+    return bool(_subscribers)
+
+
+def publish(topic, ids, changes=None, kind=None):
+    """Sends an event to all subscribers. Errors raised by subscribers are logged and don't stop the others.
+
+    Args:
+        topic (str): what happened, e.g. :data:`STATES_CHANGED`
+        ids (iterable(int)): ids of the affected rows. Nothing is sent if empty.
+        changes (dict(int, tuple)): row id to (old value, new value)
+        kind (str): 'asset' or 'shot' for events about items
+
+    """
+    ids = tuple(sorted(set(ids)))
+    if not ids or not _subscribers:
+        return
+    event = Event(topic=topic, ids=ids, changes=dict(changes or {}), kind=kind)
+    with _lock:
+        subscribers = list(_subscribers)
+    for callback in subscribers:
+        try:
+            callback(event)
+        except Exception as e:
+            log.exception('Subscriber {callback} failed on {topic}: {error}'.format(
+                callback=callback, topic=topic, error=e))
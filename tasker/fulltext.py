@@ -0,0 +1,139 @@
+"""Full text index of the task comments.
+
+On SQLite databases with FTS5 support the comments are indexed in the virtual table ``comment_fts``.
+The index is created by :func:`tasker.init` and the comments written by tasker are added with :func:`index`.
+There are no triggers on the ``comment`` table, clients whose SQLite lacks FTS5 keep writing comments
+and search them with a slower LIKE search, see :func:`tasker.control.search_comments`. Their comments
+are added to the index the next time a client with FTS5 calls :func:`tasker.init`.
+
+Rebuild the index of an existing database, e.g. after comments were edited or deleted outside of tasker::
+
+    python -m tasker.fulltext
+    python -m tasker.fulltext --db sqlite:////mnt/projects/tasker.db
+
+"""
+import argparse
+import logging
+import re
+import weakref
+
+from sqlalchemy import literal_column
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.sql import column, table
+
+from tasker import log
+
+__author__ = 'Dominik'
+
+COMMENT_INDEX = 'comment_fts'
+
+comment_index = table(COMMENT_INDEX, column('rowid'), column('text'))
+# The table name doubles as the column which is matched and ranked.
+comment_index_column = literal_column(COMMENT_INDEX)
+
+_create_statement = \
+    "CREATE VIRTUAL TABLE IF NOT EXISTS comment_fts USING fts5(text, content='comment', content_rowid='id')"
+
+# Triggers of older tasker versions. They broke every comment insert of clients without FTS5.
+_obsolete_triggers = ['comment_fts_insert', 'comment_fts_delete', 'comment_fts_update']
+
+# Comments which are not in the index yet. The docsize table holds one row per indexed comment.
+_index_missing_statement = \
+    "INSERT INTO comment_fts(rowid, text) SELECT id, text FROM comment " \
+    "WHERE id NOT IN (SELECT id FROM comment_fts_docsize)"
+
+_available = weakref.WeakKeyDictionary()
+
+
+def setup(engine):
+    """Creates the comment index if missing and adds the comments which are not indexed yet.
+
+    Args:
+        engine: engine of the database. Nothing is done for databases other than SQLite.
+
+    Returns:
+        bool: True if the index is available.
+
+    """
+    if engine.dialect.name != 'sqlite':
+        _available[engine] = False
+        return False
+    with engine.begin() as connection:
+        for trigger in _obsolete_triggers:
+            connection.execute('DROP TRIGGER IF EXISTS {name}'.format(name=trigger))
+    try:
+        with engine.begin() as connection:
+            existed = engine.dialect.has_table(connection, COMMENT_INDEX)
+            connection.execute(_create_statement)
+            if existed:
+                connection.execute(_index_missing_statement)
+            else:
+                _rebuild(connection)
+    except OperationalError as e:
+        log.warning('No full text search for comments, SQLite lacks FTS5: {error}'.format(error=e))
+        _available[engine] = False
+        return False
+    _available[engine] = True
+    return True
+
+
+def is_available(engine):
+    """True if the comments of the database can be searched with the full text index."""
+    return _available.get(engine, False)
+
+
+def index(session, comments):
+    """Adds new comments to the index. Does nothing if the index is not available.
+    Call it in the transaction which inserts the comments.
+
+    Args:
+        session: session which inserted the comments.
+        comments: select of the id and text of the new comments.
+
+    """
+    if is_available(session.get_bind()):
+        session.execute(comment_index.insert().from_select(['rowid', 'text'], comments))
+
+
+def rebuild(engine):
+    """Refills the comment index from the comment table."""
+    if not setup(engine):
+        raise RuntimeError('Full text search is not available for {url}.'.format(url=engine.url))
+    with engine.begin() as connection:
+        _rebuild(connection)
+    log.info('Rebuilt the comment index of {url}.'.format(url=engine.url))
+
+
+def _rebuild(connection):
+    connection.execute("INSERT INTO comment_fts(comment_fts) VALUES ('rebuild')")
+
+
+def match_expression(text):
+    """Converts free text into an FTS5 query. Every word has to be found, words also match as prefix.
+
+    Args:
+        text (str): words to search for
+
+    Returns:
+        str: the FTS5 query or an empty string if the text contains no words.
+
+    """
+    return ' '.join('"{word}"*'.format(word=word) for word in words(text))
+
+
+def words(text):
+    return re.findall(r'\w+', text or '', re.UNICODE)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Rebuilds the full text index of the task comments.')
+    parser.add_argument('--db', help='database url. Defaults to the database configured in tasker.db_config.')
+    args = parser.parse_args(argv)
+
+    import tasker
+    tasker.setup_logging(level=logging.INFO)
+    rebuild(tasker.init(url=args.db))
+
+
+if __name__ == '__main__':
+    main()
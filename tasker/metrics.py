@@ -0,0 +1,245 @@
+"""SQL query counts and timings for the :mod:`tasker.control` api.
+
+Every statement tasker sends to the database is counted, timed and tagged with the public :mod:`tasker.control`
+function or property which issued it, e.g. 'Project.load_tree' or 'Task.state'.
+Nothing is recorded until recording is switched on, either globally or for a block of code:
+
+>>> import tasker.metrics
+>>> with tasker.metrics.record() as recorder:
+>>>     project.load_tree()
+>>> recorder.snapshot()['queries']
+
+>>> tasker.metrics.enable(slow_query_threshold=0.5)  # also log statements slower than 0.5 seconds
+>>> tasker.metrics.snapshot()
+>>> tasker.metrics.reset()
+
+"""
+import heapq
+import itertools
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from tasker import log
+
+__author__ = 'Dominik'
+
+UNTAGGED = '<untagged>'
+
+
+class Recorder(object):
+    """Collects query counts and timings.
+
+    Args:
+        slowest (int): number of slowest statements to keep.
+    """
+
+    def __init__(self, slowest=10):
+        super(Recorder, self).__init__()
+        self.slowest = slowest
+        self._lock = threading.Lock()
+        self._counter = itertools.count()
+        self.reset()
+
+    def reset(self):
+        """Drops everything recorded so far."""
+        with self._lock:
+            self._queries = 0
+            self._time = 0.0
+            self._operations = {}
+            self._slowest = []
+
+    def add_session(self, operation):
+        with self._lock:
+            self._operation(operation)['sessions'] += 1
+
+    def add_query(self, operation, statement, duration):
+        with self._lock:
+            self._queries += 1
+            self._time += duration
+            stats = self._operation(operation)
+            stats['queries'] += 1
+            stats['time'] += duration
+            entry = (duration, next(self._counter), statement, operation)
+            if len(self._slowest) < self.slowest:
+                heapq.heappush(self._slowest, entry)
+            elif self.slowest:
+                heapq.heappushpop(self._slowest, entry)
+
+    def _operation(self, operation):
+        if operation not in self._operations:
+            self._operations[operation] = {'sessions': 0, 'queries': 0, 'time': 0.0}
+        return self._operations[operation]
+
+    def snapshot(self):
+        """Everything recorded so far.
+
+        Returns:
+            dict: 'queries' and 'time' (seconds) in total, 'operations' with 'sessions', 'queries' and 'time' per
+            tagged operation and 'slowest', the slowest statements with their 'statement', 'time' and 'operation'.
+            'sessions' counts the :func:`tasker.session_scope` blocks of the operation, not how often it was
+            called. An operation reading in pages, e.g. :func:`tasker.control.iter_tasks`, opens one per page.
+
+        """
+        with self._lock:
+            return {'queries': self._queries,
+                    'time': self._time,
+                    'operations': dict((operation, dict(stats)) for operation, stats in self._operations.items()),
+                    'slowest': [{'statement': statement, 'time': duration, 'operation': operation}
+                                for duration, _, statement, operation in sorted(self._slowest, reverse=True)],
+                    }
+
+
+_recorders = []
+_global_recorder = None
+_slow_query_threshold = None
+_listening = False
+_local = threading.local()
+
+
+def enable(slow_query_threshold=None, slowest=10):
+    """Starts recording globally.
+
+    Args:
+        slow_query_threshold (float): log statements taking longer than this many seconds. None to disable logging.
+        slowest (int): number of slowest statements to keep.
+
+    """
+    global _global_recorder, _slow_query_threshold
+    disable()
+    _slow_query_threshold = slow_query_threshold
+    _global_recorder = Recorder(slowest=slowest)
+    _start(_global_recorder)
+
+
+def disable():
+    """Stops recording globally. Recorders of :func:`record` blocks keep running."""
+    global _global_recorder, _slow_query_threshold
+    if _global_recorder is not None:
+        _stop(_global_recorder)
+    _global_recorder = None
+    _slow_query_threshold = None
+
+
+def snapshot():
+    """Everything recorded globally since :func:`enable` or the last :func:`reset`. See :meth:`Recorder.snapshot`."""
+    if _global_recorder is None:
+        return Recorder().snapshot()
+    return _global_recorder.snapshot()
+
+
+def reset():
+    """Drops everything recorded globally so far."""
+    if _global_recorder is not None:
+        _global_recorder.reset()
+
+
+@contextmanager
+def record(slowest=10):
+    """Records all queries issued inside the with block.
+
+    Yields:
+        Recorder: recorder holding the queries of the block.
+
+    """
+    recorder = Recorder(slowest=slowest)
+    _start(recorder)
+    try:
+        yield recorder
+    finally:
+        _stop(recorder)
+
+
+def is_recording():
+    return bool(_recorders)
+
+
+def push_operation():
+    """Tags the queries of a new session with the calling :mod:`tasker.control` operation.
+    Called by :func:`tasker.session_scope`.
+
+    Returns:
+        bool: True if an operation was pushed and has to be popped with :func:`pop_operation`.
+
+    """
+    recorders = _recorders
+    if not recorders:
+        return False
+    operation = _calling_operation(sys._getframe(1))
+    _operation_stack().append(operation)
+    for recorder in recorders:
+        recorder.add_session(operation)
+    return True
+
+
+def pop_operation(pushed):
+    if pushed:
+        _operation_stack().pop()
+
+
+def _operation_stack():
+    if not hasattr(_local, 'operations'):
+        _local.operations = []
+    return _local.operations
+
+
+def _calling_operation(frame):
+    """Name of the outermost public tasker.control function or method in the call stack above the given frame."""
+    operation = UNTAGGED
+    while frame is not None:
+        if frame.f_globals.get('__name__') == 'tasker.control':
+            name = frame.f_code.co_name
+            if not name.startswith('_') and name != '<lambda>':
+                instance = frame.f_locals.get('self')
+                if instance is not None:
+                    name = '{cls}.{name}'.format(cls=type(instance).__name__, name=name)
+                operation = name
+        frame = frame.f_back
+    return operation
+
+
+def _start(recorder):
+    _listen()
+    _recorders.append(recorder)
+
+
+def _stop(recorder):
+    if recorder in _recorders:
+        _recorders.remove(recorder)
+
+
+def _listen():
+    global _listening
+    if _listening:
+        return
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+    event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    _listening = True
+
+
+def _is_tasker_connection(conn):
+    import tasker
+    return tasker.engine is not None and conn.engine is tasker.engine
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _recorders and _is_tasker_connection(conn):
+        conn.info.setdefault('tasker_query_start', []).append(time.time())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('tasker_query_start')
+    if not starts:
+        return
+    duration = time.time() - starts.pop()
+    stack = _operation_stack()
+    operation = stack[-1] if stack else UNTAGGED
+    for recorder in list(_recorders):
+        recorder.add_query(operation=operation, statement=statement, duration=duration)
+    threshold = _slow_query_threshold
+    if threshold is not None and duration > threshold:
+        log.warning('Slow query in {operation} ({duration:.3f}s): {statement}'.format(
+            operation=operation, duration=duration, statement=statement))
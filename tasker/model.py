@@ -4,13 +4,11 @@
 They shouldn't be accessed directly only through the :mod:`tasker.control` functions.
 """
 
-from sqlalchemy import Table, Column, ForeignKey, Integer, String, DateTime,  create_engine
+from sqlalchemy import Table, Column, ForeignKey, Index, Integer, String, DateTime, func, inspect, select
 from sqlalchemy.orm import relationship, backref
 from sqlalchemy.ext.declarative import as_declarative, declared_attr
 from sqlalchemy.ext.associationproxy import association_proxy
 
-from tasker.db_config import database
-
 __author__ = 'Dominik'
 
 class State(object):
@@ -44,7 +42,7 @@ class Base(object):
 #mapping tables for taskData self reliant dependencie and depender mapping
 task_to_task = Table('task_to_task', Base.metadata,
                      Column('left_task_id', Integer, ForeignKey('task.id'), primary_key=True),
-                     Column('right_task_id', Integer, ForeignKey('task.id'), primary_key=True))
+                     Column('right_task_id', Integer, ForeignKey('task.id'), primary_key=True, index=True))
 
 
 asset_to_layout= Table('asset_to_layout', Base.metadata,
@@ -66,9 +64,9 @@ class TaskAssociation(Base):
 
 class TaskData(Base):
     id = Column(Integer, primary_key=True)
-    state = Column(String)
-    name = Column(String(50), nullable=False)
-    user_id = Column(Integer, ForeignKey('user.id'))
+    state = Column(String, index=True)
+    name = Column(String(50), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey('user.id'), index=True)
     user = relationship('UserData', back_populates='tasks')
     comments = relationship('CommentData',
                             cascade="all, delete-orphan",
@@ -89,17 +87,32 @@ class TaskData(Base):
                                 backref="depender")
 
     # one to many self-reliant mapping for subtasks for the current taskData. Example: http://docs.sqlalchemy.org/en/latest/orm/basic_relationships.html
-    parent_task_id = Column(Integer, ForeignKey('task.id'))
+    parent_task_id = Column(Integer, ForeignKey('task.id'), index=True)
     parent_task = relationship('TaskData',
                                remote_side=[id],
                                backref='child_tasks')
 
+    # Number of tasks depending directly or indirectly on this task. Set from the template on creation.
+    downstream_count = Column(Integer, nullable=False, default=0, server_default='0')
+
+    # Project of the asset or shot of the task. Set on creation for project wide queries without joins.
+    project_id = Column(Integer, ForeignKey('project.id'))
+
+
+# Tasks of one asset or shot, optionally of one state.
+Index('ix_task_association_id_state', TaskData.association_id, TaskData.state, TaskData.downstream_count)
+# Ready queue of a project: tasks of one state with the most dependers first, see tasker.control.ready_tasks.
+Index('ix_task_project_id_state', TaskData.project_id, TaskData.state, TaskData.downstream_count.desc(), TaskData.id)
+
+# Indexes of older tasker versions which are covered by the ones above.
+OBSOLETE_INDEXES = {'task': ['ix_task_association_id', 'ix_task_state_downstream_count']}
+
 
 
 class HasTasks(object):
     @declared_attr
     def task_association_id(cls):
-        return Column(Integer, ForeignKey('task_association.id'))
+        return Column(Integer, ForeignKey('task_association.id'), index=True)
 
     @declared_attr
     def task_association(cls):
@@ -129,7 +142,10 @@ class CommentData(Base):
     id = Column(Integer, primary_key=True)
     text = Column(String(200), nullable=False)
     datetime = Column(DateTime)
-    task_id = Column(Integer, ForeignKey('task.id'))
+    task_id = Column(Integer, ForeignKey('task.id'), index=True)
+
+    # Newest comment of a task without touching the table, see tasker.control.get_worklist.
+    __table_args__ = (Index('ix_comment_task_id_datetime', 'task_id', 'datetime'),)
 
 
 class AssetData(HasTasks, Base):
@@ -137,7 +153,7 @@ class AssetData(HasTasks, Base):
     layouts = relationship('LayoutData',
                            secondary=asset_to_layout,
                            back_populates='assets')
-    project_id = Column(Integer, ForeignKey('project.id'))
+    project_id = Column(Integer, ForeignKey('project.id'), index=True)
     project = relationship('ProjectData',
                            back_populates='assets')
 
@@ -145,7 +161,7 @@ class AssetData(HasTasks, Base):
 class ShotData(HasTasks, Base):
     name = Column(String(50), nullable=False)
 
-    project_id = Column(Integer, ForeignKey('project.id'))
+    project_id = Column(Integer, ForeignKey('project.id'), index=True)
     project = relationship('ProjectData', back_populates='shots')
 
     layouts = relationship('LayoutData',
@@ -174,7 +190,7 @@ class LayoutData(Base):
 class ProjectData(Base):
     __tablename__ = 'project'
     id = Column(Integer, primary_key=True)
-    name = Column(String(50), nullable=False)
+    name = Column(String(50), nullable=False, index=True)
     assets = relationship('AssetData',
                           back_populates='project',
                           )
@@ -189,10 +205,67 @@ class ProjectData(Base):
 
 
 class UserData(Base):
-    name=Column(String(20), nullable=False)
+    name=Column(String(20), nullable=False, index=True)
     tasks = relationship('TaskData',
                          back_populates='user'
                          )
 
-engine = create_engine(database)
-Base.metadata.create_all(engine)
+
+def upgrade_schema(bind):
+    """Upgrades a database created by an older tasker version in place.
+    Tables are expected to exist already. Missing columns and indexes on existing tables are created and
+    obsolete indexes are dropped.
+
+    Args:
+        bind: engine or connection to the database to upgrade.
+
+    """
+    inspector = inspect(bind)
+    existing_tables = set(inspector.get_table_names())
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing_columns = set(column['name'] for column in inspector.get_columns(table.name))
+        for column in table.columns:
+            if column.name not in existing_columns:
+                _add_column(bind, column)
+        existing_indexes = set(index['name'] for index in inspector.get_indexes(table.name))
+        for index in table.indexes:
+            if index.name not in existing_indexes:
+                index.create(bind)
+        for name in OBSOLETE_INDEXES.get(table.name, ()):
+            if name in existing_indexes:
+                bind.execute('DROP INDEX {name}'.format(name=name))
+
+
+def _add_column(bind, column):
+    """Adds a column to an existing table and fills it where needed."""
+    column_type = column.type.compile(dialect=bind.dialect)
+    default = ' DEFAULT {value}'.format(value=column.server_default.arg) if column.server_default is not None else ''
+    not_null = ' NOT NULL' if not column.nullable and default else ''
+    bind.execute('ALTER TABLE {table} ADD COLUMN {column} {type}{not_null}{default}'.format(
+        table=column.table.name, column=column.name, type=column_type, not_null=not_null, default=default))
+    if column is TaskData.__table__.c.downstream_count:
+        _fill_downstream_counts(bind)
+    elif column is TaskData.__table__.c.project_id:
+        _fill_task_project_ids(bind)
+
+
+def _fill_downstream_counts(bind):
+    """Counts the direct and indirect dependers of every task with one recursive query."""
+    downstream = select([task_to_task.c.right_task_id.label('task_id'),
+                         task_to_task.c.left_task_id.label('depender_id')]) \
+        .cte(name='downstream', recursive=True)
+    downstream = downstream.union(select([downstream.c.task_id, task_to_task.c.left_task_id])
+                                  .where(task_to_task.c.right_task_id == downstream.c.depender_id))
+    task = TaskData.__table__
+    count = select([func.count()]).where(downstream.c.task_id == task.c.id).as_scalar()
+    bind.execute(task.update().values(downstream_count=count))
+
+
+def _fill_task_project_ids(bind):
+    """Copies the project of the asset or shot to every task."""
+    task = TaskData.__table__
+    project_ids = [select([holder.project_id]).where(holder.task_association_id == task.c.association_id).as_scalar()
+                   for holder in (AssetData, ShotData)]
+    bind.execute(task.update().values(project_id=func.coalesce(*project_ids)))
@@ -0,0 +1,146 @@
+"""Dependency propagation for task states.
+
+If a task state changes, tasks depending on it may be ready to start, to continue or have to be put on hold.
+:func:`propagate` loads all tasks downstream of the changed tasks at once, evaluates every one of them exactly once
+in topological order and writes the changed states back with a single batched UPDATE.
+"""
+from collections import defaultdict, deque
+
+from sqlalchemy import bindparam, select
+
+from tasker import log
+from tasker.model import State, TaskData, task_to_task
+
+__author__ = 'Dominik'
+
+# Keeps IN clauses below the SQLite host parameter limit.
+CHUNK_SIZE = 500
+
+
+def next_state(state, dependency_states):
+    """The state a task should have, given the states of the tasks it depends on.
+
+    - Any rejected dependency puts the task on hold.
+    - If all dependencies are done, a pending task can start and a task on hold is to be continued.
+    - Otherwise the task keeps its state.
+
+    Args:
+        state (str): current state of the task
+        dependency_states (list(str)): current states of all tasks the task depends on
+
+    Returns:
+        str: the new state of the task.
+
+    """
+    if any(dependency_state == State.reject for dependency_state in dependency_states):
+        return State.hold
+    if all(dependency_state == State.done for dependency_state in dependency_states):
+        if state == State.hold:
+            return State.to_continue
+        if state == State.pending:
+            return State.can_start
+    return state
+
+
+def propagate_states(task_ids, dependencies, states):
+    """Evaluates the given tasks once each, upstream tasks first.
+
+    Args:
+        task_ids (set(int)): tasks to evaluate
+        dependencies (dict(int, list(int))): task id to the ids of the tasks it depends on
+        states (dict(int, str)): current states of the tasks to evaluate and their dependencies. Updated in place.
+
+    Returns:
+        dict(int, tuple(str, str)): task id to (old state, new state) for every changed task.
+
+    """
+    pending_dependencies = dict((task_id, 0) for task_id in task_ids)
+    dependers = defaultdict(list)
+    for task_id in task_ids:
+        for dependency_id in dependencies.get(task_id, ()):
+            if dependency_id in pending_dependencies:
+                pending_dependencies[task_id] += 1
+                dependers[dependency_id].append(task_id)
+
+    ready = deque(sorted(task_id for task_id, count in pending_dependencies.items() if not count))
+    order = []
+    while ready:
+        task_id = ready.popleft()
+        order.append(task_id)
+        for depender_id in dependers[task_id]:
+            pending_dependencies[depender_id] -= 1
+            if not pending_dependencies[depender_id]:
+                ready.append(depender_id)
+    if len(order) < len(pending_dependencies):
+        cyclic = sorted(set(pending_dependencies) - set(order))
+        log.warning('Cyclic task dependencies between {ids}.'.format(ids=cyclic))
+        order.extend(cyclic)
+
+    changes = {}
+    for task_id in order:
+        old_state = states[task_id]
+        new_state = next_state(old_state, [states[d] for d in dependencies.get(task_id, ())])
+        if new_state != old_state:
+            log.info('{task} {old_state} >> {new_state}'.format(task=task_id, old_state=old_state, new_state=new_state))
+            states[task_id] = new_state
+            changes[task_id] = (old_state, new_state)
+    return changes
+
+
+def propagate(session, task_ids, include_roots=True):
+    """Updates the states of the given tasks and of all tasks downstream of them in the database.
+
+    Args:
+        session: open database session. Pending changes are flushed first.
+        task_ids (list(int)): tasks whose state changed
+        include_roots (bool): evaluate the given tasks too, not only the tasks downstream of them
+
+    Returns:
+        dict(int, tuple(str, str)): task id to (old state, new state) for every changed task.
+
+    """
+    session.flush()
+    roots = set(task_ids)
+    affected = set(roots) if include_roots else set()
+    for chunk in chunks(roots):
+        affected.update(_downstream_task_ids(session, chunk))
+    if not affected:
+        return {}
+
+    dependencies = defaultdict(list)
+    states = {}
+    for chunk in chunks(affected):
+        edges = select([task_to_task.c.left_task_id, task_to_task.c.right_task_id, TaskData.state]) \
+            .select_from(task_to_task.join(TaskData, TaskData.id == task_to_task.c.right_task_id)) \
+            .where(task_to_task.c.left_task_id.in_(chunk))
+        for task_id, dependency_id, dependency_state in session.execute(edges):
+            dependencies[task_id].append(dependency_id)
+            states[dependency_id] = dependency_state
+        tasks = select([TaskData.id, TaskData.state]).where(TaskData.id.in_(chunk))
+        states.update((row.id, row.state) for row in session.execute(tasks))
+
+    changes = propagate_states(task_ids=affected, dependencies=dependencies, states=states)
+    if changes:
+        update = TaskData.__table__.update() \
+            .where(TaskData.id == bindparam('task_id')) \
+            .values(state=bindparam('new_state'))
+        session.execute(update, [{'task_id': task_id, 'new_state': new_state}
+                                 for task_id, (_, new_state) in changes.items()])
+    return changes
+
+
+def _downstream_task_ids(session, task_ids):
+    """Ids of all tasks depending directly or indirectly on the given tasks, fetched with one recursive query."""
+    downstream = select([task_to_task.c.left_task_id.label('id')]) \
+        .where(task_to_task.c.right_task_id.in_(task_ids)) \
+        .cte(name='downstream', recursive=True)
+    downstream = downstream.union(select([task_to_task.c.left_task_id])
+                                  .where(task_to_task.c.right_task_id == downstream.c.id))
+    return [row.id for row in session.execute(select([downstream.c.id]))]
+
+
+def chunks(values, size=CHUNK_SIZE):
+    """Splits the values into lists of at most size values, e.g. to build IN clauses."""
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
@@ -0,0 +1,225 @@
+"""In-memory search over a loaded project tree.
+
+The :class:`SearchIndex` is built once from a :class:`tasker.control.ProjectSnapshot` and finds assets and shots by
+their name or by the names, states and assigned users of their tasks without touching the database.
+
+>>> import tasker.search
+>>> index = tasker.search.SearchIndex(project.load_tree())
+>>> index.filter(kind='shot', text='light')  # shots with a lighting task, a user named 'lightfoot', ...
+
+Keep it current with :meth:`SearchIndex.update_tasks`, :meth:`SearchIndex.add_item` and
+:meth:`SearchIndex.remove_item`, e.g. driven by :mod:`tasker.events`.
+"""
+from collections import Counter, OrderedDict, defaultdict
+
+__author__ = 'Dominik'
+
+# Search words shorter than this are matched against all terms instead of the trigram index.
+GRAM_SIZE = 3
+
+
+class SearchIndex(object):
+    """Case insensitive substring index of asset and shot names, task names, task states and user names.
+
+    Args:
+        snapshot (tasker.control.ProjectSnapshot): project to index. None to start empty.
+    """
+
+    def __init__(self, snapshot=None):
+        super(SearchIndex, self).__init__()
+        self._items = {'asset': OrderedDict(), 'shot': OrderedDict()}
+        self._item_terms = {}
+        self._task_items = {}
+        self._postings = defaultdict(set)
+        self._grams = defaultdict(set)
+        if snapshot is not None:
+            for item in snapshot.assets + snapshot.shots:
+                self.add_item(item)
+
+    def __len__(self):
+        return len(self._item_terms)
+
+    def contains_task(self, task_id):
+        """True if the task belongs to any indexed asset or shot."""
+        return task_id in self._task_items
+
+    def items(self, kind):
+        """Current snapshots of all indexed assets or shots in the order they were added.
+
+        Args:
+            kind (str): 'asset' or 'shot'
+
+        Returns:
+            list(tasker.control.TaskHolderSnapshot): the indexed items with all updates applied.
+
+        """
+        return list(self._items[kind].values())
+
+    def add_item(self, item):
+        """Indexes an asset or shot with all its tasks. An already indexed item is replaced.
+
+        Args:
+            item (tasker.control.TaskHolderSnapshot): the item to add.
+
+        """
+        key = (item.kind, item.id)
+        if key in self._item_terms:
+            self.remove_item(kind=item.kind, id=item.id)
+        self._items[item.kind][item.id] = item
+        terms = Counter([_normalize(item.name)])
+        for task in _walk(item.tasks):
+            self._task_items[task.id] = key
+            terms.update(_task_terms(task))
+        self._item_terms[key] = terms
+        for term in terms:
+            self._add_posting(term, key)
+
+    def remove_item(self, kind, id):
+        """Drops an asset or shot and its tasks from the index."""
+        key = (kind, id)
+        item = self._items[kind].pop(id, None)
+        terms = self._item_terms.pop(key, None)
+        if item is None:
+            return
+        for task in _walk(item.tasks):
+            self._task_items.pop(task.id, None)
+        for term in terms:
+            self._remove_posting(term, key)
+
+    def update_tasks(self, tasks):
+        """Updates state and user of the given tasks. Tasks which aren't indexed are ignored.
+
+        Args:
+            tasks (list(tasker.control.TaskSnapshot)): tasks with their new state and user,
+                e.g. from :func:`tasker.control.get_task_snapshots`.
+
+        """
+        changed = defaultdict(dict)
+        for task in tasks:
+            key = self._task_items.get(task.id)
+            if key is not None:
+                changed[key][task.id] = task
+        for key, item_tasks in changed.items():
+            kind, id = key
+            item = self._items[kind][id]
+            self._items[kind][id] = item._replace(tasks=_replace_tasks(item.tasks, item_tasks))
+            terms = self._item_terms[key]
+            for old_task in _walk(item.tasks):
+                if old_task.id not in item_tasks:
+                    continue
+                old_terms = Counter(_task_terms(old_task))
+                new_terms = Counter(_task_terms(item_tasks[old_task.id]))
+                terms.subtract(old_terms)
+                terms.update(new_terms)
+                for term in old_terms:
+                    if terms[term] <= 0:
+                        del terms[term]
+                        self._remove_posting(term, key)
+                for term in new_terms:
+                    self._add_posting(term, key)
+
+    def search(self, text):
+        """Keys of all items matching the text.
+        Every whitespace separated word of the text has to be part of the item name or of the name, state or user
+        of any of its tasks.
+
+        Args:
+            text (str): words to search for
+
+        Returns:
+            set(tuple(str, int)): (kind, id) of the matching items or None if the text has no words.
+
+        """
+        words = _normalize(text).split()
+        if not words:
+            return None
+        matches = None
+        for word in words:
+            keys = set()
+            for term in self._terms_containing(word):
+                keys.update(self._postings[term])
+            matches = keys if matches is None else matches & keys
+            if not matches:
+                return set()
+        return matches
+
+    def filter(self, kind, text):
+        """Assets or shots matching the text, see :meth:`search`.
+
+        Args:
+            kind (str): 'asset' or 'shot'
+            text (str): words to search for. All items are returned if empty.
+
+        Returns:
+            list(tasker.control.TaskHolderSnapshot): the matching items in index order.
+
+        """
+        matches = self.search(text)
+        if matches is None:
+            return self.items(kind)
+        return [item for id, item in self._items[kind].items() if (kind, id) in matches]
+
+    def _terms_containing(self, word):
+        if len(word) < GRAM_SIZE:
+            return [term for term in self._postings if word in term]
+        grams = _grams(word)
+        candidates = set(self._grams.get(grams[0], ()))
+        for gram in grams[1:]:
+            candidates &= self._grams.get(gram, set())
+            if not candidates:
+                break
+        return [term for term in candidates if word in term]
+
+    def _add_posting(self, term, key):
+        if term not in self._postings:
+            for gram in _grams(term):
+                self._grams[gram].add(term)
+        self._postings[term].add(key)
+
+    def _remove_posting(self, term, key):
+        keys = self._postings.get(term)
+        if keys is None:
+            return
+        keys.discard(key)
+        if keys:
+            return
+        del self._postings[term]
+        for gram in _grams(term):
+            terms = self._grams[gram]
+            terms.discard(term)
+            if not terms:
+                del self._grams[gram]
+
+
+def _normalize(text):
+    return (text or '').lower()
+
+
+def _grams(term):
+    return [term[i:i + GRAM_SIZE] for i in range(len(term) - GRAM_SIZE + 1)]
+
+
+def _task_terms(task):
+    return [_normalize(value) for value in (task.name, task.state, task.user_name) if value]
+
+
+def _walk(tasks):
+    """All tasks and their subtasks."""
+    stack = list(tasks)
+    while stack:
+        task = stack.pop()
+        yield task
+        stack.extend(task.child_tasks)
+
+
+def _replace_tasks(tasks, changed):
+    """The task tree with state and user of the changed tasks replaced."""
+    replaced = []
+    for task in tasks:
+        if task.child_tasks:
+            task = task._replace(child_tasks=_replace_tasks(task.child_tasks, changed))
+        if task.id in changed:
+            update = changed[task.id]
+            task = task._replace(state=update.state, user_id=update.user_id, user_name=update.user_name)
+        replaced.append(task)
+    return tuple(replaced)
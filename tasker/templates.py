@@ -4,7 +4,12 @@ tasker.templates.py
 
 Use this file to define new shot and or asset tasks, their dependencies and the order in which they appear in the UI.
 
+Templates are validated and compiled to a :class:`CompiledTemplate` once on first use.
+Use :func:`compiled` to get the compiled form of a registered template.
+
 """
+from collections import deque
+
 __author__ = 'Dominik'
 
 
@@ -94,4 +99,171 @@ shot = {'feature_animation_shot' : {'tasks' : [storyboard, mood, blockin, animat
 
 templates_by_category = {'asset': asset,
                          'shot': shot,
-                         }
\ No newline at end of file
+                         }
+
+
+class TemplateError(ValueError):
+    """Raised for templates with unknown, missing or cyclic dependencies."""
+
+
+class CompiledTemplate(object):
+    """Validated and preprocessed form of a template.
+
+    Tasks are referred to by their index in :attr:`tasks`.
+
+    Attributes:
+        name (str): name of the template if it is registered, otherwise None.
+        tasks (tuple(str)): task names in the order they appear in the UI.
+        index (dict(str, int)): task name to task index.
+        dependencies (tuple(tuple(int))): for every task the indices of the tasks it depends on.
+        dependers (tuple(tuple(int))): for every task the indices of the tasks depending on it.
+        order (tuple(int)): task indices in topological order, dependencies first.
+        downstream_counts (tuple(int)): for every task the number of tasks depending directly or indirectly on it.
+
+    Args:
+        template (dict): template with 'tasks' and 'dependencies' like the ones in this module.
+        name (str): name of the template
+
+    Raises:
+        TemplateError: if the template references unknown tasks or has cyclic dependencies.
+    """
+
+    def __init__(self, template, name=None):
+        super(CompiledTemplate, self).__init__()
+        self.name = name
+        self.tasks = tuple(template['tasks'])
+        self.index = dict((task, index) for index, task in enumerate(self.tasks))
+        if len(self.index) != len(self.tasks):
+            raise TemplateError('Template {name} lists tasks twice.'.format(name=name))
+
+        raw_dependencies = template['dependencies']
+        unknown = set(raw_dependencies) - set(self.index)
+        if unknown:
+            raise TemplateError('Template {name} has dependencies for unknown tasks {tasks}.'.format(
+                name=name, tasks=sorted(unknown)))
+        dependencies = []
+        for task in self.tasks:
+            if task not in raw_dependencies:
+                raise TemplateError('Template {name} has no dependencies entry for {task}.'.format(
+                    name=name, task=task))
+            unknown = [dependency for dependency in raw_dependencies[task] if dependency not in self.index]
+            if unknown:
+                raise TemplateError('{task} in template {name} depends on unknown tasks {tasks}.'.format(
+                    task=task, name=name, tasks=unknown))
+            dependencies.append(tuple(sorted(set(self.index[dependency] for dependency in raw_dependencies[task]))))
+        self.dependencies = tuple(dependencies)
+
+        dependers = [[] for _ in self.tasks]
+        for task, task_dependencies in enumerate(self.dependencies):
+            for dependency in task_dependencies:
+                dependers[dependency].append(task)
+        self.dependers = tuple(tuple(task_dependers) for task_dependers in dependers)
+        self.order = self._topological_order()
+        self.downstream_counts = self._downstream_counts()
+        self._reduced = None
+
+    def __repr__(self):
+        return 'CompiledTemplate: {name}'.format(name=self.name)
+
+    def _topological_order(self):
+        pending = [len(task_dependencies) for task_dependencies in self.dependencies]
+        ready = deque(task for task, count in enumerate(pending) if not count)
+        order = []
+        while ready:
+            task = ready.popleft()
+            order.append(task)
+            for depender in self.dependers[task]:
+                pending[depender] -= 1
+                if not pending[depender]:
+                    ready.append(depender)
+        if len(order) != len(self.tasks):
+            cyclic = [self.tasks[task] for task, count in enumerate(pending) if count]
+            raise TemplateError('Template {name} has cyclic dependencies between {tasks}.'.format(
+                name=self.name, tasks=cyclic))
+        return tuple(order)
+
+    def _downstream_counts(self):
+        downstream = [0] * len(self.tasks)  # bit set of all direct and indirect dependers
+        for task in reversed(self.order):
+            for depender in self.dependers[task]:
+                downstream[task] |= downstream[depender] | 1 << depender
+        return tuple(bin(tasks).count('1') for tasks in downstream)
+
+    def reduced(self):
+        """The transitive reduction of this template.
+
+        Dependencies which are implied by other dependencies are dropped. For example texturing doesn't need to
+        depend on concept if it depends on modeling, which depends on concept already.
+
+        A pending task becomes ready to start when all its dependencies are done, and a task can only be done if its
+        own dependencies are done. So for every set of done tasks the reduced template has the same tasks ready to
+        start as the full one. Rejects are different: a rejected task only puts the tasks directly depending on it
+        on hold, so in the reduced template fewer tasks go on hold and later to continue.
+
+        Returns:
+            CompiledTemplate: template with the same tasks and the minimal set of dependencies.
+
+        """
+        if self._reduced is None:
+            upstream = [0] * len(self.tasks)  # bit set of all direct and indirect dependencies
+            for task in self.order:
+                for dependency in self.dependencies[task]:
+                    upstream[task] |= upstream[dependency] | 1 << dependency
+            dependencies = {}
+            for task, task_dependencies in enumerate(self.dependencies):
+                implied = 0
+                for dependency in task_dependencies:
+                    implied |= upstream[dependency]
+                dependencies[self.tasks[task]] = [self.tasks[d] for d in task_dependencies if not implied >> d & 1]
+            self._reduced = CompiledTemplate(template={'tasks': self.tasks, 'dependencies': dependencies},
+                                             name=self.name)
+        return self._reduced
+
+
+_compiled_templates = {}
+
+
+def get_template_by_name(name):
+    """The registered template with the given name from any category.
+
+    Raises:
+        KeyError: if no template with this name is registered.
+    """
+    for category_templates in templates_by_category.values():
+        if name in category_templates:
+            return category_templates[name]
+    raise KeyError('Template {name} is not registered.'.format(name=name))
+
+
+def compiled(name):
+    """The compiled form of a registered template. It is compiled on first use and cached afterwards.
+
+    Args:
+        name (str): name of a template registered in this module.
+
+    Returns:
+        CompiledTemplate: the validated template.
+
+    """
+    if name not in _compiled_templates:
+        _compiled_templates[name] = CompiledTemplate(template=get_template_by_name(name), name=name)
+    return _compiled_templates[name]
+
+
+def compile_template(template):
+    """Compiles a template. Registered templates are served from the cache.
+
+    Args:
+        template (dict or CompiledTemplate): template to compile.
+
+    Returns:
+        CompiledTemplate: the validated template.
+
+    """
+    if isinstance(template, CompiledTemplate):
+        return template
+    for category_templates in templates_by_category.values():
+        for name, registered_template in category_templates.items():
+            if registered_template is template:
+                return compiled(name)
+    return CompiledTemplate(template=template)
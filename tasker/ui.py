@@ -1,8 +1,12 @@
 import inspect, os
+from collections import namedtuple
 
 from qtpy import QtCore, QtWidgets, QtGui
 
+import tasker.cache
 import tasker.control
+import tasker.events
+import tasker.search
 from tasker import log
 
 
@@ -13,30 +17,321 @@ STYLESHEET = os.path.join(TASKER_DIR, 'stylesheets', 'darkorange.stylesheet')
 TASKER_ICON= os.path.join(TASKER_DIR, 'icons', 'tasker.png')
 PICTURE_PLACEHOLDER= os.path.join(TASKER_DIR, 'icons', 'template.png')
 
+# Plain data handed from the loader thread to the widgets.
+TreeSnapshot = namedtuple('TreeSnapshot', ['project', 'worklist'])
 
-def update_trees_afterwards(func):
-    """Decorator to refresh the ui for context menu functions.
+
+class LoaderSignals(QtCore.QObject):
+    """Signals of a :class:`TreeLoader`. Emitted from the worker thread, delivered in the gui thread."""
+    loaded = QtCore.Signal(int, object)
+    failed = QtCore.Signal(int, str)
+
+
+class TreeLoader(QtCore.QRunnable):
+    """Loads the project tree and the worklist in a worker thread.
+
+    Args:
+        generation (int): number of this load request. Results are tagged with it.
+        project (tasker.control.Project): project to load. None to skip.
+        user_name (str): user to load the worklist for. None to skip.
+        is_current (callable): called with the generation, returns False once a newer request superseded this one.
+    """
+
+    def __init__(self, generation, project, user_name, is_current):
+        QtCore.QRunnable.__init__(self)
+        self.generation = generation
+        self.project = project
+        self.user_name = user_name
+        self.is_current = is_current
+        self.signals = LoaderSignals()
+
+    def run(self):
+        try:
+            if not self.is_current(self.generation):
+                return
+            project = self.project.load_tree() if self.project else None
+            if not self.is_current(self.generation):
+                return
+            worklist = load_worklist(user_name=self.user_name, project=self.project) if self.user_name else ()
+        except Exception as e:
+            log.error(e)
+            self.signals.failed.emit(self.generation, str(e))
+            return
+        self.signals.loaded.emit(self.generation, TreeSnapshot(project=project, worklist=worklist))
+
+
+def load_worklist(user_name, project):
+    """Loads the tasks assigned to the given user.
 
     Args:
-        func: Context menu function to be decorated.
+        user_name (str): name of the user
+        project (tasker.control.Project): only tasks of this project.
 
     Returns:
-        fund: Decorated function.
+        list(tasker.control.WorklistEntry): the assigned tasks.
 
     """
-    def update_wrapper(*args, **kwargs):
-        func(*args, **kwargs)
-        args[0].update_trees()
-    return update_wrapper
+    try:
+        user = tasker.control.get_user_by_name(name=user_name)
+    except ValueError as e:
+        log.error(e)
+        return []
+    return tasker.control.get_worklist(user=user, project=project)
+
+
+class _Node(object):
+    """A row of the :class:`ProjectTreeModel`."""
+    __slots__ = ('key', 'data', 'parent', 'row', 'children', 'fetched')
+
+    def __init__(self, key, data, parent, row):
+        self.key = key
+        self.data = data
+        self.parent = parent
+        self.row = row
+        self.children = []
+        self.fetched = False
+
+    @property
+    def kind(self):
+        return self.key[0]
+
+    def child_data(self):
+        """Snapshots of the children of this row, whether they were fetched already or not."""
+        if self.kind == 'root':
+            return self.data[1]
+        if self.kind == 'task':
+            return self.data.child_tasks
+        return self.data.tasks
+
+
+class ProjectTreeModel(QtCore.QAbstractItemModel):
+    """Item model of the project tree backed by a :class:`tasker.control.ProjectSnapshot`.
+
+    Rows below an asset, shot or task are only created when the view fetches them, usually on expanding the parent.
+    Rows are indexed by id. If new data keeps the structure of the tree, only the changed rows emit dataChanged
+    and expanded rows, selection and scroll position are kept.
+    """
+    HEADER = ['Task', 'State', 'User']
+
+    def __init__(self, parent=None):
+        QtCore.QAbstractItemModel.__init__(self, parent)
+        self._roots = []
+        self._nodes = {}
+        self._shape = None
+        self._task_ids = set()
+        self._patches = {}
+
+    def set_items(self, assets, shots):
+        """Displays the given assets and shots.
+
+        Args:
+            assets (tuple(tasker.control.TaskHolderSnapshot)): assets to display
+            shots (tuple(tasker.control.TaskHolderSnapshot)): shots to display
+
+        """
+        shape = (_tree_shape(assets), _tree_shape(shots))
+        self._patches = {}
+        if shape == self._shape:
+            self._update_in_place(assets=assets, shots=shots)
+            return
+        self.beginResetModel()
+        self._nodes = {}
+        self._task_ids = _task_ids(shape)
+        self._roots = [_Node(key=('root', 'Assets'), data=('Assets', tuple(assets)), parent=None, row=0),
+                       _Node(key=('root', 'Shots'), data=('Shots', tuple(shots)), parent=None, row=1)]
+        self._shape = shape
+        self.endResetModel()
+
+    def contains_task(self, task_id):
+        """True if the task is part of the displayed items, fetched or not."""
+        return task_id in self._task_ids
+
+    def update_tasks(self, tasks):
+        """Shows the new state and user of the given tasks and emits dataChanged for their rows.
+
+        Args:
+            tasks (list(tasker.control.TaskSnapshot)): changed tasks, e.g. from
+                :func:`tasker.control.get_task_snapshots`. Tasks not displayed are ignored.
+
+        """
+        for task in tasks:
+            if task.id not in self._task_ids:
+                continue
+            self._patches[task.id] = task
+            node = self._nodes.get(('task', task.id))
+            if node is None:
+                continue
+            node.data = _patched(node.data, task)
+            self.dataChanged.emit(self.createIndex(node.row, 1, node), self.createIndex(node.row, 2, node))
+
+    def task_index(self, task_id, column=0):
+        """Index of the task with the given id or an invalid index if it isn't fetched (yet)."""
+        node = self._nodes.get(('task', task_id))
+        if node is None:
+            return QtCore.QModelIndex()
+        return self.createIndex(node.row, column, node)
+
+    def _update_in_place(self, assets, shots):
+        for root, items in zip(self._roots, (assets, shots)):
+            root.data = (root.data[0], tuple(items))
+            for item in items:
+                self._update_node(key=(item.kind, item.id), data=item, columns=(0, 0))
+                self._update_tasks(item.tasks)
+
+    def _update_tasks(self, tasks):
+        for task in tasks:
+            self._update_node(key=('task', task.id), data=task, columns=(0, 2))
+            self._update_tasks(task.child_tasks)
+
+    def _update_node(self, key, data, columns):
+        node = self._nodes.get(key)
+        if node is None:
+            return
+        changed = _display_values(node.data) != _display_values(data)
+        node.data = data
+        if changed:
+            self.dataChanged.emit(self.createIndex(node.row, columns[0], node),
+                                  self.createIndex(node.row, columns[1], node))
+
+    def _node(self, index):
+        if not index.isValid():
+            return None
+        return index.internalPointer()
+
+    def index(self, row, column, parent=QtCore.QModelIndex()):
+        if not self.hasIndex(row, column, parent):
+            return QtCore.QModelIndex()
+        node = self._node(parent)
+        siblings = self._roots if node is None else node.children
+        return self.createIndex(row, column, siblings[row])
+
+    def parent(self, index):
+        node = self._node(index)
+        if node is None or node.parent is None:
+            return QtCore.QModelIndex()
+        return self.createIndex(node.parent.row, 0, node.parent)
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if parent.column() > 0:
+            return 0
+        node = self._node(parent)
+        if node is None:
+            return len(self._roots)
+        return len(node.children)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return len(self.HEADER)
+
+    def hasChildren(self, parent=QtCore.QModelIndex()):
+        node = self._node(parent)
+        if node is None:
+            return bool(self._roots)
+        if node.fetched:
+            return bool(node.children)
+        return bool(node.child_data())
+
+    def canFetchMore(self, parent):
+        node = self._node(parent)
+        return node is not None and not node.fetched and bool(node.child_data())
+
+    def fetchMore(self, parent):
+        node = self._node(parent)
+        if node is None or node.fetched:
+            return
+        children = node.child_data()
+        node.fetched = True
+        if not children:
+            return
+        self.beginInsertRows(parent, 0, len(children) - 1)
+        for row, data in enumerate(children):
+            key = ('task', data.id) if node.kind != 'root' else (data.kind, data.id)
+            if data.id in self._patches and key[0] == 'task':
+                data = _patched(data, self._patches[data.id])
+            child = _Node(key=key, data=data, parent=node, row=row)
+            node.children.append(child)
+            self._nodes[key] = child
+        self.endInsertRows()
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        node = self._node(index)
+        if node is None:
+            return None
+        if role == QtCore.Qt.DisplayRole:
+            if node.kind == 'root':
+                return node.data[0] if index.column() == 0 else None
+            if node.kind != 'task':
+                return node.data.name if index.column() == 0 else None
+            return _display_values(node.data)[index.column()]
+        if role == QtCore.Qt.UserRole:
+            if node.kind == 'task':
+                return tasker.control.Task(node.data)
+            if node.kind == 'asset':
+                return tasker.control.Asset(node.data)
+            if node.kind == 'shot':
+                return tasker.control.Shot(node.data)
+        return None
+
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        if orientation == QtCore.Qt.Horizontal and role == QtCore.Qt.DisplayRole:
+            return self.HEADER[section]
+        return None
+
+
+def _tree_shape(items):
+    """Nested ids of the given holders and their tasks. Equal shapes can be updated without a model reset."""
+    return tuple((item.id, _task_shape(item.tasks)) for item in items)
+
+
+def _task_shape(tasks):
+    return tuple((task.id, _task_shape(task.child_tasks)) for task in tasks)
+
+
+def _task_ids(shape):
+    """All task ids of a tree shape."""
+    task_ids = set()
+    for holders in shape:
+        stack = [task for _, tasks in holders for task in tasks]
+        while stack:
+            task_id, children = stack.pop()
+            task_ids.add(task_id)
+            stack.extend(children)
+    return task_ids
+
+
+def _patched(task, changed):
+    """The task snapshot with state and user taken from the changed snapshot."""
+    return task._replace(state=changed.state, user_id=changed.user_id, user_name=changed.user_name)
+
+
+def _display_values(data):
+    """Column texts of an asset, shot or task snapshot."""
+    if isinstance(data, tasker.control.TaskHolderSnapshot):
+        return (data.name, None, None)
+    return (data.name, data.state, data.user_name or '')
 
 
 class ProjectTree(QtWidgets.QWidget):
     """Tree Widget to display project , working and done lists."""
 
+    # Forwards tasker.events to the gui thread.
+    change_published = QtCore.Signal(object)
+
+    # Milliseconds to wait after the last key stroke before filtering as you type.
+    SEARCH_DELAY = 250
+
     def __init__(self, parent=None):
         QtWidgets.QWidget.__init__(self, parent)
         self.settings = None
         self.project = None
+        self._load_generation = 0
+        self._loader_pool = QtCore.QThreadPool(self)
+        self._loader_pool.setMaxThreadCount(1)
+        self._worklist_items = {}
+        self.search_index = tasker.search.SearchIndex()
+        self.search_as_you_type = True
+        self._search_timer = QtCore.QTimer(self)
+        self._search_timer.setSingleShot(True)
+        self._search_timer.setInterval(self.SEARCH_DELAY)
 
         self.create_layout()
         self.apply_settings()
@@ -47,24 +342,30 @@ class ProjectTree(QtWidgets.QWidget):
         self.setLayout(root_layout)
 
         self.search_bar = QtWidgets.QLineEdit()
-        self.search_bar.setPlaceholderText('Filter for asset or shot')
+        self.search_bar.setPlaceholderText('Filter for asset, shot, task, state or user')
         root_layout.addWidget(self.search_bar)
 
+        self.loading_indicator = QtWidgets.QProgressBar()
+        self.loading_indicator.setRange(0, 0)
+        self.loading_indicator.setTextVisible(False)
+        self.loading_indicator.setMaximumHeight(4)
+        self.loading_indicator.hide()
+        root_layout.addWidget(self.loading_indicator)
+
         self.overview_tab_container = QtWidgets.QTabWidget()
         root_layout.addWidget(self.overview_tab_container)
 
         # Project Tab
-        self.project_widget = QtWidgets.QTreeWidget()
-        self.project_widget.setLayout(QtWidgets.QVBoxLayout())
-        HEADER = ['Task', 'State', 'User']
-        self.project_widget.setColumnCount(len(HEADER))
-        self.project_widget.setHeaderLabels(HEADER)
+        self.project_model = ProjectTreeModel(self)
+        self.project_widget = QtWidgets.QTreeView()
+        self.project_widget.setModel(self.project_model)
+        self.project_widget.setUniformRowHeights(True)
         self.project_widget.setContextMenuPolicy(QtCore.Qt.CustomContextMenu)
 
         # Work List Tab
         self.worklist_widget = QtWidgets.QTreeWidget()
         self.worklist_widget.setLayout(QtWidgets.QVBoxLayout())
-        HEADER = ['Asset', 'Task', 'State']
+        HEADER = ['Asset', 'Task', 'State', 'Last Comment']
         self.worklist_widget.setColumnCount(len(HEADER))
         self.worklist_widget.setHeaderLabels(HEADER)
         self.worklist_widget.setContextMenuPolicy(QtCore.Qt.CustomContextMenu)
@@ -80,13 +381,21 @@ class ProjectTree(QtWidgets.QWidget):
     def connect_signals(self):
         self.project_widget.customContextMenuRequested.connect(self.project_context_menu)
         self.worklist_widget.customContextMenuRequested.connect(self.worklist_context_menu)
-        self.search_bar.returnPressed.connect(self.update_trees)
+        self.search_bar.returnPressed.connect(self.apply_search)
+        self.search_bar.textChanged.connect(self.on_search_text_changed)
+        self._search_timer.timeout.connect(self.apply_search)
+        self.change_published.connect(self.on_change)
+        publish_change = self.change_published.emit
+        tasker.events.subscribe(publish_change)
+        self.destroyed.connect(lambda: tasker.events.unsubscribe(publish_change))
 
     def project_context_menu(self, pos):
-        clicked_item = self.project_widget.itemAt(pos)
-        if not clicked_item.parent():
+        clicked_index = self.project_widget.indexAt(pos)
+        if not clicked_index.isValid():
+            return
+        if not clicked_index.parent().isValid():
             self.creation_menu(pos=pos)
-        elif not clicked_item.parent().parent():
+        elif not clicked_index.parent().parent().isValid():
             self.asset_menu(pos=pos)
         else:
             self.assignment_menu(pos=pos)
@@ -161,7 +470,10 @@ class ProjectTree(QtWidgets.QWidget):
         menu.popup(self.worklist_widget.mapToGlobal(pos))
 
     def update_trees(self):
-        """Slot to update the project and worklist trees for the current project."""
+        """Slot to update the project and worklist trees for the current project.
+        The data is loaded in a worker thread. The trees are filled once it arrived, see :meth:`on_trees_loaded`.
+        Requests still waiting or loading are superseded and their results dropped.
+        """
         try:
             sender = self.sender()
             self.project=sender._project
@@ -169,152 +481,217 @@ class ProjectTree(QtWidgets.QWidget):
         except AttributeError as e:
             pass
         if self.project and self.settings:
-            self.update_project_tree(project=self.project)
-            self.update_work_list(settings=self.settings)
+            self._load_generation += 1
+            loader = TreeLoader(generation=self._load_generation,
+                                project=self.project,
+                                user_name=self.settings.value('user'),
+                                is_current=self.is_current_load)
+            loader.signals.loaded.connect(self.on_trees_loaded)
+            loader.signals.failed.connect(self.on_trees_load_failed)
+            self.loading_indicator.show()
+            self._loader_pool.start(loader)
+
+    def is_current_load(self, generation):
+        """True if no newer load request was started. Called from the loader thread."""
+        return generation == self._load_generation
+
+    def on_trees_loaded(self, generation, snapshot):
+        if not self.is_current_load(generation):
+            return
+        self.loading_indicator.hide()
+        self.update_project_tree(snapshot=snapshot.project)
+        self.update_work_list(rows=snapshot.worklist)
 
-    def update_project_tree(self, project):
-        """Updates the displayed data of the project tree.
-        :param project: Tasker.control.Project instance which holds relevant data to be displayed."""
-        self.project_widget.clear()
-        if not project:
+    def on_trees_load_failed(self, generation, message):
+        if not self.is_current_load(generation):
             return
-        assets_root = QtWidgets.QTreeWidgetItem()
-        assets_root.setText(0, 'Assets')
+        self.loading_indicator.hide()
+        log.error('Loading the project failed: {message}'.format(message=message))
 
-        self.project_widget.insertTopLevelItem(0, assets_root)
-        assets = self.filter_by_searchbar(project.assets)
-        self.fill_tree(items_to_add=assets, parent=assets_root)
+    def on_change(self, event):
+        """Patches the rows named by a :class:`tasker.events.Event` instead of reloading both trees.
+        Created or deleted assets and shots change the tree structure and reload it in the background.
+        """
+        if event.topic in (tasker.events.ITEMS_CREATED, tasker.events.ITEMS_DELETED):
+            self.update_trees()
+            return
+        if event.topic not in (tasker.events.STATES_CHANGED, tasker.events.USERS_ASSIGNED):
+            return
+        task_ids = [task_id for task_id in event.ids
+                    if self.search_index.contains_task(task_id) or task_id in self._worklist_items]
+        if not task_ids:
+            return
+        tasks = tasker.control.get_task_snapshots(task_ids)
+        self.search_index.update_tasks(tasks)
+        if self.search_bar.text().strip():
+            # Changed tasks may match the filter now or not anymore.
+            self.apply_search()
+        else:
+            self.project_model.update_tasks(tasks)
+        if event.topic == tasker.events.USERS_ASSIGNED:
+            user_name = self.settings.value('user') if self.settings else None
+            if any(task.id in self._worklist_items or task.user_name == user_name for task in tasks):
+                self.update_trees()
+            return
+        for task in tasks:
+            item = self._worklist_items.get(task.id)
+            if item is not None:
+                item.setText(2, task.state)
 
-        shots_root= QtWidgets.QTreeWidgetItem()
-        shots_root.setText(0, 'Shots')
-        self.project_widget.insertTopLevelItem(1, shots_root)
-        shots = self.filter_by_searchbar(project.shots)
-        self.fill_tree(items_to_add=shots, parent=shots_root)
+    def update_project_tree(self, snapshot):
+        """Updates the displayed data of the project tree.
 
-        self.project_widget.expandAll()
+        Args:
+            snapshot (tasker.control.ProjectSnapshot): loaded project to display.
+
+        """
+        self.search_index = tasker.search.SearchIndex(snapshot)
+        self.apply_search()
+
+    def on_search_text_changed(self, text):
+        if self.search_as_you_type:
+            self._search_timer.start()
+
+    def apply_search(self):
+        """Shows the assets and shots matching the search bar text. Filters the loaded data, no database access."""
+        self._search_timer.stop()
+        text = self.search_bar.text()
+        self.project_model.set_items(assets=self.search_index.filter(kind='asset', text=text),
+                                     shots=self.search_index.filter(kind='shot', text=text))
+        for row in range(self.project_model.rowCount()):
+            self.project_widget.expand(self.project_model.index(row, 0))
         self.project_widget.resizeColumnToContents(0)
 
-    def filter_by_searchbar(self, unfiltered):
-        filter_word = self.search_bar.text()
-        if filter_word:
-            filtered = set()
-            for item in unfiltered:  # filter the item names
-                if filter_word in item.name:
-                    filtered.add(item)
-                    continue
-                for task in item.tasks:  # Filter the items tasks
-                    if filter_word in task.name:
-                        filtered.add(item)
-                        break
-                    try:
-                        if filter_word in task.user.name:  # Filter assigned user
-                            filtered.add(item)
-                            break
-                    except AttributeError:
-                        pass
-            return filtered
-        return unfiltered
-
-    def fill_tree(self, items_to_add, parent):
-        for item in items_to_add:
-            widget = QtWidgets.QTreeWidgetItem(parent)
-            widget.setText(0, item.name)
-            widget.setData(0, QtCore.Qt.UserRole, item)
-            self.add_task_items(widget)
-
-    def add_task_items(self, parent):
-        if not parent:
-            return
-        parent.takeChildren()
-        for task in parent.data(0, QtCore.Qt.UserRole).tasks:
-            task_item = QtWidgets.QTreeWidgetItem(parent)
-            task_item.setText(0, task.name)
-            task_item.setData(0, QtCore.Qt.UserRole, task)
-            task_item.setText(1, task.state)
-            if task.user:
-                task_item.setText(2, task.user.name)
-            if task.child_tasks:
-                self.add_task_items(parent=task_item)
-
-    def update_work_list(self, settings):
-        user_name = settings.value('user')
-        try:
-            user = tasker.control.get_user_by_name(name=user_name)
-        except ValueError as e:
-            log.error(e)
-            return
-        tasks = user.tasks  # TODO: this will only work if theres just on project otherwise tasks gets mixed up.
+    def selected_data(self, widget=None):
+        """The tasks, assets or shots selected in the given tree.
+
+        Args:
+            widget: project or worklist tree. Defaults to the current tab.
+
+        Returns:
+            list: the wrapper objects stored in the selected rows.
+
+        """
+        widget = widget or self.overview_tab_container.currentWidget()
+        if widget is self.project_widget:
+            selected = [index.data(QtCore.Qt.UserRole) for index in widget.selectionModel().selectedRows()]
+        else:
+            selected = [item.data(0, QtCore.Qt.UserRole) for item in widget.selectedItems()]
+        return [data for data in selected if data is not None]
+
+    def update_work_list(self, rows):
+        """Updates the displayed tasks of the worklist.
+
+        Args:
+            rows (list(tasker.control.WorklistEntry)): loaded tasks of the current user.
+
+        """
         self.worklist_widget.clear()
-        for task in tasks:
+        self._worklist_items = {}
+        for row in rows:
             item = QtWidgets.QTreeWidgetItem()
-            item.setText(0, task.parent.name)
-            item.setData(0, QtCore.Qt.UserRole, task)
-            item.setText(1, task.name)
-            item.setText(2, task.state)
+            self._worklist_items[row.id] = item
+            item.setText(0, row.parent_name)
+            item.setData(0, QtCore.Qt.UserRole, tasker.control.Task(row))
+            item.setText(1, row.name)
+            item.setText(2, row.state)
+            if row.last_comment:
+                item.setText(3, row.last_comment.strftime('%Y-%m-%d %H:%M'))
             self.worklist_widget.addTopLevelItem(item)
 
     # Task Context Menu Functions
-    @update_trees_afterwards
     def set_state(self):
         """Context Menu Slot to set the state of the selected task."""
         log.debug('Running set state.')
-        current_widget=self.overview_tab_container.currentWidget()
         # Tree widget allows only one selected item
-        for item in current_widget.selectedItems():
-            task = item.data(0, QtCore.Qt.UserRole)
+        for task in self.selected_data():
             index = task.registered_states.index(task.state)
             new_state, ok = QtWidgets.QInputDialog.getItem(self, 'Set State:', 'States:', task.registered_states, index, False)
-            if ok and new_state and task.is_state_allowed(state=new_state):
-                self.add_comment(task=task, new_state=new_state)
-                task.state=new_state
-                self.add_task_items(parent=item.parent())
-
-    def add_comment(self, task, new_state):
+            if not ok or not new_state:
+                continue
+            transition = tasker.control.check_transitions([task.id], new_state)[task.id]
+            if not transition.allowed:
+                QtWidgets.QMessageBox.warning(self, 'Set State', 'State {state} not allowed for {task}: {reason}.'.format(
+                    state=new_state, task=task.name, reason=transition.reason))
+                continue
+            try:
+                tasker.control.set_states([task], new_state,
+                                          comment=self.ask_comment(task=task, new_state=new_state))
+            except ValueError as e:
+                # The task changed in the meantime.
+                QtWidgets.QMessageBox.warning(self, 'Set State', str(e))
+
+    def ask_comment(self, task, new_state):
+        """Asks for a comment on the state change. Returns None if no comment was entered."""
         comment, ok = QtWidgets.QInputDialog.getText(self, 'Write Comment', 'Comment:')
         if ok and comment:
-            text = '{old_state} >> {new_state}.\nComment: {comment}'.format(old_state=task.state,
+            return '{old_state} >> {new_state}.\nComment: {comment}'.format(old_state=task.state,
                                                                             new_state=new_state,
                                                                             comment=comment
                                                                             )
-            task.add_comment(text=text)
+        return None
 
-    @update_trees_afterwards
     def assign_user(self):
         """Context Menu Slot to assign a user to the selected task."""
         log.debug('Running assign user.')
         # Tree widget allows only one selected item
         users = tasker.control.get_all_users()
-        for item in self.project_widget.selectedItems():
+        for task in self.selected_data(widget=self.project_widget):
             user_names = [user.name for user in users]
             user, ok = QtWidgets.QInputDialog.getItem(self, 'Assign User:', 'Users:', user_names, 0, False)
             if ok and user:
-                task = item.data(0, QtCore.Qt.UserRole)
                 user_index = user_names.index(user)
                 task.user = users[user_index]
-                self.add_task_items(parent=item.parent())
 
 
     # Asset Context Menu
-    @update_trees_afterwards
     def delete_asset(self):
         """Deletes the selected item from the database.
         """
         log.debug('Running delete_asset.')
-        current_widget=self.overview_tab_container.currentWidget()
         # Tree widget allows only one selected item
-        item = current_widget.selectedItems()[0]
+        data = self.selected_data()[0]
         name, ok = QtWidgets.QInputDialog.getText(self, 'Delete Item', 'Enter Asset Name to delete:')
-        if ok and name == item.text(0):
-            data = item.data(0, QtCore.Qt.UserRole)
+        if ok and name == data.name:
             data.delete()
 
 
 class CommentsList(QtWidgets.QWidget):
-    """Widget to display the task changes comments."""
+    """Widget to display the task changes comments.
+    Shows the newest comments of the selected task first and loads older pages when scrolled to the bottom.
+    Pages of recently viewed tasks are kept in memory until a new comment is added to the task.
+    """
+
+    # Forwards tasker.events to the gui thread.
+    change_published = QtCore.Signal(object)
+
+    PAGE_SIZE = 20
+    # Number of tasks whose comment pages are kept in memory.
+    CACHE_SIZE = 100
 
     def __init__(self, parent=None):
         QtWidgets.QWidget.__init__(self, parent)
+        self.task = None
+        self._oldest = None
+        self._complete = True
+        self._pages = tasker.cache.IdentityMap(maxsize=self.CACHE_SIZE)
+
         self.setLayout(QtWidgets.QVBoxLayout())
+        self.layout().setContentsMargins(0, 0, 0, 0)
+        self.scroll_area = QtWidgets.QScrollArea()
+        self.scroll_area.setWidgetResizable(True)
+        self.layout().addWidget(self.scroll_area)
+        content = QtWidgets.QWidget()
+        content.setLayout(QtWidgets.QVBoxLayout())
+        content.layout().setAlignment(QtCore.Qt.AlignTop)
+        self.scroll_area.setWidget(content)
+        self.comments_layout = content.layout()
+
+        self.scroll_area.verticalScrollBar().valueChanged.connect(self.on_scrolled)
+        self.change_published.connect(self.on_change)
+        publish_change = self.change_published.emit
+        tasker.events.subscribe(publish_change)
+        self.destroyed.connect(lambda: tasker.events.unsubscribe(publish_change))
 
     def add_comment_widget(self, text):
         comment = QtWidgets.QLabel()
@@ -322,20 +699,59 @@ class CommentsList(QtWidgets.QWidget):
         comment.setSizePolicy(QtWidgets.QSizePolicy.MinimumExpanding, QtWidgets.QSizePolicy.MinimumExpanding)
         comment.setFrameStyle(QtWidgets.QFrame.Panel | QtWidgets.QFrame.Sunken)
         comment.setAlignment(QtCore.Qt.AlignTop | QtCore.Qt.AlignLeft)
-        self.layout().addWidget(comment)
-
-    def add_comments_to_layout(self):
-        self.clear_layout(layout=self.layout())
-        sender = self.sender()
-        items = sender.selectedItems()
-        for item in items:
-            task = item.data(0, QtCore.Qt.UserRole)
-            try:
-                log.debug('Task: {data}, {comments}'.format(data=task.name, comments=task.comments))
-                for c in task.comments:
-                    self.add_comment_widget(text=c)
-            except Exception as e:
-                log.error(e)
+        self.comments_layout.addWidget(comment)
+
+    def add_comments_to_layout(self, tasks):
+        """Shows the newest comments of the first selected task."""
+        self.clear_layout(layout=self.comments_layout)
+        tasks = [task for task in tasks if isinstance(task, tasker.control.Task)]
+        self.task = tasks[0] if tasks else None
+        self._oldest = None
+        self._complete = self.task is None
+        if self.task:
+            log.debug('Task: {data}'.format(data=self.task.name))
+            self.load_next_page()
+
+    def load_next_page(self):
+        """Appends the next older page of comments of the current task."""
+        if self._complete:
+            return
+        task, before = self.task, self._oldest
+        try:
+            page = self._pages.get(key=(tasker.control.Comment, task.id),
+                                   attribute=before.id if before else None,
+                                   loader=lambda: task.comments_page(limit=self.PAGE_SIZE, before=before))
+        except Exception as e:
+            log.error(e)
+            self._complete = True
+            return
+        for comment in page:
+            self.add_comment_widget(text=comment)
+        if page:
+            self._oldest = page[-1]
+        self._complete = len(page) < self.PAGE_SIZE
+        # The scroll bar range is updated once the new widgets are laid out.
+        QtCore.QTimer.singleShot(0, self.fill_viewport)
+
+    def fill_viewport(self):
+        """Loads older pages while all comments fit into the viewport.
+        Without a scroll bar on_scrolled is never called, so the next page couldn't be reached otherwise.
+        """
+        if not self._complete and self.isVisible() and self.scroll_area.verticalScrollBar().maximum() == 0:
+            self.load_next_page()
+
+    def on_scrolled(self, value):
+        if value >= self.scroll_area.verticalScrollBar().maximum():
+            self.load_next_page()
+
+    def on_change(self, event):
+        """Drops cached pages of tasks with new comments and reloads the displayed task."""
+        if event.topic != tasker.events.COMMENTS_ADDED:
+            return
+        for task_id in event.ids:
+            self._pages.invalidate((tasker.control.Comment, task_id))
+        if self.task and self.task.id in event.ids:
+            self.add_comments_to_layout(tasks=[self.task])
 
     @staticmethod
     def clear_layout(layout):
@@ -365,8 +781,12 @@ class AssemblyWidget(QtWidgets.QWidget):
         self.root_layout.addWidget(self.comments)
 
         # Connect Signals
-        self.project_tree.project_widget.itemClicked.connect(self.comments.add_comments_to_layout)
-        self.project_tree.worklist_widget.itemClicked.connect(self.comments.add_comments_to_layout)
+        self.project_tree.project_widget.clicked.connect(
+            lambda: self.comments.add_comments_to_layout(
+                tasks=self.project_tree.selected_data(widget=self.project_tree.project_widget)))
+        self.project_tree.worklist_widget.itemClicked.connect(
+            lambda: self.comments.add_comments_to_layout(
+                tasks=self.project_tree.selected_data(widget=self.project_tree.worklist_widget)))
 
 
     def apply_settings(self):
@@ -481,7 +901,6 @@ class MainWindow(QtWidgets.QMainWindow):
         template = self.choose_template(category='asset')
         self._project.new_asset(name=asset_name, template=template)
         self.statusBar().showMessage('Created Asset: {asset_name}'.format(asset_name=asset_name), 5000)
-        self.refresh_ui.emit()
 
     def new_shot(self):
         name, ok = QtWidgets.QInputDialog.getText(self, 'New Shot', 'New Shot:')
@@ -491,7 +910,6 @@ class MainWindow(QtWidgets.QMainWindow):
         template = self.choose_template(category='shot')
         self._project.new_shot(name=name, template=template)
         self.statusBar().showMessage('Created Shot: {shot_name}'.format(shot_name=name), 5000)
-        self.refresh_ui.emit()
 
     def choose_template(self, category):
         default_template = 0
@@ -554,6 +972,7 @@ def main():
     This shouldn't be used in an application.
     """
     import sys
+    tasker.setup_logging()
     app = QtWidgets.QApplication(sys.argv)
     ex = MainWindow()
     ex.show()
@@ -0,0 +1,5 @@
+import os
+import tempfile
+
+# Never run the tests against a real project database.
+os.environ['TASKER_DB'] = os.path.join(tempfile.mkdtemp(prefix='tasker_tests_'), 'tasker.db')
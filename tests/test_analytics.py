@@ -0,0 +1,113 @@
+import unittest
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+import tasker.control
+import tasker.templates
+from tasker.model import State
+
+from tests.test_control import new_test_project
+
+if numpy is not None:
+    from tasker.analytics import TaskGraph, load_graph
+
+
+def rows(tasks, dependencies):
+    """Graph rows of tasks {id: (name, state, user)} and dependencies {id: [ids it depends on]}."""
+    result = []
+    for task_id, (name, state, user) in sorted(tasks.items()):
+        user_id = None if user is None else hash(user) % 1000
+        for dependency_id in dependencies.get(task_id) or [None]:
+            result.append((task_id, name, state, user_id, user, dependency_id))
+    return result
+
+
+@unittest.skipIf(numpy is None, 'numpy is not installed')
+class TaskGraphTestCase(unittest.TestCase):
+    """Tests for tasker.analytics.TaskGraph.
+
+    Graph:  1 -> 2 -> 4 (compositing)
+            1 -> 3 -> 4
+            5 (compositing, no dependencies)
+            6 -> 7 (no compositing downstream)
+    """
+
+    def setUp(self):
+        tasks = {1: ('storyboard', State.done, 'anna'),
+                 2: ('animation', State.work_in_progress, 'bert'),
+                 3: ('lighting', State.pending, 'bert'),
+                 4: (tasker.templates.compositing, State.pending, None),
+                 5: (tasker.templates.compositing, State.can_start, 'anna'),
+                 6: ('modeling', State.can_start, 'anna'),
+                 7: ('texturing', State.pending, None)}
+        dependencies = {2: [1], 3: [1, 2], 4: [2, 3], 7: [6]}
+        self.graph = TaskGraph(rows(tasks, dependencies))
+
+    def by_id(self, values):
+        return dict((int(task_id), int(value)) for task_id, value in zip(self.graph.task_ids, values))
+
+    def test_depth(self):
+        self.assertEqual(self.by_id(self.graph.depth()), {1: 0, 2: 1, 3: 2, 4: 3, 5: 0, 6: 0, 7: 1})
+
+    def test_remaining_chain(self):
+        self.assertEqual(self.by_id(self.graph.remaining_chain()), {1: 3, 2: 3, 3: 2, 4: 1, 5: 1, 6: -1, 7: -1})
+
+    def test_critical_path(self):
+        self.assertEqual(self.graph.critical_path(), [1, 2, 3, 4])
+        self.assertEqual(self.graph.critical_path(target='not_a_task'), [])
+
+    def test_blocked_counts(self):
+        """Diamonds are counted once and finished tasks neither block nor count as blocked."""
+        self.assertEqual(self.by_id(self.graph.blocked_counts()), {1: 0, 2: 2, 3: 1, 4: 0, 5: 0, 6: 1, 7: 0})
+        self.assertEqual(self.graph.bottlenecks(limit=2), [(2, 2), (3, 1)])
+
+    def test_user_blocking_load(self):
+        self.assertEqual(self.graph.user_blocking_load(), {'anna': 1, 'bert': 3})
+
+    def test_cycles_are_skipped(self):
+        graph = TaskGraph(rows({1: ('a', State.pending, None), 2: ('b', State.pending, None)}, {1: [2], 2: [1]}))
+        self.assertEqual(list(graph.depth()), [-1, -1])
+
+
+@unittest.skipIf(numpy is None, 'numpy is not installed')
+class LoadGraphTestCase(unittest.TestCase):
+    """Tests for tasker.analytics.load_graph."""
+
+    def test_blocked_counts_match_walking_the_dependencies(self):
+        project = new_test_project()
+        project.new_shots_bulk(names=['01_010', '01_020'], template=tasker.templates.shot['feature_animation_shot'])
+        project.new_asset(name='baum_a', template=tasker.templates.asset['feature_animation_prop_asset'])
+        tasker.control.find_tasks(project=project, name=tasker.templates.storyboard)[0].state = State.done
+
+        graph = load_graph(project)
+
+        tasks = tasker.control.find_tasks(project=project)
+        self.assertEqual(list(graph.task_ids), [task.id for task in tasks])
+        dependers = {}
+        for task_id, depender_id in zip(*numpy.nonzero(self._adjacency(graph))):
+            dependers.setdefault(task_id, set()).add(depender_id)
+        unfinished = graph.unfinished
+        for position in range(len(graph)):
+            downstream, stack = set(), list(dependers.get(position, ()))
+            while stack:
+                depender = stack.pop()
+                if depender not in downstream:
+                    downstream.add(depender)
+                    stack.extend(dependers.get(depender, ()))
+            expected = sum(1 for d in downstream if unfinished[d]) if unfinished[position] else 0
+            self.assertEqual(graph.blocked_counts()[position], expected)
+
+    @staticmethod
+    def _adjacency(graph):
+        adjacency = numpy.zeros((len(graph), len(graph)), dtype=bool)
+        for task in range(len(graph)):
+            dependers = graph.depender_indices[graph.depender_indptr[task]:graph.depender_indptr[task + 1]]
+            adjacency[task, dependers] = True
+        return adjacency
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,18 @@
+import unittest
+
+from benchmarks.run import run
+
+
+class BenchmarksTestCase(unittest.TestCase):
+    """Keeps the benchmark suite runnable."""
+
+    def test_run_small_project(self):
+        """All scenarios run on a tiny generated project and report query counts."""
+        results = run(shots=10, assets=6, users=3, comments_per_task=1, repeat=1, batch=2)
+        for name in ('generate_project', 'bulk_creation', 'load_tree', 'worklist', 'search', 'state_propagation',
+                     'deletion'):
+            self.assertGreater(results[name]['queries'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import unittest
+
+import tasker.cache
+import tasker.metrics
+import tasker.templates
+from tasker.cache import IdentityMap
+from tasker.model import State, TaskData
+from tests.test_control import new_test_project
+
+
+class IdentityMapTestCase(unittest.TestCase):
+    """Tests for the IdentityMap in cache.py."""
+
+    def test_hit_does_not_call_loader(self):
+        """A cached value is returned without loading it again."""
+        identity_map = IdentityMap()
+        identity_map.get(key=(TaskData, 1), attribute='state', loader=lambda: State.done)
+        value = identity_map.get(key=(TaskData, 1), attribute='state', loader=self.fail)
+        self.assertEqual(value, State.done)
+        self.assertEqual((identity_map.hits, identity_map.misses), (1, 1))
+
+    def test_least_recently_used_row_is_evicted(self):
+        """The row accessed longest ago is dropped once maxsize is exceeded."""
+        identity_map = IdentityMap(maxsize=2)
+        identity_map.get(key=(TaskData, 1), attribute='state', loader=lambda: State.done)
+        identity_map.get(key=(TaskData, 2), attribute='state', loader=lambda: State.done)
+        identity_map.get(key=(TaskData, 1), attribute='state', loader=self.fail)
+        identity_map.get(key=(TaskData, 3), attribute='state', loader=lambda: State.done)
+        self.assertIn((TaskData, 1), identity_map)
+        self.assertNotIn((TaskData, 2), identity_map)
+
+    def test_invalidate_drops_row(self):
+        """An invalidated row is loaded again."""
+        identity_map = IdentityMap()
+        identity_map.get(key=(TaskData, 1), attribute='state', loader=lambda: State.pending)
+        identity_map.invalidate((TaskData, 1))
+        value = identity_map.get(key=(TaskData, 1), attribute='state', loader=lambda: State.done)
+        self.assertEqual(value, State.done)
+
+    def test_peek_keeps_order(self):
+        """Peeking neither loads nor marks a row as recently used."""
+        identity_map = IdentityMap(maxsize=2)
+        identity_map.get(key=(TaskData, 1), attribute='state', loader=lambda: State.done)
+        identity_map.get(key=(TaskData, 2), attribute='state', loader=lambda: State.done)
+        self.assertEqual(identity_map.peek((TaskData, 1)), {'state': State.done})
+        self.assertIsNone(identity_map.peek((TaskData, 3)))
+        self.assertEqual(identity_map.keys(), [(TaskData, 1), (TaskData, 2)])
+
+
+class CachedWrapperTestCase(unittest.TestCase):
+    """Tests for cached tasker.control wrapper properties."""
+
+    def setUp(self):
+        tasker.cache.enable()
+        project = new_test_project()
+        project.new_asset(name='baum_a', template=tasker.templates.asset['feature_animation_prop_asset'])
+        self.asset = project.assets[0]
+
+    def tearDown(self):
+        tasker.cache.disable()
+
+    def test_second_read_issues_no_query(self):
+        """A cached property is read from the database once."""
+        concept = self.asset.get_task_by_name(tasker.templates.concept)
+        with tasker.metrics.record() as recorder:
+            first = concept.state
+        self.assertGreater(recorder.snapshot()['queries'], 0)
+        with tasker.metrics.record() as recorder:
+            second = concept.state
+        self.assertEqual(recorder.snapshot()['queries'], 0)
+        self.assertEqual(first, second)
+
+    def test_state_setter_invalidates_dependers(self):
+        """Setting a state refreshes the cached states of the task and its dependers."""
+        concept = self.asset.get_task_by_name(tasker.templates.concept)
+        modeling = self.asset.get_task_by_name(tasker.templates.modeling)
+        self.assertEqual(modeling.state, State.pending)
+        concept.state = State.done
+        self.assertEqual(concept.state, State.done)
+        self.assertEqual(modeling.state, State.can_start)
+
+    def test_add_comment_invalidates_comments(self):
+        """A new comment is visible through the cached comments property."""
+        concept = self.asset.get_task_by_name(tasker.templates.concept)
+        self.assertEqual(concept.comments, [])
+        concept.add_comment(text='approved')
+        self.assertEqual([c.text for c in concept.comments], ['approved'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,21 @@
 import unittest
+import uuid
+
+import tasker
+import tasker.control
+import tasker.events
+import tasker.metrics
+import tasker.templates
+from tasker import session_scope
 from tasker.control import get_task_templates_by_category_name
+from tasker.model import State, TaskData
+
+
+def new_test_project():
+    """Creates a project with a unique name and returns it."""
+    name = 'test_{id}'.format(id=uuid.uuid4().hex)
+    tasker.control.new_project(name=name)
+    return tasker.control.get_project_by_name(name)
 
 
 class ControlTestCase(unittest.TestCase):
@@ -13,5 +29,409 @@ class ControlTestCase(unittest.TestCase):
         """Test if wrong template query raises a KeyError"""
         self.assertRaises(KeyError, get_task_templates_by_category_name, 10)
 
+
+class LoadTreeTestCase(unittest.TestCase):
+    """Tests for Project.load_tree."""
+
+    def setUp(self):
+        self.project = new_test_project()
+        self.project.new_asset(name='baum_a', template=tasker.templates.asset['feature_animation_prop_asset'])
+        self.project.new_shot(name='01_010', template=tasker.templates.shot['shortfilm_shot'])
+        self.user_name = 'user_{id}'.format(id=uuid.uuid4().hex)
+        tasker.control.new_user(name=self.user_name)
+
+    def test_snapshot_matches_wrappers(self):
+        """The snapshot holds the same tasks, states and users as the task wrappers."""
+        asset = self.project.assets[0]
+        modeling = asset.get_task_by_name(tasker.templates.modeling)
+        modeling.user = tasker.control.get_user_by_name(self.user_name)
+
+        snapshot = self.project.load_tree()
+
+        self.assertEqual([a.name for a in snapshot.assets], ['baum_a'])
+        self.assertEqual([s.name for s in snapshot.shots], ['01_010'])
+        for holder, holder_snapshot in ((asset, snapshot.assets[0]), (self.project.shots[0], snapshot.shots[0])):
+            self.assertEqual([(t.id, t.name, t.state) for t in holder.tasks],
+                             [(t.id, t.name, t.state) for t in holder_snapshot.tasks])
+        users = dict((t.name, t.user_name) for t in snapshot.assets[0].tasks)
+        self.assertEqual(users[tasker.templates.modeling], self.user_name)
+        self.assertIsNone(users[tasker.templates.concept])
+
+    def test_snapshot_contains_subtasks(self):
+        """Subtasks are nested below their parent task and not listed as top level tasks."""
+        modeling = self.project.assets[0].get_task_by_name(tasker.templates.modeling)
+        with session_scope() as session:
+            session.add(TaskData(name='retopo', state=State.can_start, parent_task_id=modeling.id))
+
+        asset_snapshot = self.project.load_tree().assets[0]
+
+        modeling_snapshot = [t for t in asset_snapshot.tasks if t.id == modeling.id][0]
+        self.assertEqual([t.name for t in modeling_snapshot.child_tasks], ['retopo'])
+        self.assertNotIn('retopo', [t.name for t in asset_snapshot.tasks])
+
+
+class BulkCreationTestCase(unittest.TestCase):
+    """Tests for Project.new_assets_bulk and Project.new_shots_bulk."""
+
+    def setUp(self):
+        self.project = new_test_project()
+
+    def test_bulk_shots_match_single_shot(self):
+        """Bulk created shots get the same tasks, states and dependencies as new_shot."""
+        template = tasker.templates.shot['feature_animation_shot']
+        self.project.new_shot(name='single', template=template)
+        self.project.new_shots_bulk(names=['01_010', '01_020'], template=template)
+
+        shots = self.project.shots
+        self.assertEqual([shot.name for shot in shots], ['single', '01_010', '01_020'])
+        expected = [(task.name, task.state) for task in shots[0].tasks]
+        for shot in shots[1:]:
+            self.assertEqual([(task.name, task.state) for task in shot.tasks], expected)
+
+        shot = shots[2]
+        self.assertEqual(shot.get_task_by_name(tasker.templates.rendering).parent.name, '01_020')
+        shot.get_task_by_name(tasker.templates.storyboard).state = State.done
+        self.assertEqual(shot.get_task_by_name(tasker.templates.blockin).state, State.can_start)
+        self.assertEqual(shots[1].get_task_by_name(tasker.templates.blockin).state, State.pending)
+
+    def test_bulk_assets(self):
+        """Bulk created assets belong to the project."""
+        template = tasker.templates.asset['feature_animation_prop_asset']
+        self.project.new_assets_bulk(names=['baum_a', 'baum_b'], template=template)
+        assets = self.project.assets
+        self.assertEqual([asset.name for asset in assets], ['baum_a', 'baum_b'])
+        self.assertEqual([task.name for task in assets[1].tasks], template['tasks'])
+
+    def test_reduced_dependencies(self):
+        """Only the transitive reduction of the template dependencies is stored."""
+        self.project.new_shots_bulk(names=['01_010'], template=tasker.templates.shot['feature_animation_shot'],
+                                    reduce_dependencies=True)
+        lighting = self.project.shots[0].get_task_by_name(tasker.templates.lighting)
+        with session_scope() as session:
+            dependencies = session.query(TaskData).filter(TaskData.id == lighting.id).one().dependencies
+            self.assertEqual([task.name for task in dependencies], [tasker.templates.camera_check])
+
+
+class FindTasksTestCase(unittest.TestCase):
+    """Tests for find_tasks and iter_tasks."""
+
+    def setUp(self):
+        self.project = new_test_project()
+        self.project.new_shots_bulk(names=['01_010', '01_020', '01_030'],
+                                    template=tasker.templates.shot['shortfilm_shot'])
+        self.other_project = new_test_project()
+        self.other_project.new_shots_bulk(names=['01_010'], template=tasker.templates.shot['shortfilm_shot'])
+        self.user_name = 'user_{id}'.format(id=uuid.uuid4().hex)
+        tasker.control.new_user(name=self.user_name)
+        self.user = tasker.control.get_user_by_name(self.user_name)
+
+    def test_filters(self):
+        """Only tasks matching all filters are returned."""
+        shot = self.project.shots[1]
+        lighting = shot.get_task_by_name(tasker.templates.lighting)
+        lighting.user = self.user
+
+        tasks = tasker.control.find_tasks(project=self.project, name=tasker.templates.lighting)
+        self.assertEqual(len(tasks), 3)
+        tasks = tasker.control.find_tasks(project=self.project, states=[State.can_start])
+        self.assertEqual([task.name for task in tasks], [tasker.templates.storyboard] * 3)
+        self.assertEqual([task.id for task in tasker.control.find_tasks(parent=shot)], [t.id for t in shot.tasks])
+        self.assertEqual([task.id for task in tasker.control.find_tasks(user=self.user)], [lighting.id])
+        self.assertEqual([task.id for task in tasker.control.get_all_tasks(user=self.user)], [lighting.id])
+
+    def test_keyset_pagination(self):
+        """Pages continue after the last task of the previous page without gaps or duplicates."""
+        expected = tasker.control.find_tasks(project=self.project, order_by='name')
+        self.assertEqual(len(expected), 15)
+        pages = []
+        page = tasker.control.find_tasks(project=self.project, order_by='name', limit=4)
+        while page:
+            pages.extend(page)
+            page = tasker.control.find_tasks(project=self.project, order_by='name', after=page[-1], limit=4)
+        self.assertEqual([task.id for task in pages], [task.id for task in expected])
+        self.assertEqual([task.name for task in pages], sorted(task.name for task in pages))
+
+    def test_iter_tasks(self):
+        """The generator yields the same tasks as find_tasks."""
+        tasks = tasker.control.iter_tasks(project=self.project, batch_size=2)
+        self.assertEqual([task.id for task in tasks], [task.id for task in tasker.control.find_tasks(project=self.project)])
+        by_name = tasker.control.iter_tasks(project=self.project, order_by='name', batch_size=2)
+        self.assertEqual([task.id for task in by_name],
+                         [task.id for task in tasker.control.find_tasks(project=self.project, order_by='name')])
+
+    def test_iter_tasks_holds_no_connection(self):
+        """No connection is checked out while the caller works on a yielded task."""
+        tasks = tasker.control.iter_tasks(project=self.project, batch_size=2)
+        for task in tasks:
+            self.assertEqual(tasker.get_engine().pool.checkedout(), 0)
+
+
+class GetWorklistTestCase(unittest.TestCase):
+    """Tests for tasker.control.get_worklist."""
+
+    def setUp(self):
+        self.project = new_test_project()
+        self.project.new_shot(name='01_010', template=tasker.templates.shot['shortfilm_shot'])
+        self.project.new_asset(name='baum_a', template=tasker.templates.asset['feature_animation_prop_asset'])
+        self.other_project = new_test_project()
+        self.other_project.new_shot(name='02_010', template=tasker.templates.shot['shortfilm_shot'])
+        name = 'user_{id}'.format(id=uuid.uuid4().hex)
+        tasker.control.new_user(name=name)
+        self.user = tasker.control.get_user_by_name(name)
+        self.lighting = self.project.shots[0].get_task_by_name(tasker.templates.lighting)
+        self.modeling = self.project.assets[0].get_task_by_name(tasker.templates.modeling)
+        for task in (self.lighting, self.modeling, self.other_project.shots[0].tasks[0]):
+            task.user = self.user
+
+    def test_scoped_to_project(self):
+        worklist = tasker.control.get_worklist(user=self.user, project=self.project)
+        self.assertEqual([(entry.parent_kind, entry.parent_name, entry.name) for entry in worklist],
+                         [('shot', '01_010', tasker.templates.lighting),
+                          ('asset', 'baum_a', tasker.templates.modeling)])
+        self.assertEqual(len(tasker.control.get_worklist(user=self.user, project=None)), 3)
+
+    def test_states_and_last_comment(self):
+        self.lighting.add_comment('first')
+        self.lighting.add_comment('second')
+        self.modeling.state = State.work_in_progress
+        worklist = tasker.control.get_worklist(user=self.user, project=self.project, states=[State.pending])
+        self.assertEqual([entry.id for entry in worklist], [self.lighting.id])
+        self.assertEqual(worklist[0].last_comment, max(comment.datetime for comment in self.lighting.comments))
+        modeling = tasker.control.get_worklist(user=self.user, project=self.project,
+                                               states=[State.work_in_progress])
+        self.assertEqual([entry.id for entry in modeling], [self.modeling.id])
+        self.assertIsNone(modeling[0].last_comment)
+
+
+class ReadyTasksTestCase(unittest.TestCase):
+    """Tests for tasker.control.ready_tasks."""
+
+    def setUp(self):
+        self.project = new_test_project()
+        self.project.new_shots_bulk(names=['01_010', '01_020'], template=tasker.templates.shot['shortfilm_shot'])
+        self.project.new_asset(name='baum_a', template=tasker.templates.asset['feature_animation_prop_asset'])
+        new_test_project().new_shot(name='02_010', template=tasker.templates.shot['shortfilm_shot'])
+
+    def test_other_projects_are_ignored(self):
+        """Ready tasks of another project outnumber the limit and unblock more tasks, none of them is returned."""
+        other_project = new_test_project()
+        other_project.new_shots_bulk(names=['03_{i:03d}'.format(i=i) for i in range(5)],
+                                     template=tasker.templates.shot['feature_animation_shot'])
+        ready = tasker.control.ready_tasks(self.project, limit=2)
+        storyboards = tasker.control.find_tasks(project=self.project, name=tasker.templates.storyboard)
+        self.assertEqual([task.id for task in ready], [task.id for task in storyboards])
+        self.assertEqual(len(tasker.control.ready_tasks(other_project, limit=2)), 2)
+
+    def test_ranked_by_unblocked_tasks(self):
+        ready = tasker.control.ready_tasks(self.project)
+        storyboards = tasker.control.find_tasks(project=self.project, name=tasker.templates.storyboard)
+        concept = self.project.assets[0].get_task_by_name(tasker.templates.concept)
+        self.assertEqual([(task.id, task.unblocks) for task in ready],
+                         [(storyboards[0].id, 4), (storyboards[1].id, 4), (concept.id, 2)])
+        self.assertEqual(len(tasker.control.ready_tasks(self.project, limit=2)), 2)
+
+    def test_states_and_user(self):
+        shot = self.project.shots[0]
+        shot.get_task_by_name(tasker.templates.storyboard).state = State.done
+        animation = shot.get_task_by_name(tasker.templates.animation)
+        animation.state = State.work_in_progress
+        animation.state = State.to_continue
+        name = 'user_{id}'.format(id=uuid.uuid4().hex)
+        tasker.control.new_user(name=name)
+        user = tasker.control.get_user_by_name(name)
+        animation.user = user
+
+        ready = tasker.control.ready_tasks(self.project)
+        self.assertEqual([(task.name, task.state, task.unblocks) for task in ready][:2],
+                         [(tasker.templates.storyboard, State.can_start, 4),
+                          (tasker.templates.animation, State.to_continue, 3)])
+        self.assertEqual([task.id for task in tasker.control.ready_tasks(self.project, user=user)], [animation.id])
+
+
+class SetStatesTestCase(unittest.TestCase):
+    """Tests for tasker.control.set_states."""
+
+    def setUp(self):
+        self.project = new_test_project()
+        self.project.new_shots_bulk(names=['01_010', '01_020'], template=tasker.templates.shot['shortfilm_shot'])
+        self.storyboards = tasker.control.find_tasks(project=self.project, name=tasker.templates.storyboard)
+        self.events = []
+        tasker.events.subscribe(self.events.append)
+
+    def tearDown(self):
+        tasker.events.unsubscribe(self.events.append)
+
+    def test_changes_are_propagated_once(self):
+        changes = tasker.control.set_states(self.storyboards, State.done, comment='approved')
+        animations = tasker.control.find_tasks(project=self.project, name=tasker.templates.animation)
+        self.assertEqual(changes, dict([(task.id, (State.can_start, State.done)) for task in self.storyboards] +
+                                       [(task.id, (State.pending, State.can_start)) for task in animations]))
+        self.assertEqual([task.state for task in animations], [State.can_start] * 2)
+        self.assertEqual([[c.text for c in task.comments] for task in self.storyboards], [['approved']] * 2)
+        self.assertEqual([(event.topic, event.ids) for event in self.events],
+                         [(tasker.events.STATES_CHANGED, tuple(sorted(changes))),
+                          (tasker.events.COMMENTS_ADDED, tuple(task.id for task in self.storyboards))])
+
+    def test_ids_and_reject(self):
+        tasker.control.set_states([task.id for task in self.storyboards], State.done)
+        tasker.control.set_states([self.storyboards[0].id], State.reject)
+        animations = tasker.control.find_tasks(project=self.project, name=tasker.templates.animation)
+        self.assertEqual([task.state for task in animations], [State.hold, State.can_start])
+
+    def test_invalid_transition_changes_nothing(self):
+        self.storyboards[0].state = State.done
+        lighting = self.project.shots[0].get_task_by_name(tasker.templates.lighting)
+        for tasks, state in [(self.storyboards, State.done),
+                             (self.storyboards, State.work_in_progress),
+                             ([self.storyboards[1], lighting], State.work_in_progress)]:
+            self.assertRaises(ValueError, tasker.control.set_states, tasks, state)
+        self.assertEqual([task.state for task in self.storyboards], [State.done, State.can_start])
+        self.assertEqual(self.storyboards[1].comments, [])
+
+
+class CheckTransitionsTestCase(unittest.TestCase):
+    """Tests for tasker.control.check_transitions."""
+
+    def setUp(self):
+        project = new_test_project()
+        project.new_shot(name='01_010', template=tasker.templates.shot['shortfilm_shot'])
+        shot = project.shots[0]
+        self.storyboard = shot.get_task_by_name(tasker.templates.storyboard)
+        self.animation = shot.get_task_by_name(tasker.templates.animation)
+        self.lighting = shot.get_task_by_name(tasker.templates.lighting)
+
+    def reasons(self, tasks, new_state):
+        transitions = tasker.control.check_transitions([task.id for task in tasks], new_state)
+        return [transitions[task.id].reason for task in tasks]
+
+    def test_reasons(self):
+        self.storyboard.state = State.done
+        tasks = [self.storyboard, self.animation, self.lighting]
+        self.assertEqual(self.reasons(tasks, State.work_in_progress),
+                         [tasker.control.DONE_WITHOUT_REJECT, None, tasker.control.DEPENDENCIES_NOT_DONE])
+        self.assertEqual(self.reasons(tasks, State.can_start),
+                         [tasker.control.DONE_WITHOUT_REJECT, tasker.control.SAME_STATE,
+                          tasker.control.DEPENDENCIES_NOT_DONE])
+        self.assertEqual(self.reasons(tasks, State.reject), [None, None, tasker.control.DEPENDENCIES_NOT_DONE])
+
+    def test_result(self):
+        transitions = tasker.control.check_transitions([self.storyboard.id, -1], State.done)
+        self.assertEqual(transitions[self.storyboard.id],
+                         tasker.control.Transition(id=self.storyboard.id, state=State.can_start, allowed=True,
+                                                   reason=None))
+        self.assertEqual(transitions[-1].reason, tasker.control.UNKNOWN_TASK)
+        self.assertFalse(transitions[-1].allowed)
+
+    def test_matches_is_state_allowed(self):
+        for task in (self.storyboard, self.animation, self.lighting):
+            for state in State.all_states:
+                self.assertEqual(task.is_state_allowed(state),
+                                 tasker.control.check_transitions([task.id], state)[task.id].allowed)
+
+
+class CommentsPageTestCase(unittest.TestCase):
+    """Tests for Task.comments_page."""
+
+    def setUp(self):
+        project = new_test_project()
+        project.new_shot(name='01_010', template=tasker.templates.shot['shortfilm_shot'])
+        self.task = project.shots[0].tasks[0]
+        for i in range(5):
+            self.task.add_comment('comment {i}'.format(i=i))
+
+    def test_pages_newest_first(self):
+        first = self.task.comments_page(limit=2)
+        second = self.task.comments_page(limit=2, before=first[-1])
+        last = self.task.comments_page(limit=2, before=second[-1])
+        self.assertEqual([c.text for c in first + second + last],
+                         ['comment {i}'.format(i=i) for i in reversed(range(5))])
+        self.assertEqual(len(last), 1)
+        self.assertEqual(self.task.comments_page(limit=2, before=last[-1]), [])
+
+
+class StateSummaryTestCase(unittest.TestCase):
+    """Tests for tasker.control.state_summary."""
+
+    def setUp(self):
+        self.project = new_test_project()
+        self.project.new_shots_bulk(names=['01_010', '01_020'], template=tasker.templates.shot['shortfilm_shot'])
+        self.project.new_asset(name='baum_a', template=tasker.templates.asset['feature_animation_prop_asset'])
+
+    def tearDown(self):
+        tasker.control.clear_state_summaries()
+
+    def counted(self, **kwargs):
+        summary = tasker.control.state_summary(self.project, **kwargs)
+        return dict((row.group, row.counts) for row in summary.rows)
+
+    def walked(self, group):
+        """The counts per group the slow way, through the wrappers."""
+        counts = {}
+        for holder in self.project.assets + self.project.shots:
+            for task in holder.tasks:
+                values = {'kind': type(holder).kind, 'parent': holder.name, 'task_name': task.name}
+                state_counts = counts.setdefault(tuple(values[name] for name in group), {})
+                state_counts[task.state] = state_counts.get(task.state, 0) + 1
+        return counts
+
+    def test_counts_match_wrappers(self):
+        for group_by in [('kind', 'task_name', 'parent'), ('kind',), ('task_name',), ()]:
+            self.assertEqual(self.counted(group_by=group_by), self.walked(group_by))
+
+    def test_group_by_user(self):
+        name = 'user_{id}'.format(id=uuid.uuid4().hex)
+        tasker.control.new_user(name=name)
+        self.project.shots[0].tasks[0].user = tasker.control.get_user_by_name(name)
+        counted = self.counted(group_by=('user',))
+        self.assertEqual(sum(counted[(name,)].values()), 1)
+        self.assertIn((None,), counted)
+
+    def test_unknown_group_raises(self):
+        self.assertRaises(ValueError, tasker.control.state_summary, self.project, group_by=('sequence',))
+
+    def test_cached_summary_follows_state_changes(self):
+        group_by = ('kind', 'task_name')
+        self.assertEqual(self.counted(group_by=group_by, cached=True), self.walked(group_by))
+        storyboard = self.project.shots[0].get_task_by_name(tasker.templates.storyboard)
+        storyboard.state = State.done
+        self.assertEqual(self.counted(group_by=group_by, cached=True), self.walked(group_by))
+        self.project.shots[1].get_task_by_name(tasker.templates.storyboard).state = State.reject
+        storyboard.state = State.reject
+        self.assertEqual(self.counted(group_by=group_by, cached=True), self.walked(group_by))
+
+    def test_cached_summary_dropped_on_new_items(self):
+        self.counted(group_by=('kind',), cached=True)
+        self.project.new_shot(name='01_030', template=tasker.templates.shot['shortfilm_shot'])
+        self.assertEqual(self.counted(group_by=('kind',), cached=True), self.walked(('kind',)))
+
+    def test_cached_summary_follows_user_assignments(self):
+        self.counted(group_by=('user',), cached=True)
+        name = 'user_{id}'.format(id=uuid.uuid4().hex)
+        tasker.control.new_user(name=name)
+        self.project.shots[0].tasks[0].user = tasker.control.get_user_by_name(name)
+        self.assertEqual(sum(self.counted(group_by=('user',), cached=True)[(name,)].values()), 1)
+
+    def test_other_projects_are_not_counted_again(self):
+        """A state change outside the cached projects costs one lookup query, not one per cached summary."""
+        other_project = new_test_project()
+        other_project.new_shots_bulk(names=['02_010', '02_020'], template=tasker.templates.shot['shortfilm_shot'])
+        storyboards = tasker.control.find_tasks(project=other_project, name=tasker.templates.storyboard)
+        with tasker.metrics.record() as recorder:
+            storyboards[0].state = State.done
+        uncached = recorder.snapshot()['queries']
+        for group_by in [('kind',), ('task_name',), ('parent',)]:
+            self.counted(group_by=group_by, cached=True)
+        with tasker.metrics.record() as recorder:
+            storyboards[1].state = State.done
+        self.assertEqual(recorder.snapshot()['queries'], uncached + 1)
+
+    def test_subscribed_once_and_cleared(self):
+        self.counted(group_by=('kind',), cached=True)
+        self.counted(group_by=('task_name',), cached=True)
+        self.assertEqual(tasker.events._subscribers.count(tasker.control._update_summaries), 1)
+        tasker.control.clear_state_summaries()
+        self.assertNotIn(tasker.control._update_summaries, tasker.events._subscribers)
+
+
 if __name__ == '__main__':
-    unittest.main()
\ No newline at end of file
+    unittest.main()
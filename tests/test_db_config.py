@@ -0,0 +1,45 @@
+import os
+import tempfile
+import unittest
+
+import tasker.db_config
+from tasker.db_config import create_engine
+
+
+def new_file_engine():
+    return create_engine('sqlite:///' + os.path.join(tempfile.mkdtemp(), 'profile.db'))
+
+
+class DbConfigTestCase(unittest.TestCase):
+    """Tests for the SQLite performance profile in db_config.py."""
+
+    @unittest.skipIf(os.getenv('TASKER_DB_JOURNAL_MODE'), 'journal mode set by the environment')
+    def test_default_journal_mode_is_delete(self):
+        """Without TASKER_DB_JOURNAL_MODE the rollback journal is used, which works on network shares."""
+        self.assertEqual(tasker.db_config.journal_mode, 'DELETE')
+        connection = new_file_engine().connect()
+        try:
+            self.assertEqual(connection.execute('PRAGMA journal_mode').scalar(), 'delete')
+            self.assertEqual(connection.execute('PRAGMA synchronous').scalar(), 2)  # FULL
+        finally:
+            connection.close()
+
+    def test_pragmas_are_applied_on_connect(self):
+        """New file database connections use the configured journal mode and the tuned pragmas."""
+        pragmas = tasker.db_config.sqlite_pragmas
+        tasker.db_config.sqlite_pragmas = [('journal_mode', 'WAL'), ('synchronous', 'NORMAL')] + pragmas[2:]
+        try:
+            connection = new_file_engine().connect()
+        finally:
+            tasker.db_config.sqlite_pragmas = pragmas
+        try:
+            self.assertEqual(connection.execute('PRAGMA journal_mode').scalar(), 'wal')
+            self.assertEqual(connection.execute('PRAGMA synchronous').scalar(), 1)  # NORMAL
+            self.assertEqual(connection.execute('PRAGMA busy_timeout').scalar(), 30000)
+        finally:
+            connection.close()
+
+    def test_memory_database(self):
+        """In memory databases keep the default pool."""
+        engine = create_engine('sqlite://')
+        self.assertEqual(engine.execute('SELECT 1').scalar(), 1)
@@ -0,0 +1,102 @@
+import unittest
+import uuid
+
+import tasker.control
+import tasker.events as events
+import tasker.templates
+from tasker.model import State
+
+from tests.test_control import new_test_project
+
+
+class EventsTestCase(unittest.TestCase):
+    """Tests for the change events published by tasker.control."""
+
+    def setUp(self):
+        self.events = []
+        events.subscribe(self.events.append)
+        self.project = new_test_project()
+        self.project.new_shot(name='01_010', template=tasker.templates.shot['shortfilm_shot'])
+        self.shot = self.project.shots[0]
+        del self.events[:]
+
+    def tearDown(self):
+        events.unsubscribe(self.events.append)
+
+    def topics(self):
+        return [event.topic for event in self.events]
+
+    def test_state_change_names_propagated_tasks(self):
+        """The event lists the changed task and every task whose state changed through propagation."""
+        storyboard = self.shot.get_task_by_name(tasker.templates.storyboard)
+        animation = self.shot.get_task_by_name(tasker.templates.animation)
+        storyboard.state = State.done
+
+        self.assertEqual(self.topics(), [events.STATES_CHANGED])
+        changes = self.events[0].changes
+        self.assertEqual(changes[storyboard.id], (State.can_start, State.done))
+        self.assertEqual(changes[animation.id], (State.pending, State.can_start))
+        self.assertEqual(set(self.events[0].ids), set(changes))
+
+    def test_user_assignment(self):
+        name = 'user_{id}'.format(id=uuid.uuid4().hex)
+        tasker.control.new_user(name=name)
+        user = tasker.control.get_user_by_name(name)
+        task = self.shot.tasks[0]
+        task.user = user
+        task.user = None
+
+        self.assertEqual(self.topics(), [events.USERS_ASSIGNED, events.USERS_ASSIGNED])
+        self.assertEqual(self.events[0].changes, {task.id: (None, user.id)})
+        self.assertEqual(self.events[1].changes, {task.id: (user.id, None)})
+
+    def test_items_created_and_deleted(self):
+        self.project.new_asset(name='baum_a', template=tasker.templates.asset['feature_animation_prop_asset'])
+        self.project.new_shots_bulk(names=['01_020', '01_030'], template=tasker.templates.shot['shortfilm_shot'])
+        asset = self.project.assets[0]
+        self.shot.delete()
+
+        self.assertEqual(self.topics(), [events.ITEMS_CREATED, events.ITEMS_CREATED, events.ITEMS_DELETED])
+        self.assertEqual((self.events[0].kind, self.events[0].ids), ('asset', (asset.id,)))
+        self.assertEqual(set(self.events[1].ids), set(s.id for s in self.project.shots))
+        self.assertEqual((self.events[2].kind, self.events[2].ids), ('shot', (self.shot.id,)))
+
+    def test_comment(self):
+        task = self.shot.tasks[0]
+        task.add_comment('looks good')
+        self.assertEqual(self.events[0], events.Event(topic=events.COMMENTS_ADDED, ids=(task.id,), changes={},
+                                                      kind=None))
+
+    def test_failing_subscriber_does_not_stop_others(self):
+        def fail(event):
+            raise RuntimeError('subscriber failed')
+        events.unsubscribe(self.events.append)
+        events.subscribe(fail)
+        events.subscribe(self.events.append)
+        try:
+            self.shot.tasks[0].add_comment('still published')
+        finally:
+            events.unsubscribe(fail)
+        self.assertEqual(self.topics(), [events.COMMENTS_ADDED])
+
+
+class GetTaskSnapshotsTestCase(unittest.TestCase):
+    """Tests for tasker.control.get_task_snapshots."""
+
+    def test_snapshots_match_tasks(self):
+        project = new_test_project()
+        project.new_shot(name='01_010', template=tasker.templates.shot['shortfilm_shot'])
+        tasks = project.shots[0].tasks
+        name = 'user_{id}'.format(id=uuid.uuid4().hex)
+        tasker.control.new_user(name=name)
+        tasks[0].user = tasker.control.get_user_by_name(name)
+
+        snapshots = tasker.control.get_task_snapshots([task.id for task in reversed(tasks)])
+
+        self.assertEqual([(s.id, s.name, s.state) for s in snapshots], [(t.id, t.name, t.state) for t in tasks])
+        self.assertEqual(snapshots[0].user_name, name)
+        self.assertIsNone(snapshots[1].user_name)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+import unittest
+
+import tasker
+import tasker.control
+import tasker.model
+import tasker.fulltext as fulltext
+import tasker.templates
+from tasker import session_scope
+from tasker.model import CommentData
+
+from tests.test_control import new_test_project
+
+
+class SearchCommentsTestCase(unittest.TestCase):
+    """Tests for tasker.control.search_comments and the comment index."""
+
+    def setUp(self):
+        self.project = new_test_project()
+        self.project.new_shot(name='01_010', template=tasker.templates.shot['shortfilm_shot'])
+        self.project.new_asset(name='baum_a', template=tasker.templates.asset['feature_animation_prop_asset'])
+        self.lighting = self.project.shots[0].get_task_by_name(tasker.templates.lighting)
+        self.modeling = self.project.assets[0].get_task_by_name(tasker.templates.modeling)
+        self.lighting.add_comment('Rendering flickers in the window reflections')
+        self.modeling.add_comment('Window frame needs more bevels')
+        self.modeling.add_comment('Approved by supervisor')
+
+    def search(self, query, **kwargs):
+        return tasker.control.search_comments(query, project=self.project, **kwargs)
+
+    def test_index_available(self):
+        self.assertTrue(fulltext.is_available(tasker.get_engine()))
+
+    def test_hits_with_context(self):
+        hits = self.search('flicker')
+        self.assertEqual(len(hits), 1)
+        hit = hits[0]
+        self.assertEqual((hit.task_id, hit.task_name), (self.lighting.id, tasker.templates.lighting))
+        self.assertEqual((hit.parent_kind, hit.parent_name), ('shot', '01_010'))
+        self.assertEqual(hit.text, 'Rendering flickers in the window reflections')
+
+    def test_all_words_case_insensitive(self):
+        self.assertEqual(set(hit.task_id for hit in self.search('WINDOW')), {self.lighting.id, self.modeling.id})
+        self.assertEqual([hit.parent_kind for hit in self.search('window bevels')], ['asset'])
+        self.assertEqual(self.search('window approved'), [])
+
+    def test_project_scope_and_limit(self):
+        other = new_test_project()
+        other.new_shot(name='02_010', template=tasker.templates.shot['shortfilm_shot'])
+        other.shots[0].tasks[0].add_comment('window')
+        self.assertEqual(len(self.search('window')), 2)
+        self.assertEqual(len(self.search('window', limit=1)), 1)
+        self.assertGreaterEqual(len(tasker.control.search_comments('window')), 3)
+
+    def test_query_syntax_is_escaped(self):
+        self.assertEqual(self.search('"'), [])
+        self.assertEqual(len(self.search('window-frame OR')), 0)
+        self.assertEqual(len(self.search('window-frame')), 1)
+
+    def test_set_states_comment_is_indexed(self):
+        task = tasker.control.ready_tasks(self.project, limit=1)[0]
+        tasker.control.set_states([task.id], tasker.model.State.work_in_progress, comment='Started retopology')
+        self.assertEqual([hit.task_id for hit in self.search('retopology')], [task.id])
+
+    def test_no_triggers_on_comments(self):
+        with session_scope() as session:
+            triggers = session.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'").fetchall()
+        self.assertEqual(triggers, [])
+
+    def test_setup_indexes_comments_written_without_index(self):
+        # Written like a client whose SQLite lacks FTS5.
+        with session_scope() as session:
+            session.add(CommentData(task_id=self.lighting.id, text='unindexed comment'))
+        self.assertEqual(self.search('unindexed'), [])
+
+        self.assertTrue(fulltext.setup(tasker.get_engine()))
+
+        self.assertEqual(len(self.search('unindexed')), 1)
+        self.assertEqual(len(self.search('window')), 2)
+
+    def test_setup_drops_old_triggers(self):
+        with session_scope() as session:
+            session.execute("CREATE TRIGGER comment_fts_insert AFTER INSERT ON comment BEGIN "
+                            "INSERT INTO comment_fts(rowid, text) VALUES (new.id, new.text); END")
+        fulltext.setup(tasker.get_engine())
+        self.lighting.add_comment('indexed once')
+        with session_scope() as session:
+            triggers = session.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'").fetchall()
+        self.assertEqual(triggers, [])
+        self.assertEqual(len(self.search('indexed once')), 1)
+
+    def test_rebuild_indexes_comments_written_without_index(self):
+        with session_scope() as session:
+            session.add(CommentData(task_id=self.lighting.id, text='unindexed comment'))
+        self.assertEqual(self.search('unindexed'), [])
+
+        fulltext.rebuild(tasker.get_engine())
+
+        self.assertEqual(len(self.search('unindexed')), 1)
+
+    def test_fallback_without_index(self):
+        engine = tasker.get_engine()
+        fulltext._available[engine] = False
+        try:
+            hits = self.search('window')
+        finally:
+            fulltext._available[engine] = True
+        self.assertEqual([hit.parent_kind for hit in hits], ['asset', 'shot'])
+        self.assertIsNone(hits[0].rank)
+
+    def test_fallback_matches_underscores_literally(self):
+        self.lighting.add_comment('Check shot_010 first')
+        self.lighting.add_comment('Check shotX010 first')
+        engine = tasker.get_engine()
+        fulltext._available[engine] = False
+        try:
+            hits = self.search('shot_010')
+        finally:
+            fulltext._available[engine] = True
+        self.assertEqual([hit.text for hit in hits], ['Check shot_010 first'])
+
+
+if __name__ == '__main__':
+    unittest.main()
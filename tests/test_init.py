@@ -0,0 +1,59 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import tasker
+
+# Modules which tasker.control must not pull in, they are slow to import or optional.
+HEAVY_MODULES = ['tasker.ui', 'tasker.analytics', 'qtpy', 'PyQt4', 'PyQt5', 'PySide', 'PySide2', 'numpy']
+
+
+class ImportTestCase(unittest.TestCase):
+    """Tests for the lazy initialization in tasker/__init__.py."""
+
+    def test_import_is_lazy(self):
+        """Importing tasker.control neither loads the ui nor creates an engine or the database."""
+        db_path = os.path.join(tempfile.mkdtemp(), 'lazy.db')
+        code = ('import sys, tasker.control, tasker; '
+                'assert tasker.engine is None, tasker.engine; '
+                'loaded = [name for name in {modules!r} if name in sys.modules]; '
+                'assert not loaded, loaded').format(modules=HEAVY_MODULES)
+        process = subprocess.Popen([sys.executable, '-c', code], env=dict(os.environ, TASKER_DB=db_path),
+                                   cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                   stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+        _, stderr = process.communicate()
+        self.assertEqual(process.returncode, 0, stderr)
+        self.assertFalse(os.path.exists(db_path))
+
+
+class InitTestCase(unittest.TestCase):
+    """Tests for tasker.init."""
+
+    def setUp(self):
+        self.url = str(tasker.get_engine().url)
+
+    def tearDown(self):
+        tasker.init(url=self.url)
+
+    def test_reinit_disposes_previous_engine(self):
+        previous_engine = tasker.get_engine()
+        previous_pool = previous_engine.pool
+        engine = tasker.init(url='sqlite:///' + os.path.join(tempfile.mkdtemp(), 'other.db'))
+        self.assertIsNot(engine, previous_engine)
+        self.assertIsNot(previous_engine.pool, previous_pool, 'dispose replaces the pool')
+
+    def test_root_logger_is_untouched(self):
+        db_path = os.path.join(tempfile.mkdtemp(), 'logging.db')
+        code = ('import logging, tasker; tasker.init(); '
+                'assert not logging.getLogger().handlers, logging.getLogger().handlers')
+        process = subprocess.Popen([sys.executable, '-c', code], env=dict(os.environ, TASKER_DB=db_path),
+                                   cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                   stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+        _, stderr = process.communicate()
+        self.assertEqual(process.returncode, 0, stderr)
+
+
+if __name__ == '__main__':
+    unittest.main()
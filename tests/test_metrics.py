@@ -0,0 +1,75 @@
+import logging
+import unittest
+
+import tasker.control
+import tasker.metrics
+import tasker.templates
+from tests.test_control import new_test_project
+
+
+class RecordingHandler(logging.Handler):
+    """Keeps the emitted log records."""
+
+    def __init__(self):
+        logging.Handler.__init__(self, level=logging.WARNING)
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+class MetricsTestCase(unittest.TestCase):
+    """Tests for metrics.py."""
+
+    def setUp(self):
+        self.project = new_test_project()
+        self.project.new_shots_bulk(names=['01_010', '01_020'], template=tasker.templates.shot['shortfilm_shot'])
+
+    def tearDown(self):
+        tasker.metrics.disable()
+
+    def test_queries_are_tagged_by_operation(self):
+        """Queries are counted per public control function or property."""
+        with tasker.metrics.record() as recorder:
+            self.project.load_tree()
+            shot = self.project.shots[0]
+            shot.tasks[0].state
+        snapshot = recorder.snapshot()
+        operations = snapshot['operations']
+        self.assertEqual(operations['Project.load_tree'], dict(operations['Project.load_tree'], sessions=1, queries=4))
+        self.assertEqual(operations['Task.state']['queries'], 1)
+        self.assertEqual(snapshot['queries'], sum(stats['queries'] for stats in operations.values()))
+        self.assertTrue(snapshot['slowest'])
+
+    def test_sessions_are_counted_per_session_scope(self):
+        """An operation reading in pages counts one session per page."""
+        with tasker.metrics.record() as recorder:
+            tasks = list(tasker.control.iter_tasks(project=self.project, batch_size=4))
+        pages = len(tasks) // 4 + 1
+        self.assertEqual(recorder.snapshot()['operations']['iter_tasks']['sessions'], pages)
+
+    def test_nothing_recorded_outside_record_block(self):
+        """Queries outside a record block aren't counted."""
+        with tasker.metrics.record() as recorder:
+            pass
+        self.project.load_tree()
+        self.assertEqual(recorder.snapshot()['queries'], 0)
+
+    def test_global_snapshot_reset_and_slow_query_log(self):
+        """Globally recorded queries can be reset and slow queries are logged."""
+        tasker.metrics.enable(slow_query_threshold=0)
+        handler = RecordingHandler()
+        logger = logging.getLogger('tasker')
+        logger.addHandler(handler)
+        try:
+            self.project.load_tree()
+        finally:
+            logger.removeHandler(handler)
+        self.assertTrue([record for record in handler.records if record.getMessage().startswith('Slow query')])
+        self.assertEqual(tasker.metrics.snapshot()['queries'], 4)
+        tasker.metrics.reset()
+        self.assertEqual(tasker.metrics.snapshot()['queries'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,24 @@
+import os
+import tempfile
 import unittest
-from tasker.model import State
+
+from sqlalchemy import create_engine, inspect
+
+from tasker.model import Base, State, task_to_task, upgrade_schema
+
+# The task table as created by tasker versions before the upgrade. Built with raw DDL instead of dropping columns,
+# ALTER TABLE DROP COLUMN needs SQLite 3.35.
+OLD_TASK_TABLE = """
+CREATE TABLE task (
+    id INTEGER NOT NULL PRIMARY KEY,
+    state VARCHAR,
+    name VARCHAR(50) NOT NULL,
+    user_id INTEGER REFERENCES user (id),
+    association_id INTEGER REFERENCES task_association (id),
+    parent_task_id INTEGER REFERENCES task (id)
+)
+"""
+OLD_TASK_INDEX = 'CREATE INDEX ix_task_association_id ON task (association_id)'
 
 
 class ModelTestCase(unittest.TestCase):
@@ -12,3 +31,60 @@ class ModelTestCase(unittest.TestCase):
     def test_pending_state_exists(self):
         """Test if pending state is defined."""
         self.assertEqual(State.pending, 'pending on other tasks')
+
+
+class UpgradeSchemaTestCase(unittest.TestCase):
+    """Tests for upgrading existing databases."""
+
+    def test_missing_indexes_are_created(self):
+        """Indexes are added to a database created without them."""
+        engine = create_engine('sqlite:///' + os.path.join(tempfile.mkdtemp(), 'old.db'))
+        Base.metadata.create_all(engine)
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.drop(engine)
+        self.assertEqual(inspect(engine).get_indexes('task'), [])
+
+        upgrade_schema(engine)
+
+        inspector = inspect(engine)
+        for table in Base.metadata.sorted_tables:
+            names = set(index['name'] for index in inspector.get_indexes(table.name))
+            self.assertEqual(names, set(index.name for index in table.indexes))
+        self.assertIn(['right_task_id'], [index['column_names'] for index in inspector.get_indexes('task_to_task')])
+
+    def test_missing_columns_are_added(self):
+        """downstream_count is added to an old database and filled from the stored dependencies."""
+        engine = create_engine('sqlite:///' + os.path.join(tempfile.mkdtemp(), 'old.db'))
+        engine.execute(OLD_TASK_TABLE)
+        Base.metadata.create_all(engine, tables=[table for table in Base.metadata.sorted_tables
+                                                 if table.name != 'task'])
+        engine.execute('INSERT INTO task (id, name, state) VALUES (?, ?, ?)',
+                       [(i, 'task', State.pending) for i in range(1, 6)])
+        # 1 <- 2 <- 4, 1 <- 3 <- 4, 5 alone
+        engine.execute(task_to_task.insert(), [{'left_task_id': left, 'right_task_id': right}
+                                               for left, right in [(2, 1), (3, 1), (4, 2), (4, 3)]])
+
+        upgrade_schema(engine)
+
+        counts = dict(engine.execute('SELECT id, downstream_count FROM task').fetchall())
+        self.assertEqual(counts, {1: 3, 2: 1, 3: 1, 4: 0, 5: 0})
+
+    def test_task_project_ids_are_filled(self):
+        """project_id is copied from the asset or shot of every task and the obsolete index is dropped."""
+        engine = create_engine('sqlite:///' + os.path.join(tempfile.mkdtemp(), 'old.db'))
+        engine.execute(OLD_TASK_TABLE)
+        engine.execute(OLD_TASK_INDEX)
+        Base.metadata.create_all(engine, tables=[table for table in Base.metadata.sorted_tables
+                                                 if table.name != 'task'])
+        engine.execute("INSERT INTO asset (id, name, project_id, task_association_id) VALUES (1, 'baum_a', 7, 10)")
+        engine.execute("INSERT INTO shot (id, name, project_id, task_association_id) VALUES (1, '01_010', 8, 20)")
+        engine.execute('INSERT INTO task (id, name, state, association_id) VALUES (?, ?, ?, ?)',
+                       [(1, 'modeling', State.can_start, 10), (2, 'lighting', State.can_start, 20),
+                        (3, 'orphan', State.can_start, None)])
+
+        upgrade_schema(engine)
+
+        project_ids = dict(engine.execute('SELECT id, project_id FROM task').fetchall())
+        self.assertEqual(project_ids, {1: 7, 2: 8, 3: None})
+        self.assertNotIn('ix_task_association_id', [index['name'] for index in inspect(engine).get_indexes('task')])
@@ -0,0 +1,89 @@
+import random
+import unittest
+
+import tasker.templates
+from tasker.model import State
+from tasker.propagation import next_state, propagate_states
+from tests.test_control import new_test_project
+
+
+def recursive_propagation(task_id, dependencies, states):
+    """Reference implementation of the former recursive Task._update_self / Task.update_depender."""
+    dependers = dict((t, [d for d in dependencies if t in dependencies[d]]) for t in dependencies)
+
+    def update_self(t):
+        states[t] = next_state(states[t], [states[d] for d in dependencies[t]])
+
+    def update_depender(t):
+        for d in dependers[t]:
+            update_self(d)
+            update_depender(d)
+
+    update_self(task_id)
+    update_depender(task_id)
+
+
+class NextStateTestCase(unittest.TestCase):
+    """Tests for the single task state rules in propagation.py."""
+
+    def test_pending_without_dependencies_can_start(self):
+        self.assertEqual(next_state(State.pending, []), State.can_start)
+
+    def test_rejected_dependency_holds(self):
+        self.assertEqual(next_state(State.work_in_progress, [State.done, State.reject]), State.hold)
+
+    def test_hold_continues_when_dependencies_done(self):
+        self.assertEqual(next_state(State.hold, [State.done, State.done]), State.to_continue)
+
+    def test_unfinished_dependency_keeps_state(self):
+        self.assertEqual(next_state(State.pending, [State.done, State.work_in_progress]), State.pending)
+
+
+class PropagateStatesTestCase(unittest.TestCase):
+    """Tests for the topological propagation pass in propagation.py."""
+
+    def test_matches_recursive_propagation(self):
+        """Every task is evaluated once, with the same result as the recursive propagation."""
+        rng = random.Random(1)
+        for _ in range(300):
+            size = rng.randint(1, 12)
+            dependencies = dict((t, [d for d in range(t) if rng.random() < 0.3]) for t in range(size))
+            states = dict((t, rng.choice(State.all_states)) for t in range(size))
+            root = rng.randrange(size)
+
+            expected = dict(states)
+            recursive_propagation(root, dependencies, expected)
+            downstream = set([root])
+            for t in range(size):
+                if any(d in downstream for d in dependencies[t]):
+                    downstream.add(t)
+            changes = propagate_states(task_ids=downstream, dependencies=dependencies, states=states)
+
+            self.assertEqual(states, expected)
+            self.assertTrue(all(old != new for old, new in changes.values()))
+
+    def test_diamond_shot_template(self):
+        """States propagate through the diamond shaped feature animation shot."""
+        project = new_test_project()
+        project.new_shot(name='01_010', template=tasker.templates.shot['feature_animation_shot'])
+        shot = project.shots[0]
+        for name in (tasker.templates.storyboard, tasker.templates.blockin, tasker.templates.animation,
+                     tasker.templates.shot_set, tasker.templates.tech_check, tasker.templates.muscle_sim,
+                     tasker.templates.cloth_sim, tasker.templates.hair_sim, tasker.templates.vfx,
+                     tasker.templates.camera_check):
+            shot.get_task_by_name(name).state = State.done
+        self.assertEqual(shot.get_task_by_name(tasker.templates.lighting).state, State.can_start)
+
+        shot.get_task_by_name(tasker.templates.animation).state = State.reject
+        states = dict((task.name, task.state) for task in shot.tasks)
+        self.assertEqual(states[tasker.templates.lighting], State.hold)
+        self.assertEqual(states[tasker.templates.rendering], State.pending)
+
+        shot.get_task_by_name(tasker.templates.animation).state = State.done
+        states = dict((task.name, task.state) for task in shot.tasks)
+        self.assertEqual(states[tasker.templates.shot_set], State.to_continue)
+        self.assertEqual(states[tasker.templates.lighting], State.hold)
+
+
+if __name__ == '__main__':
+    unittest.main()
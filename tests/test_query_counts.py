@@ -0,0 +1,168 @@
+"""Upper bounds for the number of SQL statements issued by the tasker.control api.
+
+Every operation runs on a small and on a larger project. The bounds must hold for both,
+so a query per asset, shot or task (N+1) fails here instead of in production.
+"""
+import unittest
+import uuid
+from contextlib import contextmanager
+
+import tasker.control
+import tasker.metrics
+import tasker.templates
+from tasker.model import State
+
+from tests.test_control import new_test_project
+
+SHOT_TEMPLATE = tasker.templates.shot['shortfilm_shot']
+ASSET_TEMPLATE = tasker.templates.asset['feature_animation_prop_asset']
+
+
+def new_sized_project(size):
+    """Creates a project with size shots and size assets and assigns a user to the first tasks."""
+    project = new_test_project()
+    project.new_shots_bulk(names=['shot_{i:03d}'.format(i=i) for i in range(size)], template=SHOT_TEMPLATE)
+    project.new_assets_bulk(names=['asset_{i:03d}'.format(i=i) for i in range(size)], template=ASSET_TEMPLATE)
+    user_name = 'user_{id}'.format(id=uuid.uuid4().hex)
+    tasker.control.new_user(name=user_name)
+    user = tasker.control.get_user_by_name(user_name)
+    for task in tasker.control.find_tasks(project=project, limit=size * 3):
+        task.user = user
+    shot = project.shots[0]
+    task = shot.tasks[0]
+    task.add_comment('first')
+    return {'project': project, 'user': user, 'shot': shot, 'task': task}
+
+
+class QueryCountTestCase(unittest.TestCase):
+    """Query counts of the control api must not grow with the project size."""
+
+    sizes = (1, 8)
+
+    @classmethod
+    def setUpClass(cls):
+        cls.projects = [new_sized_project(size) for size in cls.sizes]
+
+    @contextmanager
+    def assertMaxQueries(self, limit, operation):
+        with tasker.metrics.record() as recorder:
+            yield
+        queries = recorder.snapshot()['queries']
+        self.assertLessEqual(queries, limit, '{operation} issued {queries} queries, allowed are {limit}.'.format(
+            operation=operation, queries=queries, limit=limit))
+
+    def check(self, limit, operation, function):
+        """Runs function(project) for every project size and checks the query count."""
+        for project in self.projects:
+            with self.assertMaxQueries(limit, operation='{operation} on {size} shots'.format(
+                    operation=operation, size=len(project['project'].shots))):
+                function(project)
+
+    def test_load_tree(self):
+        self.check(4, 'Project.load_tree', lambda p: p['project'].load_tree())
+
+    def test_project_items(self):
+        self.check(1, 'Project.assets', lambda p: p['project'].assets)
+        self.check(1, 'Project.shots', lambda p: p['project'].shots)
+
+    def test_worklist(self):
+        self.check(1, 'find_tasks', lambda p: tasker.control.find_tasks(project=p['project'], user=p['user']))
+        self.check(1, 'User.tasks', lambda p: p['user'].tasks)
+        self.check(1, 'get_worklist', lambda p: tasker.control.get_worklist(user=p['user'], project=p['project']))
+        self.check(2, 'ready_tasks', lambda p: tasker.control.ready_tasks(p['project'], user=p['user']))
+
+    def test_search(self):
+        self.check(1, 'find_tasks', lambda p: tasker.control.find_tasks(project=p['project'],
+                                                                         name=tasker.templates.lighting))
+
+    def test_state_summary(self):
+        self.check(1, 'state_summary', lambda p: tasker.control.state_summary(p['project']))
+
+    def test_task_properties(self):
+        self.check(1, 'Task.state', lambda p: p['task'].state)
+        self.check(1, 'Task.user', lambda p: p['task'].user)
+        self.check(1, 'Task.parent', lambda p: p['task'].parent)
+        self.check(1, 'Task.child_tasks', lambda p: p['task'].child_tasks)
+        self.check(1, 'TaskHolder.tasks', lambda p: p['shot'].tasks)
+
+    def test_comments(self):
+        self.check(1, 'Task.comments', lambda p: p['task'].comments)
+        self.check(1, 'Task.comments_page', lambda p: p['task'].comments_page(limit=10))
+        # Comment insert and its full text index entry.
+        self.check(2, 'Task.add_comment', lambda p: p['task'].add_comment('next'))
+
+    def test_set_state(self):
+        self.check(6, 'Task.state setter', lambda p: setattr(p['task'], 'state', State.done))
+        self.check(6, 'Task.state setter', lambda p: setattr(p['task'], 'state', State.reject))
+
+    def test_check_transitions(self):
+        for project in self.projects:
+            task_ids = [task.id for task in tasker.control.find_tasks(project=project['project'])]
+            with self.assertMaxQueries(1, 'check_transitions'):
+                tasker.control.check_transitions(task_ids, State.work_in_progress)
+        self.check(1, 'Task.is_state_allowed', lambda p: p['task'].is_state_allowed(State.work_in_progress))
+
+    def test_set_states(self):
+        for project in self.projects:
+            storyboards = [task for task in tasker.control.find_tasks(project=project['project'],
+                                                                      name=tasker.templates.storyboard)
+                           if task.state != State.done]
+            with self.assertMaxQueries(8, 'set_states'):
+                tasker.control.set_states(storyboards, State.done, comment='approved')
+
+    def test_assign_user(self):
+        self.check(3, 'Task.user setter', lambda p: setattr(p['task'], 'user', p['user']))
+
+    def test_bulk_creation(self):
+        # BEGIN IMMEDIATE, three max ids and one insert per table.
+        self.check(8, 'Project.new_shots_bulk', lambda p: p['project'].new_shots_bulk(
+            names=['bulk_{id}_{i}'.format(id=uuid.uuid4().hex, i=i) for i in range(10)], template=SHOT_TEMPLATE))
+
+    def test_delete(self):
+        def delete(project):
+            project['project'].new_shot(name='to_delete', template=SHOT_TEMPLATE)
+            shot = [s for s in project['project'].shots if s.name == 'to_delete'][0]
+            for task in shot.tasks:
+                task.user = project['user']
+            with self.assertMaxQueries(3, 'TaskHolder.delete'):
+                shot.delete()
+        for project in self.projects:
+            delete(project)
+
+
+class QueryCountResultTestCase(unittest.TestCase):
+    """The single query implementations return the same as before."""
+
+    def setUp(self):
+        self.project = new_test_project()
+        self.project.new_shot(name='01_010', template=SHOT_TEMPLATE)
+        self.project.new_asset(name='baum_a', template=ASSET_TEMPLATE)
+        self.user_name = 'user_{id}'.format(id=uuid.uuid4().hex)
+        tasker.control.new_user(name=self.user_name)
+
+    def test_parent(self):
+        shot = self.project.shots[0]
+        asset = self.project.assets[0]
+        self.assertIsInstance(shot.tasks[0].parent, tasker.control.Shot)
+        self.assertEqual(shot.tasks[0].parent.id, shot.id)
+        self.assertIsInstance(asset.tasks[0].parent, tasker.control.Asset)
+        self.assertEqual(asset.tasks[0].parent.name, 'baum_a')
+
+    def test_user(self):
+        task = self.project.shots[0].tasks[0]
+        self.assertIsNone(task.user)
+        task.user = tasker.control.get_user_by_name(self.user_name)
+        self.assertEqual(task.user.name, self.user_name)
+
+    def test_delete_unassigns_tasks(self):
+        shot = self.project.shots[0]
+        user = tasker.control.get_user_by_name(self.user_name)
+        for task in shot.tasks:
+            task.user = user
+        shot.delete()
+        self.assertEqual(user.tasks, [])
+        self.assertEqual([s.name for s in self.project.shots], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
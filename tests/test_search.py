@@ -0,0 +1,85 @@
+import unittest
+
+from tasker.control import ProjectSnapshot, TaskHolderSnapshot, TaskSnapshot
+from tasker.model import State
+from tasker.search import SearchIndex
+
+
+def task(id, name, state=State.can_start, user_name=None, child_tasks=()):
+    return TaskSnapshot(id=id, name=name, state=state, user_id=None, user_name=user_name, child_tasks=child_tasks)
+
+
+class SearchIndexTestCase(unittest.TestCase):
+    """Tests for tasker.search.SearchIndex."""
+
+    def setUp(self):
+        self.snapshot = ProjectSnapshot(
+            id=1, name='project',
+            assets=(TaskHolderSnapshot(id=1, name='Baum_A', kind='asset',
+                                       tasks=(task(1, 'modeling', user_name='anna'),
+                                              task(2, 'texturing', state=State.pending,
+                                                   child_tasks=(task(3, 'uv_layout', user_name='bert'),)))),),
+            shots=(TaskHolderSnapshot(id=1, name='01_010', kind='shot',
+                                      tasks=(task(4, 'lighting', user_name='anna'),)),
+                   TaskHolderSnapshot(id=2, name='01_020', kind='shot',
+                                      tasks=(task(5, 'lighting', state=State.done),))))
+        self.index = SearchIndex(self.snapshot)
+
+    def names(self, kind, text):
+        return [item.name for item in self.index.filter(kind=kind, text=text)]
+
+    def test_empty_text_returns_all(self):
+        self.assertEqual(self.names('shot', ''), ['01_010', '01_020'])
+        self.assertEqual(self.names('asset', '  '), ['Baum_A'])
+
+    def test_item_names_case_insensitive_substring(self):
+        self.assertEqual(self.names('asset', 'baum'), ['Baum_A'])
+        self.assertEqual(self.names('shot', '020'), ['01_020'])
+        self.assertEqual(self.names('shot', '0'), ['01_010', '01_020'])
+
+    def test_task_names_states_and_users(self):
+        self.assertEqual(self.names('shot', 'light'), ['01_010', '01_020'])
+        self.assertEqual(self.names('shot', State.done), ['01_020'])
+        self.assertEqual(self.names('shot', 'ann'), ['01_010'])
+        self.assertEqual(self.names('asset', 'bert'), ['Baum_A'], 'users of subtasks count for the item')
+
+    def test_all_words_must_match(self):
+        self.assertEqual(self.names('shot', 'lighting anna'), ['01_010'])
+        self.assertEqual(self.names('shot', 'lighting bert'), [])
+
+    def test_update_tasks(self):
+        self.index.update_tasks([task(4, 'lighting', state=State.done, user_name='carl'),
+                                 task(99, 'not_indexed')])
+        self.assertEqual(self.names('shot', State.done), ['01_010', '01_020'])
+        self.assertEqual(self.names('shot', 'anna'), [])
+        self.assertEqual(self.names('shot', 'carl'), ['01_010'])
+        self.assertEqual(self.index.items('shot')[0].tasks[0].state, State.done)
+
+    def test_contains_task(self):
+        self.assertTrue(self.index.contains_task(3))
+        self.assertFalse(self.index.contains_task(99))
+        self.index.remove_item(kind='asset', id=1)
+        self.assertFalse(self.index.contains_task(3))
+
+    def test_update_subtask(self):
+        self.index.update_tasks([task(3, 'uv_layout', state=State.done)])
+        self.assertEqual(self.names('asset', 'bert'), [])
+        self.assertEqual(self.index.items('asset')[0].tasks[1].child_tasks[0].state, State.done)
+
+    def test_shared_terms_stay_until_last_task_changed(self):
+        self.index.update_tasks([task(1, 'modeling')])
+        self.assertEqual(self.names('asset', 'anna'), [])
+        self.assertEqual(self.names('shot', 'anna'), ['01_010'])
+
+    def test_add_and_remove_items(self):
+        self.index.add_item(TaskHolderSnapshot(id=3, name='02_010', kind='shot', tasks=(task(6, 'comp'),)))
+        self.assertEqual(self.names('shot', 'comp'), ['02_010'])
+        self.index.remove_item(kind='shot', id=3)
+        self.index.remove_item(kind='shot', id=1)
+        self.assertEqual(self.names('shot', 'comp'), [])
+        self.assertEqual(self.names('shot', 'lighting'), ['01_020'])
+        self.assertEqual(len(self.index), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+import unittest
+
+import tasker.templates as templates
+from tasker.model import State
+from tasker.propagation import propagate_states
+from tasker.templates import CompiledTemplate, TemplateError
+
+
+def upstream(template):
+    """All direct and indirect dependencies of every task."""
+    result = [set() for _ in template.tasks]
+    for task in template.order:
+        for dependency in template.dependencies[task]:
+            result[task] |= result[dependency] | set([dependency])
+    return result
+
+
+def done_sets(template):
+    """Every set of tasks which can be done at the same time, meaning all their dependencies are done too."""
+    sets = [frozenset()]
+    for task in template.order:
+        sets.extend([done | set([task]) for done in sets if set(template.dependencies[task]) <= done])
+    return sets
+
+
+def ready_tasks(template, done):
+    """Tasks which can start after the given tasks are done."""
+    dependencies = dict(enumerate(template.dependencies))
+    states = dict((task, State.done if task in done else State.pending) for task in dependencies)
+    propagate_states(task_ids=set(dependencies), dependencies=dependencies, states=states)
+    return set(task for task, state in states.items() if state == State.can_start)
+
+
+class TemplatesTestCase(unittest.TestCase):
+    """Tests for the compiled templates in templates.py."""
+
+    def test_registered_templates_compile(self):
+        """All shipped templates are valid and list dependencies before their dependers."""
+        for category_templates in templates.templates_by_category.values():
+            for name in category_templates:
+                template = templates.compiled(name)
+                position = dict((task, index) for index, task in enumerate(template.order))
+                for task, dependencies in enumerate(template.dependencies):
+                    for dependency in dependencies:
+                        self.assertLess(position[dependency], position[task])
+
+    def test_compiled_template_is_cached(self):
+        """Registered templates are compiled once."""
+        template = templates.shot['feature_animation_shot']
+        self.assertIs(templates.compile_template(template), templates.compiled('feature_animation_shot'))
+
+    def test_cycle_raises(self):
+        """Cyclic dependencies are rejected."""
+        template = {'tasks': ['a', 'b'], 'dependencies': {'a': ['b'], 'b': ['a']}}
+        self.assertRaises(TemplateError, CompiledTemplate, template)
+
+    def test_unknown_dependency_raises(self):
+        """Dependencies on tasks which aren't part of the template are rejected."""
+        template = {'tasks': ['a'], 'dependencies': {'a': ['b']}}
+        self.assertRaises(TemplateError, CompiledTemplate, template)
+
+    def test_downstream_counts(self):
+        """Every task counts its direct and indirect dependers once."""
+        template = templates.compiled('feature_animation_prop_asset')
+        counts = dict(zip(template.tasks, template.downstream_counts))
+        self.assertEqual(counts, {templates.concept: 2, templates.modeling: 1, templates.texturing: 0})
+        self.assertEqual(template.reduced().downstream_counts, template.downstream_counts)
+
+
+class ReducedTemplatesTestCase(unittest.TestCase):
+    """Tests for the transitive reduction of templates."""
+
+    def test_reduction_keeps_indirect_dependencies(self):
+        """The reduced template implies the same dependencies with fewer edges."""
+        for category_templates in templates.templates_by_category.values():
+            for name in category_templates:
+                template = templates.compiled(name)
+                reduced = template.reduced()
+                self.assertEqual(upstream(template), upstream(reduced))
+                self.assertLessEqual(sum(map(len, reduced.dependencies)), sum(map(len, template.dependencies)))
+
+    def test_redundant_dependencies_are_dropped(self):
+        """texturing depends on concept only through modeling."""
+        reduced = templates.compiled('feature_animation_prop_asset').reduced()
+        texturing = reduced.index[templates.texturing]
+        self.assertEqual(reduced.dependencies[texturing], (reduced.index[templates.modeling], ))
+
+    def test_readiness_is_unchanged(self):
+        """For every reachable set of done tasks the same tasks are ready to start."""
+        for name in ('feature_animation_shot', 'feature_animation_character_asset'):
+            template = templates.compiled(name)
+            for done in done_sets(template):
+                self.assertEqual(ready_tasks(template, done), ready_tasks(template.reduced(), done))
+
+    def test_reject_holds_direct_dependers_only(self):
+        """Rejecting animation holds and later continues lighting only in the full template.
+        Only there lighting depends on animation directly. The other tasks are done and left unchanged."""
+        for template, lighting_states in [(templates.compiled('feature_animation_shot'), (State.hold,
+                                                                                          State.to_continue)),
+                                          (templates.compiled('feature_animation_shot').reduced(),
+                                           (State.work_in_progress, State.work_in_progress))]:
+            dependencies = dict(enumerate(template.dependencies))
+            states = dict((task, State.done) for task in dependencies)
+            animation, lighting = template.index[templates.animation], template.index[templates.lighting]
+            states[lighting] = State.work_in_progress
+
+            states[animation] = State.reject
+            propagate_states(task_ids=set([lighting]), dependencies=dependencies, states=states)
+            on_reject = states[lighting]
+            states[animation] = State.done
+            propagate_states(task_ids=set([lighting]), dependencies=dependencies, states=states)
+            self.assertEqual((on_reject, states[lighting]), lighting_states)
+
+
+if __name__ == '__main__':
+    unittest.main()